@@ -9,8 +9,12 @@ import logging
 import logging.config
 import json
 from datetime import datetime
-from src.app.Graph import compiled_graph as report_graph
-from src.pipelines.load import compiled_graph as load_graph
+from src.utils.metrics import collect_run_metrics, export_run_metrics
+from src.utils.profiling import maybe_profile_session
+from src.utils.tracing import start_trace
+
+# Graphs are imported inside each command so that a run only pays for the
+# modules (and network clients) it actually uses.
 logging_config = json.load(open("src/settings/logging.json"))
 logging.config.dictConfig(logging_config)
 logger = logging.getLogger(__name__)
@@ -22,7 +26,13 @@ def parse_arguments():
     python Runner.py --generate-report 2024-08-28
     python Runner.py --generate-report 2024-08-28  --load
     python Runner.py --load
+    python Runner.py --migrate
+    python Runner.py --check-quality
     python Runner.py --generate-report today
+    python Runner.py --generate-report today --profile
+    python Runner.py --generate-report today --format html
+    python Runner.py --serve --port 8000 --workers 2
+    python Runner.py --generate-report-range 2024-01-01 2024-06-30 --step 7d --workers 4
     """
     parser = argparse.ArgumentParser(
         description="SRAG OpenDataSUS Challenge - Report Generator and Pipeline Runner",
@@ -36,6 +46,22 @@ def parse_arguments():
         help="Generate report for specified date (YYYY-MM-DD format or 'today')",
     )
 
+    parser.add_argument(
+        "--generate-report-range",
+        nargs=2,
+        type=str,
+        metavar=("START", "END"),
+        help="Generate one report per step from START to END (YYYY-MM-DD or 'today')",
+    )
+
+    parser.add_argument(
+        "--step",
+        type=str,
+        default="7d",
+        help="Step between the dates of --generate-report-range, in days or weeks "
+        "(e.g. 7d, 2w; default: 7d)",
+    )
+
     parser.add_argument(
         "--sections",
         nargs="+",
@@ -50,6 +76,14 @@ def parse_arguments():
         help="Report sections to include (default: all sections)",
     )
 
+    parser.add_argument(
+        "--format",
+        choices=["pdf", "html", "md"],
+        default="pdf",
+        help="Report format: pdf (LaTeX), or html/md previews that don't need "
+        "LaTeX (default: pdf)",
+    )
+
     # Pipeline arguments
     parser.add_argument(
         "--setup",
@@ -57,13 +91,57 @@ def parse_arguments():
         help="Run setup pipeline (create database and tables)",
     )
 
+    parser.add_argument(
+        "--migrate",
+        action="store_true",
+        help="Apply the pending schema migrations of the loaded data",
+    )
+
+    parser.add_argument(
+        "--check-quality",
+        action="store_true",
+        help="Profile the bronze files that changed (null rates, domains, date "
+        "ranges, rejected and quarantined rows)",
+    )
+
     parser.add_argument(
         "--load",
         action="store_true",
         help="Run load pipeline (insert data into database)",
     )
 
+    # Service arguments
+    parser.add_argument(
+        "--serve",
+        action="store_true",
+        help="Run the report service (HTTP API with a warm report stack)",
+    )
+
+    parser.add_argument(
+        "--host", type=str, default="127.0.0.1", help="Report service host"
+    )
+
+    parser.add_argument("--port", type=int, default=8000, help="Report service port")
+
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=2,
+        help="Reports generated concurrently by the report service and "
+        "--generate-report-range",
+    )
+
     # Utility arguments
+    parser.add_argument(
+        "--profile",
+        nargs="?",
+        const="src/data/profiles/runs",
+        default=None,
+        metavar="DIR",
+        help="Profile each graph node and save the artifacts to DIR "
+        "(default: src/data/profiles/runs)",
+    )
+
     parser.add_argument(
         "--verbose", "-v", action="store_true", help="Enable verbose logging"
     )
@@ -84,10 +162,13 @@ def validate_date(date_str: str) -> str:
         raise ValueError(f"Invalid date format: {date_str}. Use YYYY-MM-DD or 'today'")
 
 
-def run_load_pipeline():
+def run_load_pipeline(profile_dir: str | None = None):
     """Run the load pipeline to insert data into database."""
     logger.info("Starting load pipeline...")
     try:
+        from src.pipelines.load import get_compiled_graph
+
+        load_graph = get_compiled_graph()
         # Create initial state for load pipeline
         initial_state = {
             "data": None,  # Will be handled by the pipeline
@@ -95,7 +176,14 @@ def run_load_pipeline():
         }
 
         # Run the compiled load graph
-        result = load_graph.invoke(initial_state)
+        with (
+            start_trace("load"),
+            collect_run_metrics("load") as run_metrics,
+            maybe_profile_session("load", profile_dir),
+        ):
+            result = load_graph.invoke(initial_state)
+        run_metrics.status = result.get("stage")
+        export_run_metrics(run_metrics, "src/data/reports/load_pipeline.metrics.json")
 
         if result.get("stage") == "error":
             logger.error("Load pipeline failed")
@@ -108,37 +196,124 @@ def run_load_pipeline():
         return False
 
 
-def generate_report(report_date: str, sections: list[str]):
+def run_schema_migrations():
+    """Apply the pending schema migrations of influd_data."""
+    logger.info("Starting schema migrations...")
+    try:
+        from src.pipelines.migrations import run_migrations
+
+        with start_trace("migrate"):
+            result = run_migrations({"stage": "start"})
+
+        if result.get("stage") == "error":
+            logger.error("Schema migration failed")
+            return False
+
+        logger.info("Schema is up to date")
+        return True
+    except Exception as e:
+        logger.error(f"Error running schema migrations: {e}")
+        return False
+
+
+def run_data_quality():
+    """Profile the bronze files that changed since their last profile."""
+    logger.info("Starting data quality check...")
+    try:
+        from src.pipelines.quality import check_data_quality
+
+        with start_trace("quality"):
+            result = check_data_quality({"stage": "start"})
+
+        if result.get("stage") == "error":
+            logger.error("Data quality check failed")
+            return False
+
+        logger.info("Data quality check completed")
+        return True
+    except Exception as e:
+        logger.error(f"Error checking data quality: {e}")
+        return False
+
+
+def generate_report(
+    report_date: str,
+    sections: list[str],
+    profile_dir: str | None = None,
+    report_format: str = "pdf",
+):
     """Generate a report for the specified date and sections."""
     logger.info(f"Generating report for date: {report_date}")
     logger.info(f"Including sections: {sections}")
 
     try:
-        # Create initial state for report generation
-        initial_state = {
-            "report_date": report_date,
-            "report": {},
-            "sections": sections,
-            "data": {},
-            "news": [],
-            "stage": "start",
-        }
+        from src.app.Graph import REPORT_PATH, run_report
 
         # Run the compiled report graph
-        result = report_graph.invoke(initial_state)
+        result = run_report(
+            report_date, sections, profile_dir=profile_dir, report_format=report_format
+        )
 
         if result.get("stage") == "error":
             logger.error("Report generation failed")
             return False
 
         logger.info("Report generated successfully")
-        logger.info("Report saved to: src/data/reports/relatorio_influenza.pdf")
+        logger.info(f"Report saved to: {REPORT_PATH}.{report_format}")
         return True
     except Exception as e:
         logger.error(f"Error generating report: {e}")
         return False
 
 
+def generate_report_range(
+    start_date: str,
+    end_date: str,
+    step: str,
+    sections: list[str],
+    workers: int,
+    report_format: str = "pdf",
+):
+    """Generate one report per step of a date range, each in its own directory."""
+    logger.info(f"Generating reports from {start_date} to {end_date} every {step}")
+    try:
+        from src.app.batch import RANGE_OUTPUT_ROOT, generate_report_range, parse_step
+
+        results = generate_report_range(
+            start_date,
+            end_date,
+            parse_step(step),
+            sections,
+            workers=workers,
+            report_format=report_format,
+        )
+
+        if any(result["status"] != "success" for result in results):
+            logger.error("Report range generation failed for some dates")
+            return False
+
+        logger.info(f"Reports saved to: {RANGE_OUTPUT_ROOT}/<date>/")
+        return True
+    except Exception as e:
+        logger.error(f"Error generating report range: {e}")
+        return False
+
+
+def run_report_service(host: str, port: int, workers: int):
+    """Run the report service until interrupted."""
+    logger.info("Starting report service...")
+    try:
+        from src.app.service import run_service
+
+        run_service(host=host, port=port, workers=workers)
+        return True
+    except KeyboardInterrupt:
+        raise
+    except Exception as e:
+        logger.error(f"Error running report service: {e}")
+        return False
+
+
 def main():
     """Main entry point for the application."""
     try:
@@ -150,21 +325,61 @@ def main():
         # Track success of operations
         success = True
 
+        # Apply schema migrations if requested
+        if args.migrate:
+            success &= run_schema_migrations()
+
+        # Profile the bronze files if requested
+        if args.check_quality:
+            success &= run_data_quality()
+
         # Run load pipeline if requested
         if args.load:
-            success &= run_load_pipeline()
+            success &= run_load_pipeline(args.profile)
 
         # Generate report if requested
         if args.generate_report:
             try:
                 validated_date = validate_date(args.generate_report)
-                success &= generate_report(validated_date, args.sections)
+                success &= generate_report(
+                    validated_date, args.sections, args.profile, args.format
+                )
+            except ValueError as e:
+                logger.error(f"Date validation error: {e}")
+                success = False
+
+        # Generate a report range if requested
+        if args.generate_report_range:
+            try:
+                start_date, end_date = map(validate_date, args.generate_report_range)
+                success &= generate_report_range(
+                    start_date,
+                    end_date,
+                    args.step,
+                    args.sections,
+                    args.workers,
+                    args.format,
+                )
             except ValueError as e:
                 logger.error(f"Date validation error: {e}")
                 success = False
 
+        # Run the report service if requested (blocks until interrupted)
+        if args.serve:
+            success &= run_report_service(args.host, args.port, args.workers)
+
         # Check if no action was specified
-        if not any([args.setup, args.load, args.generate_report]):
+        if not any(
+            [
+                args.setup,
+                args.migrate,
+                args.check_quality,
+                args.load,
+                args.generate_report,
+                args.generate_report_range,
+                args.serve,
+            ]
+        ):
             logger.warning("No action specified. Use --help for usage information.")
             return 1
 
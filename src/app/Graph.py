@@ -1,132 +1,93 @@
 from langgraph.graph import StateGraph, START, END
 from typing import TypedDict, Any
-from src.app.agents.main_agent import MainAgent
 from datetime import datetime, timedelta
-from src.app.tools.tavily_search_tool import TavilySearchTool
-from src.app.tools.query_data_tool import QueryDataTool, verify_report_date
-from pylatex import Document, Section, Subsection, Command, Figure, MiniPage
-from pylatex.utils import NoEscape
 from dateutil.relativedelta import relativedelta
-from io import StringIO
+from functools import lru_cache
 import logging
 import asyncio
-import matplotlib.pyplot as plt
-import pandas as pd
+import json
 import locale
+import os
 import traceback
+from src.utils.artifact_cache import (
+    ArtifactCache,
+    get_artifact_entry,
+    get_artifact_key,
+    write_manifest,
+)
+from src.utils.metrics import collect_run_metrics, export_run_metrics, instrument_node
+from src.utils.profiling import maybe_profile_session
+from src.utils.tracing import start_trace
 
 logger = logging.getLogger(__name__)
 
 
-# Set Portuguese Brazil locale with fallback options
-try:
-    logger.info("Setting locale to pt_BR.UTF-8")
-    locale.setlocale(locale.LC_ALL, "pt_BR.UTF-8")
-except locale.Error:
+def _set_locale() -> None:
+    """Set Portuguese Brazil locale with fallback options"""
     try:
-        logger.info("Setting locale to pt_BR")
-        locale.setlocale(locale.LC_ALL, "pt_BR")
+        logger.info("Setting locale to pt_BR.UTF-8")
+        locale.setlocale(locale.LC_ALL, "pt_BR.UTF-8")
     except locale.Error:
         try:
-            logger.info("Setting locale to C.UTF-8")
-            locale.setlocale(locale.LC_ALL, "C.UTF-8")
+            logger.info("Setting locale to pt_BR")
+            locale.setlocale(locale.LC_ALL, "pt_BR")
         except locale.Error:
-            # Fallback to system default
-            logger.info("Setting locale to system default")
-            locale.setlocale(locale.LC_ALL, "")
-            
+            try:
+                logger.info("Setting locale to C.UTF-8")
+                locale.setlocale(locale.LC_ALL, "C.UTF-8")
+            except locale.Error:
+                # Fallback to system default
+                logger.info("Setting locale to system default")
+                locale.setlocale(locale.LC_ALL, "")
+
+
 class ReportState(TypedDict):
     report_date: str
     report: dict[str, Any]
     sections: list[str]
     data: dict[str, Any]
     news: list[str]
+    token_usage: list[dict[str, Any]]
+    output_dir: str
+    graphics: list[str]
+    aggregates: Any
+    artifacts: list[dict[str, Any]]
+    alerts: dict[str, Any]
+    format: str
     stage: str
 
 
+# Default output paths, used when the state has no output_dir
+REPORT_PATH = "src/data/reports/relatorio_influenza"
+GRAPHICS_DIR = "src/data/graphics"
+
+
+def get_report_path(state: ReportState) -> str:
+    """
+    Purpose: Get the report path (without extension) of a run.
+    Args:
+        state: ReportState - The report state.
+    Returns:
+        str - The report path inside output_dir, or the default report path.
+    """
+    if state.get("output_dir"):
+        return os.path.join(state["output_dir"], "relatorio_influenza")
+    return REPORT_PATH
+
+
+def _get_graphics_dir(state: ReportState) -> str:
+    if state.get("output_dir"):
+        return os.path.join(state["output_dir"], "graphics")
+    return GRAPHICS_DIR
+
+
 def _build_report(state: ReportState):
+    from src.app.renderers import get_renderer
+
     try:
-        # Define document class
-        p_aumento_dos_casos = state["report"].p_aumento_dos_casos
-        p_taxa_de_mortalidade = state["report"].p_taxa_de_mortalidade
-        p_taxa_de_ocupacao_uti = state["report"].p_taxa_de_ocupacao_uti
-        p_taxa_de_vacinacao = state["report"].p_taxa_de_vacinacao
-        p_last_30_days_analysis = state["report"].p_last_30_days_analysis
-        p_last_12_months_analysis = state["report"].p_last_12_months_analysis
-
-        report_date_obj = datetime.strptime(state["report_date"], "%Y-%m-%d")
-        formatted_date = report_date_obj.strftime("%d de %B de %Y")
-
-        ##Latex Configuration
-        geometry_options = {"margin": "1in"}
-        doc = Document(documentclass="article", geometry_options=geometry_options)
-
-        # Add required packages
-        doc.packages.append(NoEscape(r"\usepackage[utf8]{inputenc}"))
-        doc.packages.append(NoEscape(r"\usepackage[titletoc,title]{appendix}"))
-        doc.packages.append(NoEscape(r"\usepackage{graphicx,float}"))
-
-        # Title
-        doc.preamble.append(
-            Command(
-                "title",
-                NoEscape(r"\textbf{RELATÓRIO TÉCNICO DE SAÚDE PÚBLICA - SRAG BRASIL}"),
-            )
-        )
-        doc.preamble.append(Command("date", formatted_date))
-        doc.append(NoEscape(r"\maketitle"))
-
-        # Section: Análise
-        with doc.create(Section("Análise")):
-            with doc.create(Subsection("Geral")):
-                doc.append(p_aumento_dos_casos + "\n")
-                doc.append(p_taxa_de_mortalidade + "\n")
-                doc.append(p_taxa_de_ocupacao_uti + "\n")
-                doc.append(p_taxa_de_vacinacao + "\n")
-
-                # with doc.create(Figure(position="H")) as fig:
-                #     for caption, label in [
-                #         ("Total de Casos", "fig:casos-total-por-ano"),
-                #         ("Total de Óbitos", "fig:obitos-total-por-ano"),
-                #         ("Ocupação de UTI", "fig:uti-total-por-ano"),
-                #         ("Taxa de Vacinação", "fig:vacinacao-total-por-ano"),
-                #     ]:
-                #         with doc.create(MiniPage(width=NoEscape("0.45\\textwidth"))) as mini:
-                #             mini.append(NoEscape(r"\centering"))
-                #             mini.append(NoEscape(r"\includegraphics[width=\textwidth]{dubs.jpg}"))
-                #             mini.append(NoEscape(fr"\caption{{{caption}}}"))
-                #             mini.append(NoEscape(fr"\label{{{label}}}"))
-
-            with doc.create(Subsection("Relação Mensal e Anual")):
-                doc.append(p_last_30_days_analysis + "\n")
-                doc.append(p_last_12_months_analysis + "\n")
-                with doc.create(Figure(position="H")) as fig:
-                    for caption, label, graphic in [
-                        (
-                            "Análise Mensal",
-                            "fig:casos-30-dias",
-                            "../graphics/monthly-analysis.png",
-                        ),
-                        (
-                            "Análise Anual",
-                            "fig:casos-12-meses",
-                            "../graphics/yearly-analysis.png",
-                        ),
-                    ]:
-                        with doc.create(
-                            MiniPage(width=NoEscape("0.45\\textwidth"))
-                        ) as mini:
-                            mini.append(NoEscape(r"\centering"))
-                            mini.append(
-                                NoEscape(
-                                    f"""\includegraphics[width=\\textwidth]{{{graphic}}}"""
-                                )
-                            )
-                            mini.append(NoEscape(rf"\caption{{{caption}}}"))
-                            mini.append(NoEscape(rf"\label{{{label}}}"))
-
-        # Generate PDF
-        doc.generate_pdf("src/data/reports/relatorio_influenza", clean_tex=False)
+        renderer = get_renderer(state.get("format") or "pdf")
+        path = renderer.render(state, get_report_path(state))
+        logger.info(f"Report rendered to: {path}")
         state["stage"] = "success"
         return state
     except Exception as e:
@@ -137,53 +98,68 @@ def _build_report(state: ReportState):
 
 
 def _create_graphics(state: ReportState) -> ReportState:
-    def _get_dataframe(csv_data: str) -> pd.DataFrame:
-        df = pd.read_csv(StringIO(csv_data))
-        return df
-
-    def _create_and_save_chart(df: pd.DataFrame, filename: str, title: str) -> str:
-        # Create the plot
-
-        plt.figure(figsize=(10, 6))
-
-        # Example: Create a bar chart or line plot
-        if len(df.columns) == 2:
-            df.plot(x=df.columns[0], y=df.columns[1], kind="bar")
-        else:
-            df.plot()
-
-        plt.title(title)
-        plt.xticks(rotation=45)
-        plt.tight_layout()
-
-        # Save the figure
-        path = f"src/data/graphics/{filename}.png"
-        plt.savefig(path, dpi=300, bbox_inches="tight")
-        plt.close()  # Important: close the figure to free memory
+    from src.app.charts import get_chart_dpi, get_chart_format, render_charts
 
-        return path
+    graphics_dir = _get_graphics_dir(state)
+    os.makedirs(graphics_dir, exist_ok=True)
+    artifact_cache = ArtifactCache()
+    chart_format = get_chart_format(state.get("format") or "pdf")
+    dpi = get_chart_dpi()
 
     try:
-        monthly = state["data"].get("monthly", "")
-        one_year_interval = state["data"].get("one_year_interval", "")
-
-        graphics_paths = []
-
-        if monthly:
-            df_monthly = _get_dataframe(monthly)
-            path = _create_and_save_chart(
-                df_monthly, "monthly-analysis", "Análise Diária - Últimos 30 dias"
+        charts = []
+        for data_key, filename, title, template in [
+            ("monthly", "monthly-analysis", "Análise Diária - Últimos 30 dias", None),
+            (
+                "one_year_interval",
+                "yearly-analysis",
+                "Análise Mensal - Últimos 12 meses",
+                None,
+            ),
+            (
+                "uti_occupancy",
+                "uti-occupancy-analysis",
+                "Ocupação de UTI - Últimos 12 meses",
+                "line",
+            ),
+            (
+                "nowcast",
+                "nowcast-analysis",
+                "Casos por Data de Primeiro Sintoma - Estimativa dos Últimos 30 dias",
+                "band",
+            ),
+        ]:
+            if not state["data"].get(data_key):
+                continue
+            chart = {
+                "csv_data": state["data"][data_key],
+                "title": title,
+                "path": os.path.join(graphics_dir, f"{filename}.{chart_format}"),
+                "format": chart_format,
+                "dpi": dpi,
+            }
+            if template:
+                chart["template"] = template
+            charts.append(chart)
+
+        # Charts are keyed by everything they are drawn from, unchanged ones are reused
+        to_render = []
+        for chart in charts:
+            key = get_artifact_key(
+                "chart", {k: v for k, v in chart.items() if k != "path"}
             )
-            graphics_paths.append(path)
-
-        if one_year_interval:
-            df_yearly = _get_dataframe(one_year_interval)
-            path = _create_and_save_chart(
-                df_yearly, "yearly-analysis", "Análise Mensal - Últimos 12 meses"
+            outputs = {os.path.basename(chart["path"]): chart["path"]}
+            reused = artifact_cache.restore(key, outputs)
+            if not reused:
+                to_render.append((key, outputs, chart))
+            state.setdefault("artifacts", []).append(
+                get_artifact_entry("chart", key, reused, outputs)
             )
-            graphics_paths.append(path)
+        render_charts([chart for _, _, chart in to_render])
+        for key, outputs, _ in to_render:
+            artifact_cache.store(key, outputs)
 
-        state["graphics"] = graphics_paths
+        state["graphics"] = [chart["path"] for chart in charts]
         state["stage"] = "success"
         return state
     except Exception as e:
@@ -193,6 +169,8 @@ def _create_graphics(state: ReportState) -> ReportState:
 
 
 def _get_srag_news(state: ReportState) -> ReportState:
+    from src.app.tools.tavily_search_tool import TavilySearchTool
+
     try:
         logger.info(f"Getting news for {state['report_date']}")
         start_date = state["report_date"]
@@ -217,9 +195,14 @@ def _get_srag_news(state: ReportState) -> ReportState:
 
 
 def _get_srag_data(state: ReportState) -> ReportState:
+    from src.app.tools.query_data_tool import QueryDataTool, verify_report_date
+
     try:
-        report_date = verify_report_date(state["report_date"])
-        query_tool = QueryDataTool()
+        # Prefetched aggregates (report ranges) already hold every day with data
+        aggregates = state.get("aggregates")
+        if aggregates is None:
+            verify_report_date(state["report_date"])
+        query_tool = QueryDataTool(daily_aggregates=aggregates)
         report_date = datetime.strptime(state["report_date"], "%Y-%m-%d")
         all_years_start_date = (report_date - relativedelta(years=4)).strftime(
             "%Y-%m-%d"
@@ -252,6 +235,34 @@ def _get_srag_data(state: ReportState) -> ReportState:
                 "group_by": "month",
             }
         )
+        # Derived rates of the last 30 days, computed in SQL so the sections
+        # don't have to do the arithmetic
+        indicators = query_tool.invoke(
+            {
+                "data_to_fetch": "indicators",
+                "start_date": (report_date - relativedelta(months=1)).strftime(
+                    "%Y-%m-%d"
+                ),
+                "end_date": report_date.strftime("%Y-%m-%d"),
+            }
+        )
+        if indicators.get("status") == "error":
+            # Cubes built before the indicators lack their columns until the next load
+            logger.warning("Indicators unavailable, continuing with the counts only")
+        # Mean and peak patients in the uti by month, from the uti census
+        uti_occupancy = query_tool.invoke(
+            {
+                "data_to_fetch": "uti_occupancy_rate",
+                "start_date": (report_date - relativedelta(years=1)).strftime(
+                    "%Y-%m-%d"
+                ),
+                "end_date": report_date.strftime("%Y-%m-%d"),
+                "group_by": "month",
+            }
+        )
+        if uti_occupancy.get("status") == "error":
+            # Databases loaded before the census lack its table until the next load
+            logger.warning("Uti occupancy unavailable, run the load to build the census")
         if (
             all_years.get("status") == "error"
             or monthly.get("status") == "error"
@@ -270,6 +281,12 @@ def _get_srag_data(state: ReportState) -> ReportState:
             "one_year_interval": one_year_interval.get("response")
             if one_year_interval.get("status") == "success"
             else [],
+            "indicators": indicators.get("response")
+            if indicators.get("status") == "success"
+            else {},
+            "uti_occupancy": uti_occupancy.get("response")
+            if uti_occupancy.get("status") == "success"
+            else [],
         }
         return state
 
@@ -280,6 +297,105 @@ def _get_srag_data(state: ReportState) -> ReportState:
         return state
 
 
+def _detect_outbreaks(state: ReportState) -> ReportState:
+    from src.pipelines.alerts import (
+        ALERT_PARAMETERS,
+        detect_alerts,
+        fetch_alert_series,
+        get_active_alerts,
+        get_dataset_version,
+        get_history_days,
+    )
+    from src.utils.db import get_db_connection
+
+    alerts_path = f"{get_report_path(state)}.alerts.json"
+    try:
+        connection = get_db_connection()
+        cursor = connection.cursor()
+        cursor.execute("SELECT to_regclass('public.influd_cube') IS NOT NULL")
+        if not cursor.fetchone()[0]:
+            logger.warning("Cube not found, run the load to detect outbreaks")
+            state["stage"] = "success"
+            return state
+        # Signals only change with the data, the report date or the parameters
+        key = get_artifact_key(
+            "alerts",
+            {
+                "dataset": get_dataset_version(cursor),
+                "report_date": state["report_date"],
+                "parameters": ALERT_PARAMETERS,
+            },
+        )
+        outputs = {"alerts.json": alerts_path}
+        artifact_cache = ArtifactCache()
+        reused = artifact_cache.restore(key, outputs)
+        if reused:
+            with open(alerts_path, "r", encoding="utf-8") as f:
+                alerts = json.load(f)
+        else:
+            series = fetch_alert_series(cursor, state["report_date"], get_history_days())
+            alerts = detect_alerts(series, state["report_date"])
+            os.makedirs(os.path.dirname(alerts_path) or ".", exist_ok=True)
+            with open(f"{alerts_path}.tmp", "w", encoding="utf-8") as f:
+                json.dump(alerts, f, ensure_ascii=False, indent=2)
+            os.replace(f"{alerts_path}.tmp", alerts_path)
+            artifact_cache.store(key, outputs)
+        state.setdefault("artifacts", []).append(
+            get_artifact_entry("alerts", key, reused, outputs)
+        )
+        state["alerts"] = alerts
+        state["data"]["alerts"] = get_active_alerts(alerts)
+        logger.info(f"{len(state['data']['alerts'])} outbreak alert signals active")
+        state["stage"] = "success"
+        return state
+    except Exception as e:
+        logger.error(f"Error detecting outbreaks: {e}")
+        traceback.print_exc()
+        state["stage"] = "error"
+        return state
+    finally:
+        cursor.close()
+        connection.close()
+
+
+def _nowcast_recent_cases(state: ReportState) -> ReportState:
+    from src.pipelines.nowcast import (
+        MAX_DELAY_DAYS,
+        TRAINING_DAYS,
+        estimate_nowcast,
+        fetch_delay_histogram,
+        get_nowcast_csv,
+    )
+    from src.utils.db import get_db_connection
+
+    try:
+        connection = get_db_connection()
+        cursor = connection.cursor()
+        cursor.execute("SELECT to_regclass('public.influd_delay_histogram') IS NOT NULL")
+        if not cursor.fetchone()[0]:
+            logger.warning("Delay histogram not found, run the load to nowcast recent cases")
+            state["stage"] = "success"
+            return state
+        histogram = fetch_delay_histogram(
+            cursor, state["report_date"], TRAINING_DAYS + MAX_DELAY_DAYS
+        )
+        nowcast = estimate_nowcast(histogram)
+        if nowcast is None:
+            logger.warning("No fully reported days before the report date to nowcast")
+        else:
+            state["data"]["nowcast"] = get_nowcast_csv(state["report_date"], nowcast)
+        state["stage"] = "success"
+        return state
+    except Exception as e:
+        logger.error(f"Error nowcasting recent cases: {e}")
+        traceback.print_exc()
+        state["stage"] = "error"
+        return state
+    finally:
+        cursor.close()
+        connection.close()
+
+
 def _verify_step(state: ReportState) -> str:
     """Verification function that checks if we should continue or end the process"""
     if state.get("stage") == "error":
@@ -295,10 +411,12 @@ def _verify_step(state: ReportState) -> str:
 def _create_node_with_verification(node_name, node_func):
     """Wrapper that adds verification logic after node execution"""
 
+    measured_node = instrument_node(node_name, node_func)
+
     def wrapped_node(state: ReportState) -> ReportState:
         # Execute the original node function
         logger.info(f"Node {node_name} started")
-        result_state = node_func(state)
+        result_state = measured_node(state)
         # Log the current stage for debugging
         logger.info(
             f"Node {node_name} completed with stage: {result_state.get('stage', 'unknown')}"
@@ -335,18 +453,91 @@ def add_sequence_with_verification(
             )
 
 
-# Create the graph
-graph = StateGraph(state_schema=ReportState)
-main_agent = MainAgent()
-# Use our custom sequence builder with verification
-nodes_sequence = [
-    ("insert_data", _get_srag_data),
-    ("insert_news", _get_srag_news),
-    ("main_agent", main_agent.execute),
-    ("create_graphics", _create_graphics),
-    ("build_report", _build_report),
-]
-
-add_sequence_with_verification(graph, nodes_sequence)
-
-compiled_graph = graph.compile()
+@lru_cache(maxsize=None)
+def get_compiled_graph():
+    """
+    Purpose: Build and compile the report graph on first use.
+    The agent, its LLM client and prompts are only created here, so importing
+    this module does not touch the network.
+    Returns:
+        CompiledStateGraph - The compiled report graph.
+    """
+    from src.app.agents.main_agent import MainAgent
+
+    _set_locale()
+    graph = StateGraph(state_schema=ReportState)
+    main_agent = MainAgent()
+    # Use our custom sequence builder with verification
+    nodes_sequence = [
+        ("insert_data", _get_srag_data),
+        ("alerts", _detect_outbreaks),
+        ("nowcast", _nowcast_recent_cases),
+        ("insert_news", _get_srag_news),
+        ("main_agent", main_agent.execute),
+        ("create_graphics", _create_graphics),
+        ("build_report", _build_report),
+    ]
+
+    add_sequence_with_verification(graph, nodes_sequence)
+
+    return graph.compile()
+
+
+def run_report(
+    report_date: str,
+    sections: list[str],
+    output_dir: str = None,
+    profile_dir: str = None,
+    aggregates: Any = None,
+    report_format: str = "pdf",
+) -> ReportState:
+    """
+    Purpose: Run the report graph traced and measured, and save the run metrics
+    and the artifact manifest next to the report.
+    Args:
+        report_date: str - The report date (YYYY-MM-DD).
+        sections: list[str] - The report sections.
+        output_dir: str | None - Directory of the report and graphics, defaults
+            to the shared report and graphics paths.
+        profile_dir: str | None - Profile each node into this directory.
+        aggregates: DailyAggregates | None - Prefetched daily aggregates covering
+            the report windows, used instead of querying the database.
+        report_format: str - The report format: "pdf", "html" or "md".
+    Returns:
+        ReportState - The final state.
+    """
+    initial_state = {
+        "report_date": report_date,
+        "report": {},
+        "sections": sections,
+        "data": {},
+        "news": [],
+        "artifacts": [],
+        "format": report_format,
+        "stage": "start",
+    }
+    if output_dir:
+        initial_state["output_dir"] = output_dir
+    if aggregates is not None:
+        initial_state["aggregates"] = aggregates
+    report_graph = get_compiled_graph()
+    with (
+        start_trace("report", report_date=report_date),
+        collect_run_metrics("report") as run_metrics,
+        maybe_profile_session("report", profile_dir),
+    ):
+        result = report_graph.invoke(initial_state)
+    run_metrics.status = result.get("stage")
+    report_path = get_report_path(initial_state)
+    export_run_metrics(run_metrics, f"{report_path}.metrics.json")
+    write_manifest(
+        f"{report_path}.manifest.json", report_date, result.get("artifacts", [])
+    )
+    return result
+
+
+def __getattr__(name: str):
+    # Keeps `from src.app.Graph import compiled_graph` working, built lazily
+    if name == "compiled_graph":
+        return get_compiled_graph()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
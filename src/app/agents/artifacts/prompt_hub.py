@@ -1,59 +1,248 @@
 from langchain import hub as prompts
+from langchain_core.load import dumpd, load
 from langchain_core.prompts import ChatPromptTemplate
+from typing import Any
+import hashlib
 import json
 import logging
+import os
+import threading
 
 logger = logging.getLogger(__name__)
 
 
 class PromptHub:
+    """
+    Purpose: Serve prompt templates from a local versioned cache.
+    Templates are loaded at startup from the last successful pull (cache file) or
+    from prompts.json, and revalidated against the hub in a background thread.
+    Args:
+        file_path: str - The prompts.json file with the local prompt definitions.
+        force_push: bool - Push the local prompts to the hub before pulling (blocking).
+        cache_path: str | None - The cache file, defaults to PROMPT_CACHE_PATH.
+        offline: bool | None - Never contact the hub, defaults to PROMPT_HUB_OFFLINE.
+    """
+
     def __init__(
         self,
         file_path: str = "src/app/agents/artifacts/prompts.json",
         force_push: bool = False,
+        cache_path: str = None,
+        offline: bool = None,
     ):
         self.prompts_file_path: str = file_path
+        self.cache_path: str = cache_path or os.getenv(
+            "PROMPT_CACHE_PATH", "src/app/agents/artifacts/prompts_cache.json"
+        )
+        self.offline: bool = (
+            offline
+            if offline is not None
+            else os.getenv("PROMPT_HUB_OFFLINE", "false").lower() == "true"
+        )
+        self.prompts: dict[str, dict[str, dict[str, str]]] = {}
         self.prompts_templates: dict[str, ChatPromptTemplate] = {}
-        self._load_prompts_templates(force_push)
+        self.commit_hashes: dict[str, str] = {}
+        self._lock = threading.Lock()
+        self._revalidation: threading.Thread = None
+        self._load_local_templates()
+        if force_push:
+            self._load_prompts_templates(force_push)
+        elif not self.offline:
+            self._revalidation = threading.Thread(
+                target=self._load_prompts_templates, daemon=True
+            )
+            self._revalidation.start()
 
-    def _push_prompt_template(self):
+    @staticmethod
+    def _build_prompt_template(prompt_data: dict[str, str]) -> ChatPromptTemplate:
+        """
+        Purpose: Build a chat prompt template from a prompts.json entry.
+        The optional "context" message is placed right after the system message,
+        so that the static instructions and the shared context form a stable
+        prefix and only the final "human" message changes between calls.
+        Args:
+            prompt_data: dict[str, str] - The "system", "context" and "human" messages.
+        Returns:
+            ChatPromptTemplate - The prompt template.
+        """
+        messages = [("system", prompt_data["system"])]
+        if prompt_data.get("context"):
+            messages.append(("human", prompt_data["context"]))
+        messages.append(("human", prompt_data["human"]))
+        return ChatPromptTemplate.from_messages(messages)
+
+    @staticmethod
+    def _local_commit_hash(prompt_data: dict[str, str]) -> str:
+        """
+        Purpose: Version a prompts.json entry that was never pulled from the hub.
+        Args:
+            prompt_data: dict[str, str] - The prompts.json entry.
+        Returns:
+            str - A content hash prefixed with "local-".
+        """
+        content = json.dumps(prompt_data, sort_keys=True).encode("utf-8")
+        return f"local-{hashlib.sha256(content).hexdigest()[:12]}"
+
+    def _matches_layout(
+        self, template: ChatPromptTemplate, prompt_data: dict[str, str]
+    ) -> bool:
+        """
+        Purpose: Check if a template has the same message layout as prompts.json.
+        Args:
+            template: ChatPromptTemplate - The pulled or cached template.
+            prompt_data: dict[str, str] - The prompts.json entry.
+        Returns:
+            bool - True if messages and input variables match.
+        """
+        local = self._build_prompt_template(prompt_data)
+        return len(template.messages) == len(local.messages) and set(
+            template.input_variables
+        ) == set(local.input_variables)
+
+    def _local_prompts(self) -> dict[str, tuple[str, dict[str, str]]]:
+        """
+        Returns:
+            dict[str, tuple[str, dict[str, str]]] - The agent name and prompts.json
+            entry of every prompt.
+        """
+        return {
+            prompt_name: (agent_name, prompt_data)
+            for agent_name in self.prompts.keys()
+            for prompt_name, prompt_data in self.prompts[agent_name].items()
+        }
+
+    def _read_cache(self) -> dict[str, Any]:
+        try:
+            with open(self.cache_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            logger.error(f"Error reading prompts cache: {e}")
+            return {}
+
+    def _write_cache(self):
+        try:
+            with self._lock:
+                cache = {
+                    prompt_name: {
+                        "commit_hash": self.commit_hashes[prompt_name],
+                        "template": dumpd(template),
+                    }
+                    for prompt_name, template in self.prompts_templates.items()
+                }
+            tmp_path = f"{self.cache_path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(cache, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, self.cache_path)
+        except Exception as e:
+            logger.error(f"Error writing prompts cache: {e}")
+
+    def _load_local_templates(self):
+        """
+        Purpose: Load the templates without network, from the cache when its
+        layout still matches prompts.json and from prompts.json otherwise.
+        """
         try:
             with open(self.prompts_file_path, "r", encoding="utf-8") as f:
                 self.prompts = json.load(f)
-            for agent_name in self.prompts.keys():
-                for prompt_name, prompt_data in self.prompts[agent_name].items():
-                    prompt_template = ChatPromptTemplate.from_messages(
-                        [
-                            ("system", prompt_data["system"]),
-                            ("human", prompt_data["human"]),
-                        ]
+            cache = self._read_cache()
+            for prompt_name, (_, prompt_data) in self._local_prompts().items():
+                cached = cache.get(prompt_name)
+                template = None
+                if cached:
+                    try:
+                        template = load(cached["template"])
+                    except Exception as e:
+                        logger.error(f"Error loading cached prompt {prompt_name}: {e}")
+                if template is not None and self._matches_layout(template, prompt_data):
+                    self.prompts_templates[prompt_name] = template
+                    self.commit_hashes[prompt_name] = cached["commit_hash"]
+                else:
+                    self.prompts_templates[prompt_name] = self._build_prompt_template(
+                        prompt_data
                     )
-                    prompts.push(prompt_name, prompt_template, tags=[agent_name])
+                    self.commit_hashes[prompt_name] = self._local_commit_hash(
+                        prompt_data
+                    )
+            logger.info(f"Loaded prompts {self.commit_hashes}")
         except Exception as e:
-            logger.error(f"Error pushing prompts: {e}")
+            logger.error(f"Error loading local prompts: {e}")
 
-    def _pull_prompts_templates(self):
+    def _push_prompt_template(self):
         try:
-            with open(self.prompts_file_path, "r", encoding="utf-8") as f:
-                self.prompts = json.load(f)
-            for agent_name in self.prompts.keys():
-                for prompt_name, _ in self.prompts[agent_name].items():
-                    self.prompts_templates[prompt_name] = prompts.pull(prompt_name)
+            for prompt_name, (agent_name, prompt_data) in self._local_prompts().items():
+                prompt_template = self._build_prompt_template(prompt_data)
+                prompts.push(prompt_name, prompt_template, tags=[agent_name])
         except Exception as e:
-            logger.error(f"Error pulling prompts: {e}")
+            logger.error(f"Error pushing prompts: {e}")
+
+    def _pull_prompts_templates(self) -> dict[str, ChatPromptTemplate]:
+        """
+        Purpose: Pull every prompt from the hub independently, so that one failed
+        pull does not prevent the others.
+        Returns:
+            dict[str, ChatPromptTemplate] - The templates that were pulled.
+        """
+        pulled = {}
+        for prompt_name in self._local_prompts().keys():
+            try:
+                pulled[prompt_name] = prompts.pull(prompt_name)
+            except Exception as e:
+                logger.error(f"Error pulling prompt {prompt_name}: {e}")
+        return pulled
 
     def _load_prompts_templates(self, force_push: bool = False):
+        """
+        Purpose: Revalidate the local templates against the hub and update the
+        cache when a new commit is found. The hub is only written to when
+        force_push is set; prompts that fail to pull, or whose layout in the hub
+        differs from prompts.json, keep their local template.
+        """
         try:
-            self._pull_prompts_templates()
-
-            if self.prompts_templates is None or force_push:
+            if force_push:
                 self._push_prompt_template()
-                self._pull_prompts_templates()
+
+            pulled = self._pull_prompts_templates()
+            if not pulled:
+                logger.warning("Prompt hub unreachable, using local prompts")
+                return
+
+            local_prompts = self._local_prompts()
+            updated = False
+            for prompt_name, template in pulled.items():
+                _, prompt_data = local_prompts[prompt_name]
+                if not self._matches_layout(template, prompt_data):
+                    logger.warning(
+                        f"Prompt {prompt_name} in the hub does not match prompts.json, "
+                        "using the local prompt (push with force_push to update it)"
+                    )
+                    continue
+                commit_hash = (template.metadata or {}).get("lc_hub_commit_hash")
+                if commit_hash and commit_hash != self.commit_hashes.get(prompt_name):
+                    with self._lock:
+                        self.prompts_templates[prompt_name] = template
+                        self.commit_hashes[prompt_name] = commit_hash
+                    updated = True
+                    logger.info(f"Prompt {prompt_name} updated to {commit_hash}")
+            if updated:
+                self._write_cache()
         except Exception as e:
             logger.error(f"Error loading prompts: {e}")
 
+    def wait_for_revalidation(self, timeout: float = None) -> None:
+        """
+        Purpose: Block until the background revalidation finishes.
+        Args:
+            timeout: float | None - Maximum time to wait, in seconds.
+        """
+        if self._revalidation is not None:
+            self._revalidation.join(timeout)
+
     def get_prompt_template(self, prompt_name: str) -> ChatPromptTemplate:
-        return self.prompts_templates[prompt_name]
+        with self._lock:
+            return self.prompts_templates[prompt_name]
 
     def get_all_prompts_templates(self) -> dict[str, ChatPromptTemplate]:
-        return self.prompts_templates
+        with self._lock:
+            return dict(self.prompts_templates)
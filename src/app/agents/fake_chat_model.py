@@ -0,0 +1,123 @@
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_core.runnables import Runnable, RunnableLambda
+from pydantic import BaseModel
+from typing import Any, Optional
+import hashlib
+import random
+import time
+
+# Vocabulary of the simulated paragraphs, so that the output looks like a report
+VOCABULARY = [
+    "casos",
+    "SRAG",
+    "Brasil",
+    "aumento",
+    "redução",
+    "internações",
+    "UTI",
+    "óbitos",
+    "vacinação",
+    "influenza",
+    "período",
+    "semana",
+    "tendência",
+    "dados",
+    "notificações",
+    "estável",
+    "taxa",
+    "regiões",
+]
+
+
+class FakeChatModel(BaseChatModel):
+    """
+    Purpose: Deterministic local stand-in for the main agent LLM.
+    The same messages always produce the same paragraph, and each call sleeps
+    for the simulated time to first token plus the completion tokens at the
+    simulated token rate, so graph timings are stable without a provider.
+    Args:
+        latency: float - Simulated time to first token, in seconds.
+        tokens_per_second: float - Simulated generation rate (0 disables the delay).
+        words_per_paragraph: int - Number of words of each generated paragraph.
+    """
+
+    latency: float = 0.0
+    tokens_per_second: float = 0.0
+    words_per_paragraph: int = 80
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat-model"
+
+    @staticmethod
+    def _get_seed(content: str) -> int:
+        return int(hashlib.sha256(content.encode("utf-8")).hexdigest()[:16], 16)
+
+    def _generate_paragraph(self, content: str) -> str:
+        rng = random.Random(self._get_seed(content))
+        words = [rng.choice(VOCABULARY) for _ in range(self.words_per_paragraph)]
+        return " ".join(words).capitalize() + "."
+
+    def _simulate_generation(self, completion_tokens: int) -> None:
+        delay = self.latency
+        if self.tokens_per_second > 0:
+            delay += completion_tokens / self.tokens_per_second
+        if delay > 0:
+            time.sleep(delay)
+
+    @staticmethod
+    def _count_tokens(text: str) -> int:
+        return len(text) // 4 + 1
+
+    def _generate(
+        self,
+        messages: list[BaseMessage],
+        stop: Optional[list[str]] = None,
+        run_manager: Any = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        prompt = "\n".join(str(message.content) for message in messages)
+        text = self._generate_paragraph(prompt)
+        prompt_tokens = self._count_tokens(prompt)
+        completion_tokens = self._count_tokens(text)
+        self._simulate_generation(completion_tokens)
+        message = AIMessage(
+            content=text,
+            usage_metadata={
+                "input_tokens": prompt_tokens,
+                "output_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            },
+        )
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def bind_tools(self, tools: Any, **kwargs: Any) -> "FakeChatModel":
+        return self
+
+    def with_structured_output(
+        self, schema: type[BaseModel], **kwargs: Any
+    ) -> Runnable:
+        """
+        Purpose: Return a runnable that fills every string field of the schema.
+        Args:
+            schema: type[BaseModel] - The response format (e.g. MainAgentResponse).
+        Returns:
+            Runnable - Runnable that returns a valid schema instance.
+        """
+
+        def _build_response(messages: Any) -> BaseModel:
+            if hasattr(messages, "to_messages"):
+                messages = messages.to_messages()
+            prompt = "\n".join(str(message.content) for message in messages)
+            fields = {
+                field_name: self._generate_paragraph(f"{field_name}\n{prompt}")
+                for field_name in schema.model_fields
+            }
+            self._simulate_generation(
+                sum(self._count_tokens(text) for text in fields.values())
+            )
+            return schema(**fields)
+
+        return RunnableLambda(_build_response)
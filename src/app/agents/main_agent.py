@@ -1,55 +1,136 @@
 from langchain_openai import ChatOpenAI
 from langgraph.prebuilt import create_react_agent
+from langchain_core.messages import AIMessage
 from typing import Dict, Any
+import json
 import logging
 import os
+import threading
+import time
 import traceback
 from src.app.responses.main_agent_response import MainAgentResponse
 from src.app.agents.artifacts.prompt_hub import PromptHub
+from src.app.agents.fake_chat_model import FakeChatModel
+from src.utils.metrics import record_llm_usage
+from src.utils.tracing import span
 from pydantic import BaseModel
 
 logger = logging.getLogger(__name__)
 
+# Data block each section should focus on; every section receives the same
+# serialized data so that the prompt prefix is shared between calls.
+SECTION_DATA_KEYS = {
+    "p-last-30-days-analysis": "monthly",
+    "p-last-12-months-analysis": "one_year_interval",
+    "p-taxa-de-ocupacao-uti": "uti_occupancy",
+}
+
+
+def _serialize_context(value: Any) -> str:
+    """
+    Purpose: Serialize the prompt context deterministically.
+    Args:
+        value: Any - The news or data to be serialized.
+    Returns:
+        str - A byte-identical JSON string for identical inputs.
+    """
+    return json.dumps(value, ensure_ascii=False, sort_keys=True, default=str)
+
 
 class MainAgent:
     def __init__(self):
-        self.llm = ChatOpenAI(
-            model=os.getenv("MAIN_AGENT_MODEL"),
-            max_completion_tokens=30000,
-            #   reasoning_effort="low",
-            temperature=0,
-            api_key=os.getenv("PROVIDER_API_KEY"),
-            base_url=os.getenv("PROVIDER_BASE_URL")
-        )
+        if os.getenv("MAIN_AGENT_PROVIDER", "openai").lower() == "fake":
+            # Deterministic stand-in for benchmarks and CPU-only runs
+            self.llm = FakeChatModel(
+                latency=float(os.getenv("FAKE_LLM_LATENCY", "0")),
+                tokens_per_second=float(os.getenv("FAKE_LLM_TOKENS_PER_SECOND", "0")),
+            )
+        else:
+            self.llm = ChatOpenAI(
+                model=os.getenv("MAIN_AGENT_MODEL"),
+                max_completion_tokens=30000,
+                #   reasoning_effort="low",
+                temperature=0,
+                api_key=os.getenv("PROVIDER_API_KEY"),
+                base_url=os.getenv("PROVIDER_BASE_URL")
+            )
         self.tools = []
-        self.agent = None
         self.prompt_hub = PromptHub()
+        # Agents are compiled once per response format and shared between runs
+        self._agents: dict[Any, Any] = {}
+        self._agents_lock = threading.Lock()
 
-    def _generate_agent(self, response_format: BaseModel = None) -> None:
+    def _generate_agent(self, response_format: BaseModel = None) -> Any:
         """
-        Purpose: Generate an agent that will be used to analyze the data.
+        Purpose: Get the agent that will be used to analyze the data.
         Args:
             response_format: BaseModel - The response format of the agent.
         Returns:
-            None
+            CompiledStateGraph - The agent, compiled on first use.
+        """
+        with self._agents_lock:
+            if response_format not in self._agents:
+                self._agents[response_format] = create_react_agent(
+                    model=self.llm, tools=self.tools, response_format=response_format
+                )
+            return self._agents[response_format]
+
+    def _record_token_usage(
+        self, call_name: str, response: Dict[str, Any], elapsed: float
+    ) -> Dict[str, Any]:
+        """
+        Purpose: Record the cached and uncached prompt tokens of an agent call.
+        Args:
+            call_name: str - The name of the call (section or final report).
+            response: Dict[str, Any] - The agent response with its messages.
+            elapsed: float - The call duration in seconds.
+        Returns:
+            Dict[str, Any] - The token usage of the call.
         """
-        self.agent = create_react_agent(
-            model=self.llm, tools=self.tools, response_format=response_format
+        usage = {
+            "call": call_name,
+            "prompt_tokens": 0,
+            "cached_prompt_tokens": 0,
+            "completion_tokens": 0,
+            "elapsed_seconds": round(elapsed, 3),
+        }
+        for message in response.get("messages", []):
+            if not isinstance(message, AIMessage) or not message.usage_metadata:
+                continue
+            metadata = message.usage_metadata
+            usage["prompt_tokens"] += metadata.get("input_tokens", 0)
+            usage["completion_tokens"] += metadata.get("output_tokens", 0)
+            usage["cached_prompt_tokens"] += metadata.get(
+                "input_token_details", {}
+            ).get("cache_read", 0)
+        usage["uncached_prompt_tokens"] = (
+            usage["prompt_tokens"] - usage["cached_prompt_tokens"]
         )
+        record_llm_usage(usage["prompt_tokens"], usage["completion_tokens"])
+        logger.info(
+            f"Call {call_name} prompt tokens: {usage['prompt_tokens']} "
+            f"(cached: {usage['cached_prompt_tokens']}, "
+            f"uncached: {usage['uncached_prompt_tokens']}), "
+            f"completion tokens: {usage['completion_tokens']}, "
+            f"elapsed: {usage['elapsed_seconds']}s"
+        )
+        return usage
 
     def _generate_section_analysis(
         self,
         news: str,
-        srag_data: dict[str, Any],
+        srag_data: str,
         section_name: str,
         sections: list[str],
+        token_usage: list[dict[str, Any]],
     ) -> Dict[str, Any]:
         """
         Args:
-            news: str - The news to be analyzed.
-            srag_data: dict[str, Any] - The data to be used in the analysis.
+            news: str - The serialized news to be analyzed.
+            srag_data: str - The serialized data to be used in the analysis.
             section_name: str - The name of the section to be analyzed.
             sections: list[str] - The list of sections that were already analyzed.
+            token_usage: list[dict[str, Any]] - The token usage of the run, appended to.
         Returns:
             Dict[str, Any] - The analysis of the section.
         """
@@ -60,18 +141,30 @@ class MainAgent:
             {
                 "srag_news": news,
                 "srag_data": srag_data,
-                "sections": sections,
+                "sections": list(sections),
                 "section_name": section_name,
+                "section_data": SECTION_DATA_KEYS.get(section_name, "all_years"),
             }
         )
-        self._generate_agent()
-        response = self.agent.invoke(prompt_value)
+        agent = self._generate_agent()
+        with span("llm", call=section_name) as llm_span:
+            start = time.perf_counter()
+            response = agent.invoke(prompt_value)
+            usage = self._record_token_usage(
+                section_name, response, time.perf_counter() - start
+            )
+            token_usage.append(usage)
+            if llm_span is not None:
+                llm_span["attributes"].update(usage)
         return response
 
-    def _generate_final_report(self, sections: list[str]) -> Dict[str, Any]:
+    def _generate_final_report(
+        self, sections: list[str], token_usage: list[dict[str, Any]]
+    ) -> Dict[str, Any]:
         """
         Args:
             sections: list[str] - The list of sections that were already analyzed and their analysis.
+            token_usage: list[dict[str, Any]] - The token usage of the run, appended to.
         Returns:
             Dict[str, Any] - The final report.
         """
@@ -79,9 +172,17 @@ class MainAgent:
             prompt_name="final_report_prompt_template"
         )
         prompt_value = prompt_template.invoke({"sections": sections})
-        self._generate_agent(response_format=MainAgentResponse)
-        response = self.agent.invoke(prompt_value).get("structured_response")
-        return response
+        agent = self._generate_agent(response_format=MainAgentResponse)
+        with span("llm", call="final_report") as llm_span:
+            start = time.perf_counter()
+            response = agent.invoke(prompt_value)
+            usage = self._record_token_usage(
+                "final_report", response, time.perf_counter() - start
+            )
+            token_usage.append(usage)
+            if llm_span is not None:
+                llm_span["attributes"].update(usage)
+        return response.get("structured_response")
 
     def execute(self, state: Dict[str, Any]) -> Dict[str, Any]:
         """Process messages through the agent and return updated state."""
@@ -93,24 +194,28 @@ class MainAgent:
             sections = state["sections"]
 
             concluded_sections = {}
+            token_usage = []
+            # Serialized once so every section call shares the same prompt prefix
+            news_context = _serialize_context(news)
+            data_context = _serialize_context(srag_data)
             logger.info("Generating sections analysis")
             for section in sections:
-                data = srag_data
-                if section == "p-last-30-days-analysis":
-                    data = srag_data["monthly"]
-                elif section == "p-last-12-months-analysis":
-                    data = srag_data["one_year_interval"]
                 section_analysis = self._generate_section_analysis(
-                    news, data, section, concluded_sections.keys()
+                    news_context,
+                    data_context,
+                    section,
+                    concluded_sections.keys(),
+                    token_usage,
                 )
                 concluded_sections[section] = section_analysis
                 logger.info(f"Section {section} analysis generated")
             logger.info("Generating final report")
-            final_report = self._generate_final_report(concluded_sections)
+            final_report = self._generate_final_report(concluded_sections, token_usage)
             state["report"] = final_report
             state["sections"] = concluded_sections
             state["news"] = news
             state["data"] = srag_data
+            state["token_usage"] = token_usage
             state["stage"] = "end"
             return state
         except Exception as e:
@@ -0,0 +1,145 @@
+"""
+Report generation over a date range.
+The daily aggregates of the whole range are fetched in one pass and sliced per
+report, then the reports are generated by a worker pool, each one writing to
+its own output directory.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from dateutil.relativedelta import relativedelta
+from typing import Any
+from src.utils.db import enable_connection_pool
+import logging
+import os
+import re
+import traceback
+
+logger = logging.getLogger(__name__)
+
+RANGE_OUTPUT_ROOT = "src/data/reports/range"
+
+
+def parse_step(step: str) -> timedelta:
+    """
+    Purpose: Parse a step between report dates (e.g. "7d", "2w").
+    Args:
+        step: str - Number of days (d) or weeks (w).
+    Returns:
+        timedelta - The step.
+    """
+    match = re.fullmatch(r"\s*(\d+)\s*([dw])\s*", step.lower())
+    if not match or int(match.group(1)) == 0:
+        raise ValueError(f"Invalid step: {step}, expected e.g. 7d or 2w")
+    amount, unit = int(match.group(1)), match.group(2)
+    return timedelta(days=amount) if unit == "d" else timedelta(weeks=amount)
+
+
+def get_report_dates(start_date: str, end_date: str, step: timedelta) -> list[str]:
+    """
+    Purpose: Get the report dates from start_date to end_date (inclusive).
+    Args:
+        start_date: str - The first report date (YYYY-MM-DD).
+        end_date: str - The last possible report date (YYYY-MM-DD).
+        step: timedelta - The step between report dates.
+    Returns:
+        list[str] - The report dates.
+    """
+    current = datetime.strptime(start_date, "%Y-%m-%d")
+    end = datetime.strptime(end_date, "%Y-%m-%d")
+    if current > end:
+        raise ValueError(f"Start date {start_date} is after end date {end_date}")
+    report_dates = []
+    while current <= end:
+        report_dates.append(current.strftime("%Y-%m-%d"))
+        current += step
+    return report_dates
+
+
+def _run_range_report(
+    report_date: str,
+    sections: list[str],
+    aggregates: Any,
+    output_root: str,
+    report_format: str,
+) -> dict[str, Any]:
+    from src.app.Graph import get_report_path, run_report
+
+    output_dir = os.path.join(output_root, report_date)
+    try:
+        os.makedirs(output_dir, exist_ok=True)
+        result = run_report(
+            report_date,
+            sections,
+            output_dir=output_dir,
+            aggregates=aggregates,
+            report_format=report_format,
+        )
+        status = "error" if result.get("stage") == "error" else "success"
+    except Exception as e:
+        logger.error(f"Error generating report for {report_date}: {e}")
+        traceback.print_exc()
+        status = "error"
+    return {
+        "report_date": report_date,
+        "status": status,
+        "report_path": f"{get_report_path({'output_dir': output_dir})}.{report_format}",
+    }
+
+
+def generate_report_range(
+    start_date: str,
+    end_date: str,
+    step: timedelta,
+    sections: list[str],
+    workers: int = 2,
+    output_root: str = RANGE_OUTPUT_ROOT,
+    report_format: str = "pdf",
+) -> list[dict[str, Any]]:
+    """
+    Purpose: Generate one report per date of a range, sharing a single
+    aggregate query and a warm report stack between them.
+    Args:
+        start_date: str - The first report date (YYYY-MM-DD).
+        end_date: str - The last possible report date (YYYY-MM-DD).
+        step: timedelta - The step between report dates.
+        sections: list[str] - The report sections.
+        workers: int - Reports generated concurrently.
+        output_root: str - Directory of the per-date output directories.
+        report_format: str - The report format: "pdf", "html" or "md".
+    Returns:
+        list[dict[str, Any]] - Date, status and path of each report.
+    """
+    from src.app.Graph import get_compiled_graph
+    from src.app.tools.query_data_tool import DailyAggregates
+
+    report_dates = get_report_dates(start_date, end_date, step)
+    logger.info(
+        f"Generating {len(report_dates)} reports from {report_dates[0]} "
+        f"to {report_dates[-1]} with {workers} workers"
+    )
+    enable_connection_pool(minconn=1, maxconn=workers * 2)
+    get_compiled_graph()
+
+    # The widest window of a report is the 4 years before its date
+    aggregates_start = (
+        datetime.strptime(report_dates[0], "%Y-%m-%d") - relativedelta(years=4)
+    ).strftime("%Y-%m-%d")
+    aggregates = DailyAggregates.fetch(aggregates_start, report_dates[-1])
+
+    with ThreadPoolExecutor(
+        max_workers=workers, thread_name_prefix="report-range"
+    ) as executor:
+        results = list(
+            executor.map(
+                lambda report_date: _run_range_report(
+                    report_date, sections, aggregates, output_root, report_format
+                ),
+                report_dates,
+            )
+        )
+    failed = [result["report_date"] for result in results if result["status"] != "success"]
+    if failed:
+        logger.error(f"Reports failed for: {', '.join(failed)}")
+    logger.info(f"Generated {len(results) - len(failed)}/{len(results)} reports")
+    return results
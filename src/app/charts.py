@@ -0,0 +1,191 @@
+"""
+Chart renderer of the report.
+Charts are drawn with matplotlib's object-oriented API (no pyplot global
+state), so they can be rendered concurrently, and in parallel by a pool of
+worker processes when there is more than one chart to render.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any
+import csv
+import io
+import logging
+import multiprocessing
+import os
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Raster formats are saved at CHART_DPI, vector formats (pdf, svg) are resolution independent
+CHART_FORMATS = ("png", "pdf", "svg")
+
+# Formats pdflatex can include, svg charts are only for the html and md reports
+LATEX_CHART_FORMATS = ("png", "pdf")
+
+# Styled figure templates, a chart picks one by name
+CHART_TEMPLATES: dict[str, dict[str, Any]] = {
+    "bar": {
+        "figsize": (10, 6),
+        "color": "#1f77b4",
+        "grid_axis": "y",
+        "title_size": 14,
+        "label_size": 9,
+        "rotation": 45,
+    },
+    "line": {
+        "figsize": (10, 6),
+        "color": None,
+        "grid_axis": "both",
+        "title_size": 14,
+        "label_size": 9,
+        "rotation": 45,
+    },
+    # Two lines (e.g. observed and estimated) and the interval of the second one
+    # from the last two value columns
+    "band": {
+        "figsize": (10, 6),
+        "color": "#1f77b4",
+        "grid_axis": "both",
+        "title_size": 14,
+        "label_size": 9,
+        "rotation": 45,
+    },
+}
+
+# Figures of the current thread, created once per template and cleared between charts
+_figures = threading.local()
+_executor: ProcessPoolExecutor = None
+_executor_lock = threading.Lock()
+
+
+def get_chart_format(report_format: str = "pdf") -> str:
+    chart_format = os.getenv("CHART_FORMAT", "png").lower()
+    if chart_format not in CHART_FORMATS:
+        logger.warning(f"Invalid CHART_FORMAT {chart_format}, using png")
+        return "png"
+    if report_format == "pdf" and chart_format not in LATEX_CHART_FORMATS:
+        logger.warning(f"CHART_FORMAT {chart_format} can't be included by LaTeX, using pdf")
+        return "pdf"
+    return chart_format
+
+
+def get_chart_dpi() -> int:
+    return int(os.getenv("CHART_DPI", "300"))
+
+
+def _parse_csv(csv_data: str) -> tuple[list[str], list[str], list[list[float]]]:
+    """
+    Purpose: Parse a query csv (first column the group, the others the values).
+    Args:
+        csv_data: str - The csv string.
+    Returns:
+        tuple - The header, the group labels and the values of each value column.
+    """
+    rows = list(csv.reader(io.StringIO(csv_data)))
+    header, rows = rows[0], [row for row in rows[1:] if row]
+    labels = [row[0] for row in rows]
+    series = [[float(row[i]) for row in rows] for i in range(1, len(header))]
+    return header, labels, series
+
+
+def _get_figure(template_name: str):
+    from matplotlib.figure import Figure
+
+    template = CHART_TEMPLATES[template_name]
+    figures = _figures.__dict__
+    figure = figures.get(template_name)
+    if figure is None:
+        figure = Figure(figsize=template["figsize"])
+        figures[template_name] = figure
+    figure.clear()
+    return figure
+
+
+def render_chart(chart: dict[str, Any]) -> str:
+    """
+    Purpose: Render a chart to a file.
+    Args:
+        chart: dict[str, Any] - The chart: csv_data, title, path, format, dpi and
+            template ("bar" for one value column, "line" for more by default).
+    Returns:
+        str - The chart path.
+    """
+    header, labels, series = _parse_csv(chart["csv_data"])
+    template_name = chart.get("template") or ("bar" if len(series) == 1 else "line")
+    template = CHART_TEMPLATES[template_name]
+    figure = _get_figure(template_name)
+    ax = figure.add_subplot()
+    positions = range(len(labels))
+    if template_name == "bar":
+        ax.bar(positions, series[0], color=template["color"], label=header[1])
+    elif template_name == "band":
+        ax.plot(positions, series[0], color="gray", linestyle="--", label=header[1])
+        ax.plot(positions, series[1], color=template["color"], label=header[2])
+        ax.fill_between(
+            positions,
+            series[2],
+            series[3],
+            color=template["color"],
+            alpha=0.2,
+            label=f"{header[3]} - {header[4]}",
+        )
+        ax.legend()
+    else:
+        for name, values in zip(header[1:], series):
+            ax.plot(positions, values, color=template["color"], label=name)
+        ax.legend()
+    ax.set_xticks(list(positions), labels, rotation=template["rotation"])
+    ax.tick_params(labelsize=template["label_size"])
+    ax.set_xlabel(header[0])
+    ax.grid(axis=template["grid_axis"], alpha=0.3)
+    ax.set_axisbelow(True)
+    ax.set_title(chart["title"], fontsize=template["title_size"])
+    figure.tight_layout()
+
+    path = chart["path"]
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    figure.savefig(
+        tmp_path,
+        format=chart.get("format", "png"),
+        dpi=chart.get("dpi", 300),
+        bbox_inches="tight",
+    )
+    os.replace(tmp_path, path)
+    return path
+
+
+def get_chart_executor() -> ProcessPoolExecutor | None:
+    """
+    Purpose: Get the worker processes shared by every report of the process,
+    started on first use. CHART_WORKERS sets their number (0 or 1 renders in
+    the calling process).
+    Returns:
+        ProcessPoolExecutor | None - The pool, None when rendering in process.
+    """
+    global _executor
+    workers = int(os.getenv("CHART_WORKERS", "2"))
+    if workers <= 1:
+        return None
+    with _executor_lock:
+        if _executor is None:
+            # spawn: forking a process that runs threads (service, ranges) is unsafe
+            _executor = ProcessPoolExecutor(
+                max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+            )
+        return _executor
+
+
+def render_charts(charts: list[dict[str, Any]]) -> list[str]:
+    """
+    Purpose: Render charts, in parallel worker processes when there is more
+    than one and CHART_WORKERS allows it.
+    Args:
+        charts: list[dict[str, Any]] - The charts (see render_chart).
+    Returns:
+        list[str] - The chart paths, in the same order.
+    """
+    executor = get_chart_executor() if len(charts) > 1 else None
+    if executor is None:
+        return [render_chart(chart) for chart in charts]
+    return list(executor.map(render_chart, charts))
@@ -0,0 +1,184 @@
+"""
+LaTeX build of the report.
+Every build runs in its own temporary directory next to the report and only
+the final .tex and PDF are published, each with an atomic rename, so that
+concurrent reports never share .aux/.log files or see a half-written PDF.
+The document class and packages are compiled once into a format file, cached
+by their content, and loaded by later builds instead of parsing the packages
+again.
+"""
+
+from functools import lru_cache
+from typing import Any
+import hashlib
+import logging
+import os
+import shutil
+import subprocess
+import tempfile
+
+logger = logging.getLogger(__name__)
+
+
+def get_latex_compiler() -> str:
+    return os.getenv("LATEX_COMPILER", "pdflatex")
+
+
+def get_latex_passes() -> int:
+    """
+    Returns:
+        int - The compile passes (LATEX_PASSES), 2 resolves labels and page refs.
+    """
+    return max(1, int(os.getenv("LATEX_PASSES", "2")))
+
+
+@lru_cache
+def _get_compiler_version(compiler: str) -> str:
+    result = subprocess.run(
+        [compiler, "--version"], capture_output=True, text=True, check=False
+    )
+    return result.stdout.splitlines()[0] if result.stdout else compiler
+
+
+def _run_compiler(args: list[str], cwd: str, env: dict[str, str] = None) -> None:
+    result = subprocess.run(
+        args,
+        cwd=cwd,
+        env=env,
+        stdin=subprocess.DEVNULL,
+        capture_output=True,
+        text=True,
+        errors="replace",
+        check=False,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(
+            f"{args[0]} failed with code {result.returncode}: {result.stdout[-2000:]}"
+        )
+
+
+def _split_preamble(doc: Any, tex: str) -> tuple[str, str] | None:
+    """
+    Purpose: Split the document into the part that goes into the format file
+    (class and packages) and the rest, which changes between reports.
+    Args:
+        doc: Document - The pylatex document.
+        tex: str - The document source.
+    Returns:
+        tuple[str, str] | None - The format source and the body, None if the
+            source doesn't start with the class and packages.
+    """
+    format_source = f"{doc.documentclass.dumps()}%\n{doc.dumps_packages()}"
+    if not tex.startswith(format_source):
+        return None
+    return format_source, tex[len(format_source) :]
+
+
+def _get_format(compiler: str, format_source: str, format_dir: str) -> str | None:
+    """
+    Purpose: Get the format file of a preamble, compiling it on first use.
+    Args:
+        compiler: str - The LaTeX compiler.
+        format_source: str - The class and packages of the document.
+        format_dir: str - The format cache directory.
+    Returns:
+        str | None - The format name (file name without .fmt), None if it
+            couldn't be compiled.
+    """
+    key = hashlib.sha256(
+        f"{_get_compiler_version(compiler)}\n{format_source}".encode("utf-8")
+    ).hexdigest()[:32]
+    format_name = f"report-{key}"
+    if os.path.exists(os.path.join(format_dir, f"{format_name}.fmt")):
+        return format_name
+    os.makedirs(format_dir, exist_ok=True)
+    build_dir = tempfile.mkdtemp(prefix=".format-", dir=format_dir)
+    try:
+        with open(os.path.join(build_dir, "preamble.tex"), "w", encoding="utf-8") as f:
+            f.write(format_source + "\n\\dump\n")
+        _run_compiler(
+            [
+                compiler,
+                "-ini",
+                "-interaction=nonstopmode",
+                "-halt-on-error",
+                f"-jobname={format_name}",
+                f"&{compiler}",
+                "preamble.tex",
+            ],
+            cwd=build_dir,
+        )
+        # Published with a rename, concurrent builds compile the same file at worst
+        os.replace(
+            os.path.join(build_dir, f"{format_name}.fmt"),
+            os.path.join(format_dir, f"{format_name}.fmt"),
+        )
+        logger.info(f"LaTeX format {format_name} saved to: {format_dir}")
+        return format_name
+    except Exception as e:
+        logger.warning(f"Error compiling LaTeX format, building without it: {e}")
+        return None
+    finally:
+        shutil.rmtree(build_dir, ignore_errors=True)
+
+
+def build_pdf(doc: Any, report_path: str, passes: int = None) -> str:
+    """
+    Purpose: Compile a pylatex document in an isolated build directory and
+    publish its .tex and PDF atomically.
+    Args:
+        doc: Document - The pylatex document.
+        report_path: str - The report path (without extension).
+        passes: int | None - The compile passes, defaults to LATEX_PASSES.
+    Returns:
+        str - The PDF path.
+    """
+    compiler = get_latex_compiler()
+    if shutil.which(compiler) is None:
+        raise RuntimeError(f"LaTeX compiler {compiler} was not found")
+    passes = passes or get_latex_passes()
+    report_dir = os.path.abspath(os.path.dirname(report_path) or ".")
+    os.makedirs(report_dir, exist_ok=True)
+
+    tex = doc.dumps()
+    env = None
+    compiler_args = [compiler]
+    source = tex
+    split = _split_preamble(doc, tex)
+    if split is not None and os.getenv("LATEX_FORMAT_CACHE", "true").lower() != "false":
+        format_dir = os.path.abspath(
+            os.getenv("LATEX_FORMAT_DIR", "src/data/cache/latex")
+        )
+        format_source, body = split
+        format_name = _get_format(compiler, format_source, format_dir)
+        if format_name:
+            env = {**os.environ, "TEXFORMATS": f"{format_dir}{os.pathsep}"}
+            compiler_args.append(f"-fmt={format_name}")
+            source = body
+
+    # Built next to the report (same filesystem, so the rename is atomic) and
+    # run from the report directory, so relative chart paths resolve
+    build_dir = tempfile.mkdtemp(prefix=".build-", dir=report_dir)
+    try:
+        with open(os.path.join(build_dir, "report.tex"), "w", encoding="utf-8") as f:
+            f.write(source)
+        for _ in range(passes):
+            _run_compiler(
+                [
+                    *compiler_args,
+                    "-interaction=nonstopmode",
+                    "-halt-on-error",
+                    f"-output-directory={build_dir}",
+                    os.path.join(build_dir, "report.tex"),
+                ],
+                cwd=report_dir,
+                env=env,
+            )
+        with open(os.path.join(build_dir, "full.tex"), "w", encoding="utf-8") as f:
+            f.write(tex)
+        os.replace(os.path.join(build_dir, "full.tex"), f"{report_path}.tex")
+        os.replace(os.path.join(build_dir, "report.pdf"), f"{report_path}.pdf")
+        logger.info(f"Report PDF built in {passes} passes: {report_path}.pdf")
+        return f"{report_path}.pdf"
+    finally:
+        shutil.rmtree(build_dir, ignore_errors=True)
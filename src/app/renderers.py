@@ -0,0 +1,331 @@
+"""
+Report renderers.
+Each renderer turns the final report (MainAgentResponse) and its chart
+artifacts into one file: "pdf" through LaTeX for official releases, "html"
+and "md" for previews that render in milliseconds without a TeX install.
+"""
+
+from abc import ABC, abstractmethod
+from datetime import datetime
+from typing import Any
+import html
+import logging
+import os
+from src.utils.artifact_cache import (
+    ArtifactCache,
+    get_artifact_entry,
+    get_artifact_key,
+    get_file_digest,
+)
+
+logger = logging.getLogger(__name__)
+
+REPORT_TITLE = "RELATÓRIO TÉCNICO DE SAÚDE PÚBLICA - SRAG BRASIL"
+
+# Paragraphs (MainAgentResponse fields) of each subsection of the analysis
+REPORT_SUBSECTIONS = [
+    (
+        "Geral",
+        [
+            "p_aumento_dos_casos",
+            "p_taxa_de_mortalidade",
+            "p_taxa_de_ocupacao_uti",
+            "p_taxa_de_vacinacao",
+        ],
+    ),
+    ("Relação Mensal e Anual", ["p_last_30_days_analysis", "p_last_12_months_analysis"]),
+]
+
+# Charts of the "Relação Mensal e Anual" subsection: name, caption and label
+REPORT_FIGURES = [
+    ("monthly-analysis", "Análise Mensal", "fig:casos-30-dias"),
+    ("yearly-analysis", "Análise Anual", "fig:casos-12-meses"),
+    ("uti-occupancy-analysis", "Ocupação de UTI", "fig:ocupacao-uti-12-meses"),
+    ("nowcast-analysis", "Estimativa dos Casos Recentes", "fig:nowcast-30-dias"),
+]
+
+# Chart formats a browser can show inline
+BROWSER_IMAGE_EXTENSIONS = (".png", ".svg")
+
+
+def _get_formatted_date(report_date: str) -> str:
+    return datetime.strptime(report_date, "%Y-%m-%d").strftime("%d de %B de %Y")
+
+
+def _get_graphics(state: dict[str, Any], report_path: str) -> dict[str, str]:
+    """
+    Purpose: Get the chart paths relative to the report, by chart name.
+    Args:
+        state: dict[str, Any] - The report state.
+        report_path: str - The report path (without extension).
+    Returns:
+        dict[str, str] - The relative chart paths (with "/" separators).
+    """
+    return {
+        os.path.splitext(os.path.basename(path))[0]: os.path.relpath(
+            path, os.path.dirname(report_path) or "."
+        ).replace(os.sep, "/")
+        for path in state.get("graphics", [])
+    }
+
+
+def _get_paragraphs(text: str) -> list[str]:
+    return [paragraph.strip() for paragraph in text.split("\n\n") if paragraph.strip()]
+
+
+def _write_text(path: str, content: str) -> None:
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(content)
+    os.replace(tmp_path, path)
+
+
+class ReportRenderer(ABC):
+    """
+    Purpose: Base class of the report renderers.
+    """
+
+    format: str = None
+    extension: str = None
+
+    @abstractmethod
+    def render(self, state: dict[str, Any], report_path: str) -> str:
+        """
+        Purpose: Render the report of a state and record its artifacts.
+        Args:
+            state: dict[str, Any] - The report state, with the report and graphics.
+            report_path: str - The report path (without extension).
+        Returns:
+            str - The report file path.
+        """
+
+    def _write(self, state: dict[str, Any], report_path: str, content: str) -> str:
+        path = f"{report_path}.{self.extension}"
+        _write_text(path, content)
+        state.setdefault("artifacts", []).append(
+            get_artifact_entry(
+                self.format,
+                get_artifact_key(self.format, content),
+                False,
+                {os.path.basename(path): path},
+            )
+        )
+        return path
+
+
+class MarkdownRenderer(ReportRenderer):
+    format = "md"
+    extension = "md"
+
+    def render(self, state: dict[str, Any], report_path: str) -> str:
+        report = state["report"]
+        graphics = _get_graphics(state, report_path)
+        lines = [
+            f"# {REPORT_TITLE}",
+            "",
+            f"*{_get_formatted_date(state['report_date'])}*",
+            "",
+            "## Análise",
+            "",
+        ]
+        for subsection, fields in REPORT_SUBSECTIONS:
+            lines += [f"### {subsection}", ""]
+            for field in fields:
+                for paragraph in _get_paragraphs(getattr(report, field)):
+                    lines += [paragraph, ""]
+        for name, caption, _ in REPORT_FIGURES:
+            graphic = graphics.get(name)
+            if graphic is None:
+                continue
+            if graphic.endswith(BROWSER_IMAGE_EXTENSIONS):
+                lines += [f"![{caption}]({graphic})", ""]
+            else:
+                lines += [f"[{caption}]({graphic})", ""]
+        return self._write(state, report_path, "\n".join(lines))
+
+
+class HtmlRenderer(ReportRenderer):
+    format = "html"
+    extension = "html"
+
+    def render(self, state: dict[str, Any], report_path: str) -> str:
+        report = state["report"]
+        graphics = _get_graphics(state, report_path)
+        body = [
+            f"<h1>{html.escape(REPORT_TITLE)}</h1>",
+            f'<p class="date">{html.escape(_get_formatted_date(state["report_date"]))}</p>',
+            "<h2>Análise</h2>",
+        ]
+        for subsection, fields in REPORT_SUBSECTIONS:
+            body.append(f"<h3>{html.escape(subsection)}</h3>")
+            for field in fields:
+                for paragraph in _get_paragraphs(getattr(report, field)):
+                    body.append(f"<p>{html.escape(paragraph)}</p>")
+        figures = []
+        for name, caption, label in REPORT_FIGURES:
+            graphic = graphics.get(name)
+            if graphic is None:
+                continue
+            src, caption = html.escape(graphic, quote=True), html.escape(caption)
+            if graphic.endswith(BROWSER_IMAGE_EXTENSIONS):
+                content = f'<img src="{src}" alt="{caption}">'
+            else:
+                content = f'<a href="{src}">{caption}</a>'
+            figures.append(
+                f'<figure id="{label}">{content}<figcaption>{caption}</figcaption></figure>'
+            )
+        if figures:
+            body.append(f'<div class="figures">{"".join(figures)}</div>')
+        content = "\n".join(
+            [
+                "<!DOCTYPE html>",
+                '<html lang="pt-BR">',
+                "<head>",
+                '<meta charset="utf-8">',
+                f"<title>{html.escape(REPORT_TITLE)}</title>",
+                "<style>"
+                "body{font-family:sans-serif;max-width:50rem;margin:2rem auto;line-height:1.5}"
+                "h1{text-align:center}.date{text-align:center}"
+                ".figures{display:flex;gap:1rem}figure{flex:1;margin:0;text-align:center}"
+                "img{max-width:100%}"
+                "</style>",
+                "</head>",
+                "<body>",
+                *body,
+                "</body>",
+                "</html>",
+                "",
+            ]
+        )
+        return self._write(state, report_path, content)
+
+
+class LatexRenderer(ReportRenderer):
+    format = "pdf"
+    extension = "pdf"
+
+    def render(self, state: dict[str, Any], report_path: str) -> str:
+        from pylatex import Document, Section, Subsection, Command, Figure, MiniPage
+        from pylatex.utils import NoEscape
+        from src.app.latex_build import build_pdf, get_latex_compiler, get_latex_passes
+
+        # Define document class
+        p_aumento_dos_casos = state["report"].p_aumento_dos_casos
+        p_taxa_de_mortalidade = state["report"].p_taxa_de_mortalidade
+        p_taxa_de_ocupacao_uti = state["report"].p_taxa_de_ocupacao_uti
+        p_taxa_de_vacinacao = state["report"].p_taxa_de_vacinacao
+        p_last_30_days_analysis = state["report"].p_last_30_days_analysis
+        p_last_12_months_analysis = state["report"].p_last_12_months_analysis
+
+        formatted_date = _get_formatted_date(state["report_date"])
+
+        ##Latex Configuration
+        geometry_options = {"margin": "1in"}
+        doc = Document(documentclass="article", geometry_options=geometry_options)
+
+        # Add required packages
+        doc.packages.append(NoEscape(r"\usepackage[utf8]{inputenc}"))
+        doc.packages.append(NoEscape(r"\usepackage[titletoc,title]{appendix}"))
+        doc.packages.append(NoEscape(r"\usepackage{graphicx,float}"))
+
+        # Title
+        doc.preamble.append(
+            Command(
+                "title",
+                NoEscape(rf"\textbf{{{REPORT_TITLE}}}"),
+            )
+        )
+        doc.preamble.append(Command("date", formatted_date))
+        doc.append(NoEscape(r"\maketitle"))
+
+        # Section: Análise
+        with doc.create(Section("Análise")):
+            with doc.create(Subsection("Geral")):
+                doc.append(p_aumento_dos_casos + "\n")
+                doc.append(p_taxa_de_mortalidade + "\n")
+                doc.append(p_taxa_de_ocupacao_uti + "\n")
+                doc.append(p_taxa_de_vacinacao + "\n")
+
+                # with doc.create(Figure(position="H")) as fig:
+                #     for caption, label in [
+                #         ("Total de Casos", "fig:casos-total-por-ano"),
+                #         ("Total de Óbitos", "fig:obitos-total-por-ano"),
+                #         ("Ocupação de UTI", "fig:uti-total-por-ano"),
+                #         ("Taxa de Vacinação", "fig:vacinacao-total-por-ano"),
+                #     ]:
+                #         with doc.create(MiniPage(width=NoEscape("0.45\\textwidth"))) as mini:
+                #             mini.append(NoEscape(r"\centering"))
+                #             mini.append(NoEscape(r"\includegraphics[width=\textwidth]{dubs.jpg}"))
+                #             mini.append(NoEscape(fr"\caption{{{caption}}}"))
+                #             mini.append(NoEscape(fr"\label{{{label}}}"))
+
+            with doc.create(Subsection("Relação Mensal e Anual")):
+                doc.append(p_last_30_days_analysis + "\n")
+                doc.append(p_last_12_months_analysis + "\n")
+                # Charts by name, in whichever format (png, pdf) they were rendered
+                graphics = _get_graphics(state, report_path)
+                with doc.create(Figure(position="H")) as fig:
+                    for name, caption, label in REPORT_FIGURES:
+                        graphic = graphics.get(name)
+                        if graphic is None:
+                            continue
+                        with doc.create(
+                            MiniPage(width=NoEscape("0.45\\textwidth"))
+                        ) as mini:
+                            mini.append(NoEscape(r"\centering"))
+                            mini.append(
+                                NoEscape(
+                                    rf"\includegraphics[width=\textwidth]{{{graphic}}}"
+                                )
+                            )
+                            mini.append(NoEscape(rf"\caption{{{caption}}}"))
+                            mini.append(NoEscape(rf"\label{{{label}}}"))
+
+        # Generate PDF, reused when the .tex and charts are unchanged
+        artifact_cache = ArtifactCache()
+        pdf_key = get_artifact_key(
+            "pdf",
+            {
+                "tex": doc.dumps(),
+                "compiler": get_latex_compiler(),
+                "passes": get_latex_passes(),
+                "graphics": {
+                    os.path.basename(path): get_file_digest(path)
+                    for path in state.get("graphics", [])
+                },
+            },
+        )
+        outputs = {
+            "report.tex": f"{report_path}.tex",
+            "report.pdf": f"{report_path}.pdf",
+        }
+        reused = artifact_cache.restore(pdf_key, outputs)
+        if not reused:
+            build_pdf(doc, report_path)
+            artifact_cache.store(pdf_key, outputs)
+        state.setdefault("artifacts", []).append(
+            get_artifact_entry("pdf", pdf_key, reused, outputs)
+        )
+        return f"{report_path}.pdf"
+
+
+RENDERERS: dict[str, type[ReportRenderer]] = {
+    renderer.format: renderer
+    for renderer in (LatexRenderer, HtmlRenderer, MarkdownRenderer)
+}
+
+
+def get_renderer(report_format: str) -> ReportRenderer:
+    """
+    Purpose: Get the renderer of a report format.
+    Args:
+        report_format: str - One of RENDERERS ("pdf", "html", "md").
+    Returns:
+        ReportRenderer - The renderer.
+    """
+    if report_format not in RENDERERS:
+        raise ValueError(
+            f"Invalid report format: {report_format}, use one of {', '.join(RENDERERS)}"
+        )
+    return RENDERERS[report_format]()
@@ -0,0 +1,288 @@
+"""
+Long-running report service.
+Keeps the compiled graphs, DB pool, prompt templates and LLM client warm and
+exposes report generation over a local HTTP API:
+
+GET  /health               - Service and queue status
+POST /reports                 - Queue a report {"report_date": "YYYY-MM-DD" | "today",
+                                "sections": [...], "format": "pdf" | "html" | "md"}
+GET  /reports                 - List the jobs
+GET  /reports/<job_id>        - Job status
+GET  /reports/<job_id>/report - Report file of a finished job, in its format
+GET  /reports/<job_id>/pdf    - Report PDF of a finished pdf job
+GET  /reports/<job_id>/graphics/<file> - Chart of a job, linked by html/md reports
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any
+from src.app.responses.main_agent_response import MainAgentResponse
+from src.utils.db import enable_connection_pool
+import json
+import logging
+import os
+import threading
+import traceback
+import uuid
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SECTIONS = [
+    field_name.replace("_", "-") for field_name in MainAgentResponse.model_fields
+]
+
+REPORT_FORMATS = ("pdf", "html", "md")
+CONTENT_TYPES = {
+    "pdf": "application/pdf",
+    "png": "image/png",
+    "svg": "image/svg+xml",
+    "html": "text/html; charset=utf-8",
+    "md": "text/markdown; charset=utf-8",
+}
+
+
+class ReportService:
+    """
+    Purpose: Queue report jobs and run them with bounded concurrency, each one
+    writing to its own output directory.
+    Args:
+        workers: int - Reports generated concurrently.
+        max_queue: int - Maximum queued and running jobs, new jobs are rejected above it.
+        output_root: str - Directory of the per-job output directories.
+    """
+
+    def __init__(
+        self,
+        workers: int = 2,
+        max_queue: int = 32,
+        output_root: str = "src/data/reports/jobs",
+    ):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.output_root = output_root
+        self.jobs: dict[str, dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="report-job"
+        )
+
+    def warm_up(self) -> None:
+        """
+        Purpose: Pay the cold start once: DB pool, report stack imports, compiled
+        graphs, LLM client, prompt templates and chart worker processes.
+        """
+        from src.app.charts import get_chart_executor
+        from src.app.Graph import get_compiled_graph
+        import matplotlib.figure  # noqa: F401
+        import pylatex  # noqa: F401
+
+        enable_connection_pool(minconn=1, maxconn=self.workers * 2)
+        get_compiled_graph()
+        get_chart_executor()
+        logger.info(f"Report service warmed up with {self.workers} workers")
+
+    def _count_active_jobs(self) -> int:
+        return sum(
+            1 for job in self.jobs.values() if job["status"] in ("queued", "running")
+        )
+
+    def submit(
+        self, report_date: str, sections: list[str], report_format: str = "pdf"
+    ) -> dict[str, Any] | None:
+        """
+        Purpose: Queue a report job.
+        Args:
+            report_date: str - The report date (YYYY-MM-DD).
+            sections: list[str] - The report sections.
+            report_format: str - The report format: "pdf", "html" or "md".
+        Returns:
+            dict[str, Any] | None - The job, None if the queue is full.
+        """
+        with self._lock:
+            if self._count_active_jobs() >= self.max_queue:
+                return None
+            job_id = uuid.uuid4().hex
+            job = {
+                "job_id": job_id,
+                "report_date": report_date,
+                "sections": sections,
+                "format": report_format,
+                "status": "queued",
+                "output_dir": os.path.join(self.output_root, job_id),
+                "submitted_at": datetime.now().isoformat(timespec="seconds"),
+                "started_at": None,
+                "finished_at": None,
+                "error": None,
+            }
+            self.jobs[job_id] = job
+        self._executor.submit(self._run_job, job_id)
+        logger.info(f"Report job {job_id} queued for {report_date}")
+        return dict(job)
+
+    def _run_job(self, job_id: str) -> None:
+        from src.app.Graph import get_report_path, run_report
+
+        job = self.jobs[job_id]
+        with self._lock:
+            job["status"] = "running"
+            job["started_at"] = datetime.now().isoformat(timespec="seconds")
+        try:
+            os.makedirs(job["output_dir"], exist_ok=True)
+            result = run_report(
+                job["report_date"],
+                job["sections"],
+                output_dir=job["output_dir"],
+                report_format=job["format"],
+            )
+            status = "error" if result.get("stage") == "error" else "success"
+            error = "Report generation failed" if status == "error" else None
+        except Exception as e:
+            traceback.print_exc()
+            status, error = "error", str(e)
+        with self._lock:
+            job["status"] = status
+            job["error"] = error
+            job["finished_at"] = datetime.now().isoformat(timespec="seconds")
+            job["report_path"] = f"{get_report_path(job)}.{job['format']}"
+        logger.info(f"Report job {job_id} finished with status: {status}")
+
+    def get_job(self, job_id: str) -> dict[str, Any] | None:
+        with self._lock:
+            job = self.jobs.get(job_id)
+            return dict(job) if job else None
+
+    def list_jobs(self) -> list[dict[str, Any]]:
+        with self._lock:
+            return [dict(job) for job in self.jobs.values()]
+
+    def get_status(self) -> dict[str, Any]:
+        with self._lock:
+            statuses = [job["status"] for job in self.jobs.values()]
+        return {
+            "status": "ok",
+            "workers": self.workers,
+            "max_queue": self.max_queue,
+            **{
+                status: statuses.count(status)
+                for status in ("queued", "running", "success", "error")
+            },
+        }
+
+
+def _validate_date(date_str: str) -> str:
+    if date_str.lower() == "today":
+        return datetime.now().strftime("%Y-%m-%d")
+    datetime.strptime(date_str, "%Y-%m-%d")
+    return date_str
+
+
+def _validate_sections(sections: Any) -> list[str]:
+    if sections is None or sections == []:
+        return DEFAULT_SECTIONS
+    if not isinstance(sections, list) or not all(
+        isinstance(section, str) for section in sections
+    ):
+        raise ValueError("sections must be a list of section names")
+    unknown = [section for section in sections if section not in DEFAULT_SECTIONS]
+    if unknown:
+        raise ValueError(
+            f"unknown sections: {', '.join(unknown)}, use {', '.join(DEFAULT_SECTIONS)}"
+        )
+    return sections
+
+
+class ReportRequestHandler(BaseHTTPRequestHandler):
+    service: ReportService = None
+
+    def _send_json(self, status: int, body: Any) -> None:
+        payload = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _send_file(self, path: str, content_type: str) -> None:
+        with open(path, "rb") as f:
+            payload = f.read()
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self):
+        parts = [part for part in self.path.split("?")[0].split("/") if part]
+        if parts == ["health"]:
+            return self._send_json(200, self.service.get_status())
+        if parts == ["reports"]:
+            return self._send_json(200, self.service.list_jobs())
+        if len(parts) == 4 and parts[0] == "reports" and parts[2] == "graphics":
+            job = self.service.get_job(parts[1])
+            # Only plain file names, so that paths can't leave the job directory
+            path = job and os.path.join(job["output_dir"], "graphics", parts[3])
+            extension = os.path.splitext(parts[3])[1].lstrip(".")
+            if not path or parts[3] != os.path.basename(parts[3]) or not os.path.isfile(path):
+                return self._send_json(404, {"error": "Chart not available"})
+            return self._send_file(
+                path, CONTENT_TYPES.get(extension, "application/octet-stream")
+            )
+        if len(parts) in (2, 3) and parts[0] == "reports":
+            job = self.service.get_job(parts[1])
+            if job is None:
+                return self._send_json(404, {"error": "Job not found"})
+            if len(parts) == 2:
+                return self._send_json(200, job)
+            if parts[2] == "report" or (parts[2] == "pdf" and job["format"] == "pdf"):
+                if job["status"] != "success" or not os.path.exists(
+                    job["report_path"]
+                ):
+                    return self._send_json(404, {"error": "Report not available"})
+                return self._send_file(job["report_path"], CONTENT_TYPES[job["format"]])
+        return self._send_json(404, {"error": "Not found"})
+
+    def do_POST(self):
+        if self.path.split("?")[0].rstrip("/") != "/reports":
+            return self._send_json(404, {"error": "Not found"})
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            body = json.loads(self.rfile.read(length) or b"{}")
+            if not isinstance(body, dict):
+                raise ValueError("the body must be a JSON object")
+            report_date = _validate_date(str(body.get("report_date", "today")))
+            sections = _validate_sections(body.get("sections"))
+            report_format = str(body.get("format", "pdf"))
+            if report_format not in REPORT_FORMATS:
+                raise ValueError(f"format must be one of {', '.join(REPORT_FORMATS)}")
+        except (ValueError, json.JSONDecodeError) as e:
+            return self._send_json(400, {"error": f"Invalid request: {e}"})
+        job = self.service.submit(report_date, sections, report_format)
+        if job is None:
+            return self._send_json(429, {"error": "Report queue is full"})
+        return self._send_json(202, job)
+
+    def log_message(self, format: str, *args: Any) -> None:
+        logger.info(f"{self.address_string()} - {format % args}")
+
+
+def run_service(
+    host: str = "127.0.0.1", port: int = 8000, workers: int = 2, max_queue: int = 32
+) -> None:
+    """
+    Purpose: Warm up the report stack and serve the HTTP API until interrupted.
+    Args:
+        host: str - The interface to listen on.
+        port: int - The port to listen on.
+        workers: int - Reports generated concurrently.
+        max_queue: int - Maximum queued and running jobs.
+    """
+    service = ReportService(workers=workers, max_queue=max_queue)
+    service.warm_up()
+    handler = type("Handler", (ReportRequestHandler,), {"service": service})
+    server = ThreadingHTTPServer((host, port), handler)
+    logger.info(f"Report service listening on http://{host}:{port}")
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
@@ -0,0 +1,150 @@
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Any
+import logging
+import os
+import re
+import unicodedata
+
+logger = logging.getLogger(__name__)
+
+# Rough size of a token for Portuguese text, used to enforce the token budget
+CHARS_PER_TOKEN = 4
+SCORE_WEIGHT = 0.8
+RECENCY_WEIGHT = 0.2
+
+
+def _normalize_text(text: str) -> str:
+    """
+    Purpose: Normalize a title or answer for duplicate detection.
+    Args:
+        text: str - The text to be normalized.
+    Returns:
+        str - Lowercase text without accents, punctuation or repeated spaces.
+    """
+    text = unicodedata.normalize("NFKD", text or "")
+    text = "".join(char for char in text if not unicodedata.combining(char))
+    text = re.sub(r"[^a-z0-9]+", " ", text.lower())
+    return text.strip()
+
+
+def _normalize_url(url: str) -> str:
+    """
+    Purpose: Normalize an url for duplicate detection.
+    Args:
+        url: str - The url to be normalized.
+    Returns:
+        str - The url without scheme, "www.", query string or trailing slash.
+    """
+    url = re.sub(r"^https?://(www\.)?", "", (url or "").lower())
+    return url.split("?")[0].split("#")[0].rstrip("/")
+
+
+def _parse_published_date(published_date: str) -> datetime | None:
+    """
+    Purpose: Parse the published date of a search result (RFC 2822 or ISO format).
+    Args:
+        published_date: str - The published date.
+    Returns:
+        datetime | None - The timezone aware date, None if it can't be parsed.
+    """
+    if not published_date:
+        return None
+    try:
+        date = parsedate_to_datetime(published_date)
+    except (TypeError, ValueError):
+        try:
+            date = datetime.fromisoformat(published_date)
+        except ValueError:
+            return None
+    return date if date.tzinfo else date.replace(tzinfo=timezone.utc)
+
+
+def _estimate_tokens(item: dict[str, Any]) -> int:
+    return sum(len(str(value)) for value in item.values()) // CHARS_PER_TOKEN + 1
+
+
+def compact_news(
+    responses: list[dict[str, Any]],
+    token_budget: int = None,
+    min_score: float = 0.1,
+) -> list[dict[str, str]]:
+    """
+    Purpose: Deduplicate, rank and compact the search responses before the LLM.
+    Articles are deduplicated by url and normalized title (keeping the best
+    score), ranked by score and recency, and each distinct query answer is kept
+    once as a summary. Summaries come first, then articles in rank order, until
+    the token budget is reached.
+    Args:
+        responses: list[dict[str, Any]] - The search responses, one per query.
+        token_budget: int | None - Maximum estimated tokens, defaults to NEWS_TOKEN_BUDGET.
+        min_score: float - Minimum relevance score of an article.
+    Returns:
+        list[dict[str, str]] - The compacted news.
+    """
+    if token_budget is None:
+        token_budget = int(os.getenv("NEWS_TOKEN_BUDGET", "2000"))
+
+    summaries = {}
+    articles = {}
+    seen_titles = {}
+    for response in responses:
+        answer = response.get("answer")
+        if answer and _normalize_text(answer) not in summaries:
+            summaries[_normalize_text(answer)] = {
+                "title": f"Resumo: {response.get('query', '')}",
+                "content": answer,
+            }
+        for result in response.get("results", []):
+            score = result.get("score", 0)
+            if score <= min_score:
+                continue
+            url_key = _normalize_url(result.get("url"))
+            title_key = _normalize_text(result.get("title"))
+            key = seen_titles.get(title_key, url_key) if title_key else url_key
+            if key in articles and articles[key]["score"] >= score:
+                continue
+            articles[key] = {
+                "title": result.get("title"),
+                "url": result.get("url"),
+                "published_date": result.get("published_date"),
+                "content": result.get("content"),
+                "score": score,
+            }
+            if title_key:
+                seen_titles[title_key] = key
+
+    dates = {
+        key: _parse_published_date(article["published_date"])
+        for key, article in articles.items()
+    }
+    known_dates = [date for date in dates.values() if date is not None]
+    oldest = min(known_dates, default=None)
+    newest = max(known_dates, default=None)
+
+    def _rank(key: str) -> float:
+        recency = 0.0
+        if dates[key] is not None and newest > oldest:
+            recency = (dates[key] - oldest) / (newest - oldest)
+        elif dates[key] is not None:
+            recency = 1.0
+        return SCORE_WEIGHT * articles[key]["score"] + RECENCY_WEIGHT * recency
+
+    ranked_articles = [
+        {field: value for field, value in articles[key].items() if field != "score"}
+        for key in sorted(articles, key=_rank, reverse=True)
+    ]
+
+    news = []
+    used_tokens = 0
+    for item in [*summaries.values(), *ranked_articles]:
+        tokens = _estimate_tokens(item)
+        if used_tokens + tokens > token_budget:
+            continue
+        news.append(item)
+        used_tokens += tokens
+    logger.info(
+        f"News compacted to {len(news)} items ({used_tokens} estimated tokens) "
+        f"from {len(summaries)} distinct answers and {len(articles)} distinct articles"
+    )
+    return news
@@ -1,9 +1,12 @@
 from langchain_core.tools import BaseTool
-from typing import Type, Literal, Optional, Union
+from typing import Any, Type, Literal, Optional, Union
+from datetime import date, datetime
 from pydantic import BaseModel, Field
 from src.utils.db import get_db_connection, verify_data_exists
 from psycopg2._psycopg import cursor
 from src.utils.formatting import create_response_message
+from src.pipelines.cube import get_grouping_id
+from src.pipelines.dimensions import decode_dimension, encode_dimension
 import traceback
 import logging
 
@@ -157,11 +160,11 @@ def _fetch_vaccination_rate(
         logger.error(f"No data was retrived for vaccination rate: {str(e)}")
         return f"No data was retrived for vaccination rate with start date: {start_date} and end date: {end_date} and group by: {group_by}"
 
-def _fetch_uti_occupancy_rate(
+def _fetch_uti_admissions(
     cursor: cursor, start_date: str, end_date: str, group_by: str
 ) -> str:
     """
-    Purpose: Fetch the uti occupancy rate from the database.
+    Purpose: Fetch the cases admitted to the uti, by notification date, from the database.
     Args:
         cursor: cursor - The cursor to the database.
         start_date: str - The start date of the data to be fetched.
@@ -184,12 +187,63 @@ def _fetch_uti_occupancy_rate(
                 GROUP BY {group_by}"""
         cursor.execute(query)
         result = cursor.fetchall()
-        csv_data = _get_csv_data(result, ["Total de Internados em UTI"], group_by)
+        csv_data = _get_csv_data(result, ["Total de Internações em UTI"], group_by)
         return csv_data
     except Exception as e:
         traceback.print_exc()
-        logger.error(f"No data was retrived for uti occupancy rate: {str(e)}")
-        return f"No data was retrived for uti occupancy rate with start date: {start_date} and end date: {end_date} and group by: {group_by}"
+        logger.error(f"No data was retrived for uti admissions: {str(e)}")
+        return f"No data was retrived for uti admissions with start date: {start_date} and end date: {end_date} and group by: {group_by}"
+
+
+def _fetch_uti_occupancy(
+    cursor: cursor,
+    start_date: str,
+    end_date: str,
+    group_by: str,
+    uf_code: int = None,
+    breakdown_by_uf: bool = False,
+) -> str:
+    """
+    Purpose: Fetch the uti occupancy (patients in the uti on each day) from the
+    influd_uti_census table, national or by state.
+    Args:
+        cursor: cursor - The cursor to the database.
+        start_date: str - The start date of the data to be fetched.
+        end_date: str - The end date of the data to be fetched.
+        group_by: str - The group by of the data to be fetched.
+        uf_code: int | None - Only the given state.
+        breakdown_by_uf: bool - Break the data down by state.
+    Returns:
+        str - Csv string with columns 'group_by', the state (if broken down) and
+            the mean and peak daily occupancy of each period.
+    """
+    by_uf = uf_code is not None or breakdown_by_uf
+    conditions = ["grouping_id = %s"]
+    params: list[Any] = [get_grouping_id(("uf_code",) if by_uf else ())]
+    if start_date and end_date:
+        conditions.append("dia BETWEEN %s AND %s")
+        params += [start_date, end_date]
+    if uf_code is not None:
+        conditions.append("uf_code = %s")
+        params.append(uf_code)
+    breakdown_column = ", uf_code" if breakdown_by_uf else ""
+    query = f"""SELECT DATE_PART('{group_by}', dia) AS {group_by}{breakdown_column},
+            ROUND(AVG(ocupacao), 1), MAX(ocupacao)
+            FROM influd_uti_census
+            WHERE {" AND ".join(conditions)}
+            GROUP BY {group_by}{breakdown_column}
+            ORDER BY {group_by}{breakdown_column}"""
+    cursor.execute(query, params)
+    result = [
+        (row[0], decode_dimension("uf_code", row[1]), *row[2:])
+        if breakdown_by_uf
+        else row
+        for row in cursor.fetchall()
+    ]
+    columns = ["Ocupação média de UTI", "Ocupação máxima de UTI"]
+    if breakdown_by_uf:
+        columns = ["UF", *columns]
+    return _get_csv_data(result, columns, group_by)
 
 
 def _fetch_mortality_rate(
@@ -227,10 +281,342 @@ def _fetch_mortality_rate(
         return f"No data was retrived for mortality rate with start date: {start_date} and end date: {end_date} and group by: {group_by}"
 
 
+# Columns of each metric, and the daily aggregate column(s) they come from
+METRIC_COLUMNS = {
+    "total_cases": (["Total de Casos"], ["total_casos"]),
+    "vaccination_rate": (
+        ["Total de Vacinados para covid", "Total de Vacinados para gripe"],
+        ["total_vacinados", "total_vacinados"],
+    ),
+    "uti_admissions": (["Total de Internações em UTI"], ["total_internados_uti"]),
+    "mortality_rate": (["Total de Óbitos"], ["total_obitos"]),
+}
+
+
+DAILY_AGGREGATES_QUERY = """SELECT data_preenchimento,
+    COUNT(*) AS total_casos,
+    COUNT(*) FILTER (WHERE vacina_covid = 1 AND vacina_gripe = 1) AS total_vacinados,
+    COUNT(*) FILTER (WHERE internado_uti = 1) AS total_internados_uti,
+    COUNT(*) FILTER (WHERE evolucao = 2) AS total_obitos
+    FROM influd_data
+    WHERE data_preenchimento BETWEEN %s AND %s
+    GROUP BY data_preenchimento"""
+
+
+class DailyAggregates:
+    """
+    Purpose: Daily counts of every metric over a date range, fetched in a single
+    scan, that can answer any QueryDataTool request inside that range.
+    Used to share one query between the reports of a batch.
+    Args:
+        start_date: str - The first day of the range.
+        end_date: str - The last day of the range.
+        rows: list[tuple] - Rows of (day, total_casos, total_vacinados,
+            total_internados_uti, total_obitos).
+    """
+
+    columns = ["total_casos", "total_vacinados", "total_internados_uti", "total_obitos"]
+
+    def __init__(self, start_date: str, end_date: str, rows: list[tuple]):
+        self.start_date = datetime.strptime(start_date, "%Y-%m-%d").date()
+        self.end_date = datetime.strptime(end_date, "%Y-%m-%d").date()
+        self.rows = rows
+
+    @classmethod
+    def fetch(cls, start_date: str, end_date: str) -> "DailyAggregates":
+        """
+        Purpose: Fetch the daily aggregates of a date range from the database.
+        Args:
+            start_date: str - The first day of the range.
+            end_date: str - The last day of the range.
+        Returns:
+            DailyAggregates - The daily aggregates.
+        """
+        connection = get_db_connection()
+        cursor = connection.cursor()
+        try:
+            cursor.execute(DAILY_AGGREGATES_QUERY, (start_date, end_date))
+            rows = cursor.fetchall()
+            logger.info(
+                f"Fetched {len(rows)} days of aggregates from {start_date} to {end_date}"
+            )
+            return cls(start_date, end_date, rows)
+        finally:
+            cursor.close()
+            connection.close()
+
+    def covers(self, start_date: str, end_date: str) -> bool:
+        if not start_date or not end_date:
+            return False
+        return (
+            self.start_date <= datetime.strptime(start_date, "%Y-%m-%d").date()
+            and datetime.strptime(end_date, "%Y-%m-%d").date() <= self.end_date
+        )
+
+    def get_csv_data(
+        self, data_to_fetch: str, start_date: str, end_date: str, group_by: str
+    ) -> str:
+        """
+        Purpose: Get the same csv string the database query of a metric returns.
+        Args:
+            data_to_fetch: str - The metric (see METRIC_COLUMNS).
+            start_date: str - The start date of the data to be fetched.
+            end_date: str - The end date of the data to be fetched.
+            group_by: str - The group by of the data to be fetched.
+        Returns:
+            str - Csv string with columns 'group_by' and the metric columns.
+        """
+        csv_columns, aggregate_columns = METRIC_COLUMNS[data_to_fetch]
+        indexes = [self.columns.index(column) + 1 for column in aggregate_columns]
+        start = datetime.strptime(start_date, "%Y-%m-%d").date()
+        end = datetime.strptime(end_date, "%Y-%m-%d").date()
+        groups: dict[float, list[int]] = {}
+        for row in self.rows:
+            day: date = row[0]
+            if not start <= day <= end:
+                continue
+            # DATE_PART returns a double precision, kept for identical output
+            key = float(getattr(day, group_by))
+            totals = groups.setdefault(key, [0] * len(indexes))
+            for i, index in enumerate(indexes):
+                totals[i] += row[index]
+        result = [
+            (key, *totals) for key, totals in sorted(groups.items()) if totals[0] > 0
+        ]
+        return _get_csv_data(result, csv_columns, group_by)
+
+
+# Tool arguments of the cube dimensions, and their labels in the csv
+DIMENSION_ARGUMENTS = {
+    "uf": ("uf_code", "UF"),
+    "age_band": ("age_band", "Faixa Etária"),
+    "sex": ("sex_code", "Sexo"),
+}
+
+
+def _fetch_from_cube(
+    cursor: cursor,
+    data_to_fetch: str,
+    start_date: str,
+    end_date: str,
+    group_by: str,
+    filters: dict[str, int],
+    breakdown_by: str = None,
+) -> Union[str, dict[str, str]]:
+    """
+    Purpose: Fetch metrics sliced by state, age band and/or sex from the
+    influd_cube gold table, all metrics in a single query.
+    Args:
+        cursor: cursor - The cursor to the database.
+        data_to_fetch: str - The metric (see METRIC_COLUMNS) or "all".
+        start_date: str - The start date of the data to be fetched.
+        end_date: str - The end date of the data to be fetched.
+        group_by: str - The group by of the data to be fetched.
+        filters: dict[str, int] - Dimension codes to filter by, by dimension column.
+        breakdown_by: str | None - Dimension column to break the data down by.
+    Returns:
+        str | dict[str, str] - Csv string with columns 'group_by', the breakdown
+            (if any) and the metric columns, a dict of them by metric for "all".
+    """
+    dimensions = [*filters, *([breakdown_by] if breakdown_by else [])]
+    conditions = ["grouping_id = %s"]
+    params: list[Any] = [get_grouping_id(dimensions)]
+    if start_date and end_date:
+        conditions.append("data_preenchimento BETWEEN %s AND %s")
+        params += [start_date, end_date]
+    for column, code in filters.items():
+        conditions.append(f"{column} = %s")
+        params.append(code)
+    breakdown_column = f", {breakdown_by}" if breakdown_by else ""
+    query = f"""SELECT DATE_PART('{group_by}', data_preenchimento) AS {group_by}{breakdown_column},
+            SUM(total_casos), SUM(total_vacinados),
+            SUM(total_internados_uti), SUM(total_obitos)
+            FROM influd_cube
+            WHERE {" AND ".join(conditions)}
+            GROUP BY {group_by}{breakdown_column}
+            ORDER BY {group_by}{breakdown_column}"""
+    cursor.execute(query, params)
+    rows = cursor.fetchall()
+    key_size = 2 if breakdown_by else 1
+    breakdown_label = next(
+        (label for column, label in DIMENSION_ARGUMENTS.values() if column == breakdown_by),
+        None,
+    )
+    metrics = list(METRIC_COLUMNS) if data_to_fetch == "all" else [data_to_fetch]
+    data = {}
+    for metric in metrics:
+        csv_columns, aggregate_columns = METRIC_COLUMNS[metric]
+        indexes = [
+            key_size + DailyAggregates.columns.index(column)
+            for column in aggregate_columns
+        ]
+        result = []
+        for row in rows:
+            # Periods without any case of the metric are left out, as in influd_data
+            if not row[indexes[0]]:
+                continue
+            key = [row[0]]
+            if breakdown_by:
+                key.append(decode_dimension(breakdown_by, row[1]))
+            result.append((*key, *(int(row[index]) for index in indexes)))
+        columns = [breakdown_label, *csv_columns] if breakdown_by else csv_columns
+        data[metric] = _get_csv_data(result, columns, group_by)
+    return data if data_to_fetch == "all" else data[data_to_fetch]
+
+
+# Derived indicators: unit and description of each series, in the order of
+# the INDICATORS_QUERY columns. Rates use the trailing 7 days, so that a
+# single day with few notifications doesn't swing them.
+INDICATORS = {
+    "media_movel_casos_7d": ("casos/dia", "Média móvel de 7 dias dos casos"),
+    "media_movel_obitos_7d": ("óbitos/dia", "Média móvel de 7 dias dos óbitos"),
+    "media_movel_uti_7d": ("internações/dia", "Média móvel de 7 dias das internações em UTI"),
+    "taxa_letalidade_7d": ("razão", "Óbitos / casos nos últimos 7 dias"),
+    "proporcao_uti_7d": ("razão", "Internados em UTI / casos nos últimos 7 dias"),
+    "cobertura_vacinal_covid_7d": ("razão", "Vacinados para covid / casos nos últimos 7 dias"),
+    "cobertura_vacinal_gripe_7d": ("razão", "Vacinados para gripe / casos nos últimos 7 dias"),
+    "cobertura_vacinal_ambas_7d": ("razão", "Vacinados para covid e gripe / casos nos últimos 7 dias"),
+    "crescimento_semanal_casos": ("razão", "Casos dos últimos 7 dias / 7 dias anteriores - 1"),
+    "crescimento_semanal_obitos": ("razão", "Óbitos dos últimos 7 dias / 7 dias anteriores - 1"),
+}  # fmt: skip
+
+# Every day of the range (zero when there is no notification), its trailing
+# 7 days and the 7 days before them, computed with window functions in a
+# single pass over the cube rows of a grouping. The cube side is bounded to the
+# same dates, since the planner can't infer it from generate_series.
+INDICATORS_QUERY = """
+    WITH daily AS (
+        SELECT days.day::date AS day,
+            COALESCE(SUM(cube.total_casos), 0) AS casos,
+            COALESCE(SUM(cube.total_obitos), 0) AS obitos,
+            COALESCE(SUM(cube.total_internados_uti), 0) AS uti,
+            COALESCE(SUM(cube.total_vacinados_covid), 0) AS vacinados_covid,
+            COALESCE(SUM(cube.total_vacinados_gripe), 0) AS vacinados_gripe,
+            COALESCE(SUM(cube.total_vacinados), 0) AS vacinados
+        FROM generate_series(%(start_date)s::date - 13, %(end_date)s::date,
+            INTERVAL '1 day') AS days(day)
+        LEFT JOIN influd_cube AS cube
+            ON cube.data_preenchimento = days.day
+            AND cube.data_preenchimento BETWEEN %(start_date)s::date - 13
+                AND %(end_date)s::date
+            AND {conditions}
+        GROUP BY days.day
+    ), windowed AS (
+        SELECT day,
+            SUM(casos) OVER last_7d AS casos,
+            SUM(obitos) OVER last_7d AS obitos,
+            SUM(uti) OVER last_7d AS uti,
+            SUM(vacinados_covid) OVER last_7d AS vacinados_covid,
+            SUM(vacinados_gripe) OVER last_7d AS vacinados_gripe,
+            SUM(vacinados) OVER last_7d AS vacinados,
+            SUM(casos) OVER previous_7d AS casos_anteriores,
+            SUM(obitos) OVER previous_7d AS obitos_anteriores
+        FROM daily
+        WINDOW last_7d AS (ORDER BY day ROWS BETWEEN 6 PRECEDING AND CURRENT ROW),
+            previous_7d AS (ORDER BY day ROWS BETWEEN 13 PRECEDING AND 7 PRECEDING)
+    )
+    SELECT day,
+        casos / 7.0,
+        obitos / 7.0,
+        uti / 7.0,
+        obitos / NULLIF(casos, 0),
+        uti / NULLIF(casos, 0),
+        vacinados_covid / NULLIF(casos, 0),
+        vacinados_gripe / NULLIF(casos, 0),
+        vacinados / NULLIF(casos, 0),
+        casos / NULLIF(casos_anteriores, 0) - 1,
+        obitos / NULLIF(obitos_anteriores, 0) - 1
+    FROM windowed
+    WHERE day >= %(start_date)s::date
+    ORDER BY day"""
+
+
+class IndicatorSeries(BaseModel):
+    unit: str
+    description: str
+    values: list[Optional[float]]
+
+
+class Indicators(BaseModel):
+    """Daily derived indicators, every series aligned with dates"""
+
+    dates: list[date]
+    series: dict[str, IndicatorSeries]
+
+
+def _fetch_indicators(
+    cursor: cursor, start_date: str, end_date: str, filters: dict[str, int]
+) -> Indicators:
+    """
+    Purpose: Fetch the derived indicators of every day of a range from the
+    influd_cube gold table.
+    Args:
+        cursor: cursor - The cursor to the database.
+        start_date: str - The start date of the data to be fetched.
+        end_date: str - The end date of the data to be fetched.
+        filters: dict[str, int] - Dimension codes to filter by, by dimension column.
+    Returns:
+        Indicators - The dates and the series of each indicator (see INDICATORS),
+            None where the denominator is zero.
+    """
+    conditions = ["cube.grouping_id = %(grouping_id)s"]
+    params: dict[str, Any] = {
+        "grouping_id": get_grouping_id(list(filters)),
+        "start_date": start_date,
+        "end_date": end_date,
+    }
+    for column, code in filters.items():
+        conditions.append(f"cube.{column} = %({column})s")
+        params[column] = code
+    cursor.execute(INDICATORS_QUERY.format(conditions=" AND ".join(conditions)), params)
+    rows = cursor.fetchall()
+    return Indicators(
+        dates=[row[0] for row in rows],
+        series={
+            name: IndicatorSeries(
+                unit=unit,
+                description=description,
+                values=[
+                    None if row[i] is None else round(float(row[i]), 4) for row in rows
+                ],
+            )
+            for i, (name, (unit, description)) in enumerate(INDICATORS.items(), start=1)
+        },
+    )
+
+
+def _get_filters(arguments: dict[str, str]) -> dict[str, int]:
+    """
+    Purpose: Encode the dimension arguments of the tool (uf, age_band, sex).
+    Args:
+        arguments: dict[str, str] - The argument labels, None when not given.
+    Returns:
+        dict[str, int] - The dimension codes, by dimension column.
+    """
+    return {
+        DIMENSION_ARGUMENTS[argument][0]: encode_dimension(
+            DIMENSION_ARGUMENTS[argument][0], value.upper()
+        )
+        for argument, value in arguments.items()
+        if value
+    }
+
+
 class QueryDataToolInput(BaseModel):
     data_to_fetch: Literal[
-        "total_cases", "vaccination_rate", "uti_occupancy_rate", "mortality_rate", "all"
-    ] = Field(description="The data to be fetched")
+        "total_cases",
+        "vaccination_rate",
+        "uti_admissions",
+        "uti_occupancy_rate",
+        "mortality_rate",
+        "all",
+        "indicators",
+    ] = Field(
+        description="The data to be fetched, 'indicators' for the daily derived "
+        "rates, moving averages and weekly growth, 'uti_occupancy_rate' for the "
+        "mean and peak patients in the uti per day, 'uti_admissions' for the "
+        "cases admitted to the uti"
+    )
     start_date: Optional[str] = Field(
         None, description="The start date of the data to be fetched"
     )
@@ -240,16 +626,36 @@ class QueryDataToolInput(BaseModel):
     group_by: Optional[Literal["month", "year", "day"]] = Field(
         None, description="The group by of the data to be fetched"
     )
+    uf: Optional[str] = Field(
+        None, description="Only the given state of notification (e.g. 'SP')"
+    )
+    age_band: Optional[Literal["0-4", "5-19", "20-39", "40-59", "60-79", "80+"]] = Field(
+        None, description="Only the given age band"
+    )
+    sex: Optional[Literal["M", "F", "I"]] = Field(
+        None, description="Only the given sex (I for ignored)"
+    )
+    breakdown_by: Optional[Literal["uf", "age_band", "sex"]] = Field(
+        None, description="Break the data down by state, age band or sex"
+    )
 
 
 class QueryDataTool(BaseTool):
     """
     Purpose: A tool to query the data from the database.
     Args:
-        data_to_fetch: Literal["total_cases", "vaccination_rate", "uti_occupancy_rate", "mortality_rate", "all"] - The data to be fetched.
+        data_to_fetch: Literal["total_cases", "vaccination_rate", "uti_admissions", "uti_occupancy_rate", "mortality_rate", "all", "indicators"] - The data to be fetched.
+            "indicators" returns the daily Indicators (as a dict) of the range,
+            regardless of group_by. "uti_occupancy_rate" comes from the uti
+            census, national or by state only, and is not part of "all".
         start_date: str | None - The start date of the data to be fetched.
         end_date: str | None - The end date of the data to be fetched.
         group_by: Literal["month", "year", "day"] | None - The group by of the data to be fetched.
+        uf: str | None - Only the given state of notification.
+        age_band: str | None - Only the given age band.
+        sex: Literal["M", "F", "I"] | None - Only the given sex.
+        breakdown_by: Literal["uf", "age_band", "sex"] | None - Break the data down
+            by a dimension, from a single query over the cube.
     Returns:
         str | dict[str, str] - The data fetched from the database.
     """
@@ -257,6 +663,138 @@ class QueryDataTool(BaseTool):
     name: str = "query_data"
     description: str = "A tool to query the data"
     args_schema: Type[BaseModel] = QueryDataToolInput
+    # Prefetched aggregates, used instead of the database when they cover the request
+    daily_aggregates: Optional[Any] = None
+
+    def _run_from_aggregates(
+        self, data_to_fetch: str, start_date: str, end_date: str, group_by: str
+    ) -> str:
+        if data_to_fetch not in [*METRIC_COLUMNS.keys(), "all"]:
+            logger.error("Data type to fetch is invalid")
+            return create_response_message("error", "Data type to fetch is invalid")
+        if data_to_fetch == "all":
+            data = {
+                metric: self.daily_aggregates.get_csv_data(
+                    metric, start_date, end_date, group_by
+                )
+                for metric in METRIC_COLUMNS.keys()
+            }
+        else:
+            data = self.daily_aggregates.get_csv_data(
+                data_to_fetch, start_date, end_date, group_by
+            )
+        return create_response_message("success", data)
+
+    def _run_from_cube(
+        self,
+        data_to_fetch: str,
+        start_date: str,
+        end_date: str,
+        group_by: str,
+        arguments: dict[str, str],
+        breakdown_by: str,
+    ) -> str:
+        if data_to_fetch not in [*METRIC_COLUMNS.keys(), "all"]:
+            logger.error("Data type to fetch is invalid")
+            return create_response_message("error", "Data type to fetch is invalid")
+        try:
+            filters = _get_filters(arguments)
+        except ValueError as e:
+            logger.error(str(e))
+            return create_response_message("error", str(e))
+        breakdown_column = (
+            DIMENSION_ARGUMENTS[breakdown_by][0] if breakdown_by else None
+        )
+        try:
+            connection = get_db_connection()
+            cursor = connection.cursor()
+            data = _fetch_from_cube(
+                cursor,
+                data_to_fetch,
+                start_date,
+                end_date,
+                group_by,
+                filters,
+                breakdown_column,
+            )
+            return create_response_message("success", data)
+        except Exception as e:
+            traceback.print_exc()
+            logger.error(f"Error querying cube: {str(e)}")
+            return create_response_message("error", f"Error querying cube: {str(e)}")
+        finally:
+            cursor.close()
+            connection.close()
+
+    def _run_uti_occupancy(
+        self,
+        start_date: str,
+        end_date: str,
+        group_by: str,
+        arguments: dict[str, str],
+        breakdown_by: str,
+    ) -> str:
+        if arguments["age_band"] or arguments["sex"] or breakdown_by not in (None, "uf"):
+            logger.error("Uti occupancy is only available national or by state")
+            return create_response_message(
+                "error", "Uti occupancy is only available national or by state"
+            )
+        try:
+            filters = _get_filters({"uf": arguments["uf"]})
+        except ValueError as e:
+            logger.error(str(e))
+            return create_response_message("error", str(e))
+        try:
+            connection = get_db_connection()
+            cursor = connection.cursor()
+            data = _fetch_uti_occupancy(
+                cursor,
+                start_date,
+                end_date,
+                group_by,
+                filters.get("uf_code"),
+                breakdown_by == "uf",
+            )
+            return create_response_message("success", data)
+        except Exception as e:
+            traceback.print_exc()
+            logger.error(f"Error querying uti occupancy: {str(e)}")
+            return create_response_message(
+                "error", f"Error querying uti occupancy: {str(e)}"
+            )
+        finally:
+            cursor.close()
+            connection.close()
+
+    def _run_indicators(
+        self, start_date: str, end_date: str, arguments: dict[str, str]
+    ) -> str:
+        if not start_date or not end_date:
+            logger.error("Indicators need a start and an end date")
+            return create_response_message(
+                "error", "Indicators need a start and an end date"
+            )
+        try:
+            filters = _get_filters(arguments)
+        except ValueError as e:
+            logger.error(str(e))
+            return create_response_message("error", str(e))
+        try:
+            connection = get_db_connection()
+            cursor = connection.cursor()
+            indicators = _fetch_indicators(cursor, start_date, end_date, filters)
+            return create_response_message(
+                "success", indicators.model_dump(mode="json")
+            )
+        except Exception as e:
+            traceback.print_exc()
+            logger.error(f"Error querying indicators: {str(e)}")
+            return create_response_message(
+                "error", f"Error querying indicators: {str(e)}"
+            )
+        finally:
+            cursor.close()
+            connection.close()
 
     def _run(
         self,
@@ -264,7 +802,28 @@ class QueryDataTool(BaseTool):
         start_date: str = None,
         end_date: str = None,
         group_by: str = "year",
+        uf: str = None,
+        age_band: str = None,
+        sex: str = None,
+        breakdown_by: str = None,
     ) -> str:
+        arguments = {"uf": uf, "age_band": age_band, "sex": sex}
+        if data_to_fetch == "indicators":
+            return self._run_indicators(start_date, end_date, arguments)
+        if data_to_fetch == "uti_occupancy_rate":
+            return self._run_uti_occupancy(
+                start_date, end_date, group_by, arguments, breakdown_by
+            )
+        if breakdown_by or any(arguments.values()):
+            return self._run_from_cube(
+                data_to_fetch, start_date, end_date, group_by, arguments, breakdown_by
+            )
+        if self.daily_aggregates is not None and self.daily_aggregates.covers(
+            start_date, end_date
+        ):
+            return self._run_from_aggregates(
+                data_to_fetch, start_date, end_date, group_by
+            )
         try:
             connection = get_db_connection()
             cursor = connection.cursor()
@@ -276,8 +835,8 @@ class QueryDataTool(BaseTool):
                     data = _fetch_vaccination_rate(
                         cursor, start_date, end_date, group_by
                     )
-                case "uti_occupancy_rate":
-                    data = _fetch_uti_occupancy_rate(
+                case "uti_admissions":
+                    data = _fetch_uti_admissions(
                         cursor, start_date, end_date, group_by
                     )
                 case "mortality_rate":
@@ -290,7 +849,7 @@ class QueryDataTool(BaseTool):
                         "vaccination_rate": _fetch_vaccination_rate(
                             cursor, start_date, end_date, group_by
                         ),
-                        "uti_occupancy_rate": _fetch_uti_occupancy_rate(
+                        "uti_admissions": _fetch_uti_admissions(
                             cursor, start_date, end_date, group_by
                         ),
                         "mortality_rate": _fetch_mortality_rate(
@@ -0,0 +1,217 @@
+from typing import Any
+import asyncio
+import concurrent.futures
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from src.utils.tracing import span
+
+logger = logging.getLogger(__name__)
+
+# In-flight searches shared by every client of the process, so that identical
+# concurrent requests (even from different event loops) hit the API only once
+_inflight: dict[str, concurrent.futures.Future] = {}
+_inflight_lock = threading.Lock()
+
+
+def get_search_key(query: str, params: dict[str, Any]) -> str:
+    """
+    Purpose: Get the cache key of a search request.
+    Args:
+        query: str - The search query.
+        params: dict[str, Any] - The search parameters (dates, depth, max results...).
+    Returns:
+        str - The sha256 hash of the request.
+    """
+    content = json.dumps({"query": query, **params}, sort_keys=True, default=str)
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+class SearchCache:
+    """
+    Purpose: Persist search responses on disk with a time to live.
+    Args:
+        cache_dir: str | None - The cache directory, defaults to TAVILY_CACHE_DIR.
+        ttl: int | None - Time to live in seconds, defaults to TAVILY_CACHE_TTL.
+            A ttl of 0 disables the cache.
+    """
+
+    def __init__(self, cache_dir: str = None, ttl: int = None):
+        self.cache_dir = cache_dir or os.getenv(
+            "TAVILY_CACHE_DIR", "src/data/cache/tavily"
+        )
+        self.ttl = (
+            ttl if ttl is not None else int(os.getenv("TAVILY_CACHE_TTL", "86400"))
+        )
+
+    def _get_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def read(self, key: str) -> dict[str, Any] | None:
+        """
+        Returns:
+            dict[str, Any] | None - The stored entry, regardless of its age.
+        """
+        try:
+            with open(self._get_path(key), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.error(f"Error reading search cache entry {key}: {e}")
+            return None
+
+    def get(self, key: str) -> dict[str, Any] | None:
+        """
+        Returns:
+            dict[str, Any] | None - The cached response if it has not expired.
+        """
+        if self.ttl <= 0:
+            return None
+        entry = self.read(key)
+        if entry is None or time.time() - entry["created_at"] > self.ttl:
+            return None
+        return entry["response"]
+
+    def set(self, key: str, query: str, params: dict[str, Any], response: dict) -> None:
+        if self.ttl <= 0:
+            return
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            entry = {
+                "created_at": time.time(),
+                "query": query,
+                "params": params,
+                "response": response,
+            }
+            tmp_path = f"{self._get_path(key)}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(entry, f, ensure_ascii=False, default=str)
+            os.replace(tmp_path, self._get_path(key))
+        except Exception as e:
+            logger.error(f"Error writing search cache entry {key}: {e}")
+
+
+class ReplaySearchClient:
+    """
+    Purpose: Stub search client that replays recorded responses, for tests and
+    offline runs. Recordings use the SearchCache format and are replayed
+    regardless of their age; a request without an exact recording falls back to
+    any recording of the same query, then to an empty response.
+    Args:
+        recordings_dir: str - The directory with the recorded responses.
+    """
+
+    def __init__(self, recordings_dir: str):
+        self.recordings = SearchCache(cache_dir=recordings_dir)
+
+    def _replay(self, query: str, **params) -> dict[str, Any]:
+        entry = self.recordings.read(get_search_key(query, params))
+        if entry is None and os.path.isdir(self.recordings.cache_dir):
+            for file_name in sorted(os.listdir(self.recordings.cache_dir)):
+                if not file_name.endswith(".json"):
+                    continue
+                candidate = self.recordings.read(file_name[: -len(".json")])
+                if candidate and candidate.get("query") == query:
+                    entry = candidate
+                    break
+        if entry is None:
+            logger.warning(f"No recorded search response for {query}")
+            return {"query": query, "answer": None, "results": []}
+        return entry["response"]
+
+    def search(self, query: str, **params) -> dict[str, Any]:
+        return self._replay(query, **params)
+
+    async def asearch(self, query: str, **params) -> dict[str, Any]:
+        return self._replay(query, **params)
+
+
+class CachedSearchClient:
+    """
+    Purpose: Wrap a search client with the on-disk cache and coalesce identical
+    concurrent requests into one in-flight call.
+    Args:
+        client: Any - An AsyncTavilyClient, TavilyClient or ReplaySearchClient.
+        cache: SearchCache | None - The cache, a default SearchCache if None.
+    """
+
+    def __init__(self, client: Any, cache: SearchCache = None):
+        self.client = client
+        self.cache = cache or SearchCache()
+
+    async def _call(self, query: str, **params) -> dict[str, Any]:
+        if isinstance(self.client, ReplaySearchClient):
+            return await self.client.asearch(query, **params)
+        response = self.client.search(query, **params)
+        if asyncio.iscoroutine(response):
+            response = await response
+        return response
+
+    def search_sync(self, query: str, **params) -> dict[str, Any]:
+        key = get_search_key(query, params)
+        cached = self.cache.get(key)
+        if cached is not None:
+            logger.info(f"Search cache hit for {query}")
+            return cached
+        response = self.client.search(query, **params)
+        self.cache.set(key, query, params, response)
+        return response
+
+    async def search(self, query: str, **params) -> dict[str, Any]:
+        with span("search", query=query) as search_span:
+            response, source = await self._search(query, **params)
+            if search_span is not None:
+                search_span["attributes"]["source"] = source
+            return response
+
+    async def _search(self, query: str, **params) -> tuple[dict[str, Any], str]:
+        """
+        Returns:
+            tuple[dict[str, Any], str] - The response and where it came from
+            ("cache", "in_flight" or "client").
+        """
+        key = get_search_key(query, params)
+        cached = self.cache.get(key)
+        if cached is not None:
+            logger.info(f"Search cache hit for {query}")
+            return cached, "cache"
+
+        with _inflight_lock:
+            future = _inflight.get(key)
+            owner = future is None or future.done()
+            if owner:
+                future = concurrent.futures.Future()
+                _inflight[key] = future
+        if not owner:
+            logger.info(f"Joining in-flight search for {query}")
+            try:
+                # Shielded, so that cancelling a joiner does not cancel the search
+                response = await asyncio.shield(asyncio.wrap_future(future))
+                return response, "in_flight"
+            except asyncio.CancelledError:
+                # The owner was cancelled, not this task: search again
+                if not future.cancelled() or asyncio.current_task().cancelling():
+                    raise
+                logger.info(f"In-flight search cancelled, retrying {query}")
+                return await self._search(query, **params)
+
+        try:
+            response = await self._call(query, **params)
+            self.cache.set(key, query, params, response)
+            future.set_result(response)
+            return response, "client"
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        except BaseException:
+            # Cancelled: release the joiners, which then search on their own
+            future.cancel()
+            raise
+        finally:
+            with _inflight_lock:
+                if _inflight.get(key) is future:
+                    del _inflight[key]
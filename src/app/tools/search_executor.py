@@ -0,0 +1,142 @@
+from typing import Any
+from tavily.errors import (
+    BadRequestError,
+    ForbiddenError,
+    InvalidAPIKeyError,
+    MissingAPIKeyError,
+)
+import asyncio
+import logging
+import os
+import random
+import threading
+import time
+from src.utils.tracing import span
+
+logger = logging.getLogger(__name__)
+
+# Errors that won't be fixed by retrying the same request
+NON_RETRYABLE_ERRORS = (
+    BadRequestError,
+    ForbiddenError,
+    InvalidAPIKeyError,
+    MissingAPIKeyError,
+)
+
+
+class TokenBucket:
+    """
+    Purpose: Thread-safe token bucket rate limiter.
+    Args:
+        rate: float - Tokens added per second.
+        capacity: float - Maximum burst of tokens.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _try_acquire(self) -> float:
+        """
+        Returns:
+            float - 0 if a token was taken, otherwise the seconds until one is available.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(
+                self.capacity, self.tokens + (now - self.updated_at) * self.rate
+            )
+            self.updated_at = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0.0
+            return (1 - self.tokens) / self.rate
+
+    async def acquire(self) -> None:
+        while True:
+            wait = self._try_acquire()
+            if wait == 0:
+                return
+            await asyncio.sleep(wait)
+
+
+_rate_limiter: TokenBucket = None
+_rate_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter() -> TokenBucket:
+    """
+    Purpose: Get the rate limiter shared by every search of the process.
+    Configured by TAVILY_RATE_LIMIT (requests per second) and TAVILY_BURST.
+    Returns:
+        TokenBucket - The shared rate limiter.
+    """
+    global _rate_limiter
+    with _rate_limiter_lock:
+        if _rate_limiter is None:
+            _rate_limiter = TokenBucket(
+                rate=float(os.getenv("TAVILY_RATE_LIMIT", "2")),
+                capacity=float(os.getenv("TAVILY_BURST", "4")),
+            )
+        return _rate_limiter
+
+
+class ResilientSearchClient:
+    """
+    Purpose: Wrap an async search client with the shared rate limiter, a
+    per-request timeout and retries with jittered exponential backoff.
+    Args:
+        client: Any - The async search client (e.g. AsyncTavilyClient).
+        timeout: float | None - Seconds per attempt, defaults to TAVILY_TIMEOUT.
+        max_retries: int | None - Retries after the first attempt, defaults to TAVILY_MAX_RETRIES.
+        base_delay: float - Backoff delay of the first retry, in seconds.
+        max_delay: float - Maximum backoff delay, in seconds.
+    """
+
+    def __init__(
+        self,
+        client: Any,
+        timeout: float = None,
+        max_retries: int = None,
+        base_delay: float = 0.5,
+        max_delay: float = 8.0,
+    ):
+        self.client = client
+        self.timeout = (
+            timeout if timeout is not None else float(os.getenv("TAVILY_TIMEOUT", "20"))
+        )
+        self.max_retries = (
+            max_retries
+            if max_retries is not None
+            else int(os.getenv("TAVILY_MAX_RETRIES", "2"))
+        )
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.rate_limiter = get_rate_limiter()
+
+    async def search(self, query: str, **params) -> dict[str, Any]:
+        for attempt in range(self.max_retries + 1):
+            with span("search rate_limit"):
+                await self.rate_limiter.acquire()
+            try:
+                with span("search attempt", query=query, attempt=attempt):
+                    return await asyncio.wait_for(
+                        self.client.search(query, **params), timeout=self.timeout
+                    )
+            except NON_RETRYABLE_ERRORS:
+                raise
+            except Exception as e:
+                if attempt == self.max_retries:
+                    raise
+                # Full jitter, so that concurrent retries don't hit the API together
+                delay = random.uniform(
+                    0, min(self.max_delay, self.base_delay * 2**attempt)
+                )
+                logger.warning(
+                    f"Search for {query} failed ({type(e).__name__}: {e}), "
+                    f"retrying in {delay:.2f}s ({attempt + 1}/{self.max_retries})"
+                )
+                await asyncio.sleep(delay)
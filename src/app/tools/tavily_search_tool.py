@@ -2,6 +2,13 @@ from langchain_core.tools import BaseTool
 from typing import Type, Literal
 from pydantic import BaseModel, Field
 from tavily import TavilyClient, AsyncTavilyClient
+from src.app.tools.search_cache import (
+    CachedSearchClient,
+    ReplaySearchClient,
+    SearchCache,
+)
+from src.app.tools.news_processing import compact_news
+from src.app.tools.search_executor import ResilientSearchClient
 from src.utils.formatting import create_response_message
 import asyncio
 import logging
@@ -18,6 +25,31 @@ queries = [
 ]
 
 
+def get_search_client(asynchronous: bool = True) -> CachedSearchClient:
+    """
+    Purpose: Get the cached search client.
+    TAVILY_CLIENT=replay selects the ReplaySearchClient, which replays the
+    responses recorded at TAVILY_REPLAY_DIR instead of calling the API.
+    Args:
+        asynchronous: bool - Use the AsyncTavilyClient instead of the TavilyClient.
+    Returns:
+        CachedSearchClient - The search client.
+    """
+    if os.getenv("TAVILY_CLIENT", "tavily").lower() == "replay":
+        # Recordings are never rewritten, so the replayed responses are not cached
+        client = ReplaySearchClient(
+            os.getenv("TAVILY_REPLAY_DIR", "src/data/cache/tavily")
+        )
+        return CachedSearchClient(client, SearchCache(ttl=0))
+    elif asynchronous:
+        client = ResilientSearchClient(
+            AsyncTavilyClient(api_key=os.getenv("TAVILY_API_KEY"))
+        )
+    else:
+        client = TavilyClient(api_key=os.getenv("TAVILY_API_KEY"))
+    return CachedSearchClient(client)
+
+
 class TavilySearchToolInput(BaseModel):
     start_date: str = Field(..., description="Start date for the search")
     end_date: str = Field(..., description="End date for the search")
@@ -46,10 +78,10 @@ class TavilySearchTool(BaseTool):
                 "https://www.cnnbrasil.com.br/tudo-sobre/influenza",
                 "https://www.cnnbrasil.com.br/tudo-sobre/influenza-a",
             ]
-            client = TavilyClient(api_key=os.getenv("TAVILY_API_KEY"))
+            client = get_search_client(asynchronous=False)
             logger.info(f"Searching for {queries}")
             responses = [
-                client.search(
+                client.search_sync(
                     q,
                     include_domains=sources,
                     start_date=start_date,
@@ -85,7 +117,7 @@ class TavilySearchTool(BaseTool):
                 "https://www.cnnbrasil.com.br/tudo-sobre/influenza",
                 "https://www.cnnbrasil.com.br/tudo-sobre/influenza-a",
             ]
-            client = AsyncTavilyClient(api_key=os.getenv("TAVILY_API_KEY"))
+            client = get_search_client()
             logger.info(f"Searching for {queries}")
             # Perform the search queries concurrently, passing the entire query dictionary
             responses = await asyncio.gather(
@@ -102,21 +134,22 @@ class TavilySearchTool(BaseTool):
                         country="brazil",
                     )
                     for q in queries
-                ]
+                ],
+                return_exceptions=True,
             )
-            # Filter URLs with a score greater than 0.5. Alternatively, you can use a re-ranking model or an LLM to identify the most relevant sources, or cluster your documents and extract content only from the most relevant cluster
-            for i, q in enumerate(queries):
-                logger.info(f"Total search results for {q}: {len(responses[i])}")
-            results = []
-            for response in responses:
-                answer = response.get("answer")
-                for result in response.get("results", []):
-                    if isinstance(response, Exception):
-                        continue
-                    if result.get("score", 0) > 0.1:
-                        title = result.get("title")
-                        # content = result.get('content')
-                        results.append({"title": title, "content": answer})
+            # A failed query only removes its own results from the report
+            successful_responses = []
+            for q, response in zip(queries, responses):
+                if isinstance(response, Exception):
+                    logger.error(f"Search for {q} failed: {response}")
+                    continue
+                logger.info(f"Total search results for {q}: {len(response)}")
+                successful_responses.append(response)
+            if len(successful_responses) == 0:
+                return create_response_message("error", "All web searches failed")
+            # Deduplicate articles and answers, rank them by score and recency and
+            # keep them within the NEWS_TOKEN_BUDGET
+            results = compact_news(successful_responses)
             logger.info(f"Search results after score filtering: {len(results)} news")
             if len(results) == 0:
                 return create_response_message("error", "Data retrieved from web search is empty")
@@ -0,0 +1,362 @@
+"""
+Outbreak alerts of the report.
+Aberration detection (EARS C1, C2 and C3, CUSUM and seasonal historical limits)
+over the daily and weekly cases, deaths and ICU admissions of the country and
+of every state. The series are fetched from influd_cube in a single query and
+every algorithm runs on the whole (area, metric, time) array at once.
+Only increases are signaled.
+"""
+
+from datetime import datetime, timedelta
+from typing import Any
+import hashlib
+import logging
+from .cube import get_grouping_id
+from .dimensions import UF_CODES
+
+logger = logging.getLogger(__name__)
+
+# Series of each metric, by cube column
+ALERT_METRICS = {
+    "total_casos": "casos",
+    "total_obitos": "obitos",
+    "total_internados_uti": "internados_uti",
+}
+NATIONAL_AREA = "BR"
+ALERT_AREAS = [NATIONAL_AREA, *sorted(UF_CODES, key=UF_CODES.get)]
+
+# EARS: 7 periods of baseline, right before the period (C1) or 2 periods
+# before it (C2, C3), and the thresholds of the standardized values
+EARS_BASELINE = 7
+EARS_GUARD = 2
+EARS_THRESHOLD = 3.0
+C3_THRESHOLD = 2.0
+# Lowest standard deviation of a baseline, so that series with few cases
+# don't alert on every single case
+MIN_SD = 1.0
+
+# CUSUM of the C2 standardized values: allowed drift and decision threshold
+CUSUM_K = 0.5
+CUSUM_H = 4.0
+
+# Historical limits: the same weeks (and SEASONAL_HALF_WINDOW weeks around
+# them) of the previous SEASONAL_YEARS years, mean + SEASONAL_SDS sd
+SEASONAL_YEARS = 3
+SEASONAL_HALF_WINDOW = 3
+SEASONAL_SDS = 2.5
+WEEKS_PER_YEAR = 52
+
+# Periods evaluated by the CUSUM before the report date, and recent periods
+# whose alerts are reported
+EVALUATION_DAYS = 28
+EVALUATION_WEEKS = 12
+RECENT_DAYS = 7
+RECENT_WEEKS = 4
+
+# C1, C2 and C3 share the EARS baseline and the CUSUM accumulates C2, so they
+# are a single vote. A signal reaches the report when this family alerts in
+# its last period and the seasonal limit, which has its own baseline (the
+# previous years), also alerts on the last week of the same area and metric.
+EARS_FAMILY = ("C1", "C2", "C3", "CUSUM")
+SEASONAL_METHOD = "Sazonal"
+
+ALERT_PARAMETERS = {
+    "ears_baseline": EARS_BASELINE,
+    "ears_guard": EARS_GUARD,
+    "ears_threshold": EARS_THRESHOLD,
+    "c3_threshold": C3_THRESHOLD,
+    "min_sd": MIN_SD,
+    "cusum_k": CUSUM_K,
+    "cusum_h": CUSUM_H,
+    "seasonal_years": SEASONAL_YEARS,
+    "seasonal_half_window": SEASONAL_HALF_WINDOW,
+    "seasonal_sds": SEASONAL_SDS,
+    "evaluation_days": EVALUATION_DAYS,
+    "evaluation_weeks": EVALUATION_WEEKS,
+}
+
+
+def get_history_days() -> int:
+    # The seasonal baseline of the oldest evaluated week reaches this far back
+    weeks = (
+        SEASONAL_YEARS * WEEKS_PER_YEAR + SEASONAL_HALF_WINDOW + EVALUATION_WEEKS
+    )
+    return weeks * 7
+
+
+def get_dataset_version(cursor: Any) -> str:
+    """
+    Purpose: Get a version of the loaded data, from the national cube totals.
+    Args:
+        cursor: cursor - The cursor to the database.
+    Returns:
+        str - A digest that changes whenever the data is reloaded with changes.
+    """
+    cursor.execute(
+        f"""SELECT COUNT(*), MIN(data_preenchimento), MAX(data_preenchimento),
+        {", ".join(f"SUM({column})" for column in ALERT_METRICS)}
+        FROM influd_cube WHERE grouping_id = %s""",
+        (get_grouping_id(()),),
+    )
+    return hashlib.sha256(repr(cursor.fetchone()).encode()).hexdigest()[:16]
+
+
+def fetch_alert_series(cursor: Any, report_date: str, days: int) -> Any:
+    """
+    Purpose: Fetch the daily series of every area and metric, in one query.
+    Args:
+        cursor: cursor - The cursor to the database.
+        report_date: str - The last day (YYYY-MM-DD).
+        days: int - The number of days.
+    Returns:
+        numpy.ndarray - Counts by area (ALERT_AREAS), metric (ALERT_METRICS) and day.
+    """
+    import numpy as np
+
+    end = datetime.strptime(report_date, "%Y-%m-%d").date()
+    start = end - timedelta(days=days - 1)
+    national, by_uf = get_grouping_id(()), get_grouping_id(("uf_code",))
+    cursor.execute(
+        f"""SELECT data_preenchimento, grouping_id, uf_code,
+        {", ".join(ALERT_METRICS)}
+        FROM influd_cube
+        WHERE grouping_id IN (%s, %s) AND data_preenchimento BETWEEN %s AND %s
+        AND (grouping_id = %s OR uf_code IS NOT NULL)""",
+        (national, by_uf, start, end, national),
+    )
+    rows = cursor.fetchall()
+    series = np.zeros((len(ALERT_AREAS), len(ALERT_METRICS), days))
+    if not rows:
+        return series
+    columns = list(zip(*rows))
+    area_indexes = {UF_CODES[uf]: i for i, uf in enumerate(ALERT_AREAS) if uf in UF_CODES}
+    areas = np.array(
+        [
+            0 if grouping_id == national else area_indexes[uf_code]
+            for grouping_id, uf_code in zip(columns[1], columns[2])
+        ]
+    )
+    day_indexes = (
+        np.array(columns[0], dtype="datetime64[D]") - np.datetime64(start, "D")
+    ).astype(np.int64)
+    for metric_index in range(len(ALERT_METRICS)):
+        np.add.at(
+            series[:, metric_index],
+            (areas, day_indexes),
+            np.array(columns[3 + metric_index], dtype=float),
+        )
+    return series
+
+
+def to_weekly(daily: Any) -> Any:
+    """
+    Purpose: Sum a daily series into 7-day periods ending on its last day.
+    Args:
+        daily: numpy.ndarray - Counts with the days on the last axis.
+    Returns:
+        numpy.ndarray - Counts with the weeks on the last axis (oldest first).
+    """
+    weeks = daily.shape[-1] // 7
+    recent = daily[..., daily.shape[-1] - weeks * 7 :]
+    return recent.reshape(*daily.shape[:-1], weeks, 7).sum(axis=-1)
+
+
+def _standardize(series: Any, lag: int) -> Any:
+    """
+    Purpose: Standardize each period by the mean and standard deviation of the
+    EARS_BASELINE periods ending lag periods before it (NaN without a baseline).
+    """
+    import numpy as np
+    from numpy.lib.stride_tricks import sliding_window_view
+
+    windows = sliding_window_view(series, EARS_BASELINE, axis=-1)
+    mean = windows.mean(axis=-1)
+    sd = np.maximum(windows.std(axis=-1, ddof=1), MIN_SD)
+    # Window i ends at period i + EARS_BASELINE - 1, its period is lag later
+    offset = EARS_BASELINE - 1 + lag
+    periods = series.shape[-1] - offset
+    standardized = np.full(series.shape, np.nan)
+    if periods > 0:
+        standardized[..., offset:] = (
+            series[..., offset:] - mean[..., :periods]
+        ) / sd[..., :periods]
+    return standardized
+
+
+def ears(series: Any) -> dict[str, Any]:
+    """
+    Purpose: EARS C1, C2 and C3 statistics of every period.
+    Args:
+        series: numpy.ndarray - Counts with the periods on the last axis.
+    Returns:
+        dict[str, numpy.ndarray] - The "c1", "c2" and "c3" statistics.
+    """
+    import numpy as np
+    from numpy.lib.stride_tricks import sliding_window_view
+
+    c1 = _standardize(series, 1)
+    c2 = _standardize(series, 1 + EARS_GUARD)
+    excess = np.maximum(np.nan_to_num(c2) - 1, 0)
+    c3 = np.full(series.shape, np.nan)
+    c3[..., 2:] = sliding_window_view(excess, 3, axis=-1).sum(axis=-1)
+    c3[np.isnan(c2)] = np.nan
+    return {"c1": c1, "c2": c2, "c3": c3}
+
+
+def cusum(standardized: Any, periods: int) -> Any:
+    """
+    Purpose: Upper CUSUM of standardized values over their last periods,
+    looping over time but vectorized over every area and metric.
+    Args:
+        standardized: numpy.ndarray - Standardized values, periods on the last axis.
+        periods: int - The last periods accumulated.
+    Returns:
+        numpy.ndarray - The CUSUM of the last periods.
+    """
+    import numpy as np
+
+    values = np.nan_to_num(standardized[..., -periods:])
+    sums = np.zeros(values.shape)
+    current = np.zeros(values.shape[:-1])
+    for period in range(values.shape[-1]):
+        current = np.maximum(0, current + values[..., period] - CUSUM_K)
+        sums[..., period] = current
+    return sums
+
+
+def seasonal_limits(weekly: Any, weeks: int) -> Any:
+    """
+    Purpose: Historical limits of the last weeks: mean + SEASONAL_SDS standard
+    deviations of the same weeks of the previous years and the weeks around them.
+    Args:
+        weekly: numpy.ndarray - Weekly counts, weeks on the last axis.
+        weeks: int - The last weeks evaluated.
+    Returns:
+        numpy.ndarray - The upper limit of the last weeks, NaN without history.
+    """
+    import numpy as np
+
+    total = weekly.shape[-1]
+    evaluated = np.arange(total - weeks, total)
+    shifts = np.array(
+        [
+            years * WEEKS_PER_YEAR + around
+            for years in range(1, SEASONAL_YEARS + 1)
+            for around in range(-SEASONAL_HALF_WINDOW, SEASONAL_HALF_WINDOW + 1)
+        ]
+    )
+    indexes = evaluated[:, None] - shifts[None, :]
+    valid = indexes >= 0
+    history = np.where(valid, weekly[..., np.clip(indexes, 0, None)], np.nan)
+    with np.errstate(invalid="ignore"):
+        mean = np.nanmean(history, axis=-1)
+        sd = np.nanstd(history, axis=-1, ddof=1)
+    limits = mean + SEASONAL_SDS * np.maximum(np.nan_to_num(sd), MIN_SD)
+    limits[..., valid.sum(axis=-1) < 2] = np.nan
+    return limits
+
+
+def detect_alerts(daily: Any, report_date: str) -> dict[str, Any]:
+    """
+    Purpose: Run every algorithm over the daily and weekly series of every
+    area and metric and summarize the signals of the report date.
+    Args:
+        daily: numpy.ndarray - Counts by area, metric and day (see fetch_alert_series).
+        report_date: str - The last day of the series (YYYY-MM-DD).
+    Returns:
+        dict[str, Any] - Signals of every area, metric and frequency: the last
+            period values and statistics, the methods alerting in it and the
+            alerts of the recent periods.
+    """
+    import numpy as np
+
+    signals = []
+    for frequency, series, evaluation, recent in [
+        ("diaria", daily, EVALUATION_DAYS, RECENT_DAYS),
+        ("semanal", to_weekly(daily), EVALUATION_WEEKS, RECENT_WEEKS),
+    ]:
+        statistics = ears(series)
+        flags = {
+            "C1": statistics["c1"][..., -recent:] > EARS_THRESHOLD,
+            "C2": statistics["c2"][..., -recent:] > EARS_THRESHOLD,
+            "C3": statistics["c3"][..., -recent:] > C3_THRESHOLD,
+        }
+        sums = cusum(statistics["c2"], evaluation)
+        flags["CUSUM"] = sums[..., -recent:] > CUSUM_H
+        limits = None
+        if frequency == "semanal":
+            limits = seasonal_limits(series, recent)
+            flags[SEASONAL_METHOD] = series[..., -recent:] > np.nan_to_num(limits, nan=np.inf)
+        for area_index, area in enumerate(ALERT_AREAS):
+            for metric_index, metric in enumerate(ALERT_METRICS.values()):
+                position = (area_index, metric_index)
+                recent_alerts = {
+                    method: int(values[position].sum())
+                    for method, values in flags.items()
+                    if values[position].any()
+                }
+                signal = {
+                    "area": area,
+                    "metrica": metric,
+                    "frequencia": frequency,
+                    "ultimo_periodo": float(series[position][-1]),
+                    **{
+                        name: _round(values[position][-1])
+                        for name, values in statistics.items()
+                    },
+                    "cusum": _round(sums[position][-1]),
+                    # Methods alerting in the last period
+                    "alertas": [
+                        method
+                        for method, values in flags.items()
+                        if values[position][-1]
+                    ],
+                    # Periods with an alert among the recent ones, by method
+                    "periodos_com_alerta": recent_alerts,
+                }
+                if limits is not None:
+                    signal["limite_sazonal"] = _round(limits[position][-1])
+                signals.append(signal)
+    return {
+        "report_date": report_date,
+        "parameters": ALERT_PARAMETERS,
+        "signals": signals,
+    }
+
+
+def _round(value: Any) -> float | None:
+    import numpy as np
+
+    return None if np.isnan(value) else round(float(value), 3)
+
+
+def get_active_alerts(alerts: dict[str, Any]) -> list[dict[str, Any]]:
+    """
+    Purpose: Get the signals with an EARS_FAMILY method alerting in their last
+    period whose area and metric are also above the seasonal limit on the last
+    week, for the report prompts.
+    Args:
+        alerts: dict[str, Any] - The detect_alerts result.
+    Returns:
+        list[dict[str, Any]] - Area, metric, frequency, last period, alerting
+            methods and the recent periods with alerts.
+    """
+    keys = [
+        "area",
+        "metrica",
+        "frequencia",
+        "ultimo_periodo",
+        "alertas",
+        "periodos_com_alerta",
+    ]
+    above_seasonal = {
+        (signal["area"], signal["metrica"])
+        for signal in alerts["signals"]
+        if SEASONAL_METHOD in signal["alertas"]
+    }
+    return [
+        {key: signal[key] for key in keys}
+        for signal in alerts["signals"]
+        if (signal["area"], signal["metrica"]) in above_seasonal
+        and any(method in EARS_FAMILY for method in signal["alertas"])
+    ]
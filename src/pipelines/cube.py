@@ -0,0 +1,128 @@
+from typing import Dict, Any
+import logging
+from ..utils.db import get_db_connection
+
+logger = logging.getLogger(__name__)
+
+# Dimensions of the cube, in GROUPING() bit order (uf_code is the highest bit)
+CUBE_DIMENSIONS = ["uf_code", "age_band", "sex_code"]
+
+# Dimension combinations computed by build_cube, every one by day.
+# The empty set holds the national totals.
+CUBE_GROUPING_SETS = [
+    (),
+    ("uf_code",),
+    ("age_band",),
+    ("sex_code",),
+    ("uf_code", "age_band"),
+    ("uf_code", "sex_code"),
+    ("age_band", "sex_code"),
+    ("uf_code", "age_band", "sex_code"),
+]
+
+# Same metrics (and filters) as the QueryDataTool queries over influd_data
+CUBE_METRICS = {
+    "total_casos": "COUNT(*)",
+    "total_vacinados": "COUNT(*) FILTER (WHERE vacina_covid = 1 AND vacina_gripe = 1)",
+    # Per vaccine counts of the coverage indicators
+    "total_vacinados_covid": "COUNT(*) FILTER (WHERE vacina_covid = 1)",
+    "total_vacinados_gripe": "COUNT(*) FILTER (WHERE vacina_gripe = 1)",
+    "total_internados_uti": "COUNT(*) FILTER (WHERE internado_uti = 1)",
+    "total_obitos": "COUNT(*) FILTER (WHERE evolucao = 2)",
+}
+
+
+def get_grouping_id(dimensions: list[str] | tuple[str, ...]) -> int:
+    """
+    Purpose: Get the GROUPING() value of the rows of a dimension combination,
+    a bit is set for every dimension that is rolled up.
+    Args:
+        dimensions: list[str] | tuple[str, ...] - The dimensions grouped by.
+    Returns:
+        int - The grouping id.
+    """
+    unknown = set(dimensions) - set(CUBE_DIMENSIONS)
+    if unknown:
+        raise ValueError(f"Invalid cube dimensions: {', '.join(sorted(unknown))}")
+    return sum(
+        1 << (len(CUBE_DIMENSIONS) - 1 - i)
+        for i, dimension in enumerate(CUBE_DIMENSIONS)
+        if dimension not in dimensions
+    )
+
+
+def get_cube_sql(
+    grouping_sets: list[tuple[str, ...]], table: str = "influd_cube"
+) -> str:
+    """
+    Purpose: Get the statement that fills the cube in a single scan of influd_data.
+    Args:
+        grouping_sets: list[tuple[str, ...]] - The dimension combinations.
+        table: str - The cube table.
+    Returns:
+        str - The INSERT ... SELECT ... GROUP BY GROUPING SETS statement.
+    """
+    sets = ", ".join(
+        f"({', '.join(['data_preenchimento', *dimensions])})"
+        for dimensions in grouping_sets
+    )
+    return f"""
+        INSERT INTO {table} (data_preenchimento, grouping_id, {", ".join(CUBE_DIMENSIONS)},
+            {", ".join(CUBE_METRICS)})
+        SELECT data_preenchimento,
+            GROUPING({", ".join(CUBE_DIMENSIONS)}),
+            {", ".join(CUBE_DIMENSIONS)},
+            {", ".join(CUBE_METRICS.values())}
+        FROM influd_data
+        WHERE data_preenchimento IS NOT NULL
+        GROUP BY GROUPING SETS ({sets})
+        """
+
+
+def build_cube(state: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Purpose: Rebuild the gold table 'influd_cube' with the daily metrics of every
+    combination of CUBE_GROUPING_SETS, computed in one GROUPING SETS pass.
+    The new cube is built aside and swapped in within the same transaction.
+    """
+    try:
+        conn = get_db_connection("srag_brasil")
+        cursor = conn.cursor()
+        cursor.execute("DROP TABLE IF EXISTS influd_cube_new")
+        cursor.execute(
+            f"""
+            CREATE TABLE influd_cube_new (
+                data_preenchimento DATE NOT NULL,
+                grouping_id SMALLINT NOT NULL,
+                {", ".join(f"{dimension} SMALLINT" for dimension in CUBE_DIMENSIONS)},
+                {", ".join(f"{metric} INTEGER NOT NULL" for metric in CUBE_METRICS)}
+            )
+            """
+        )
+        cursor.execute(get_cube_sql(CUBE_GROUPING_SETS, "influd_cube_new"))
+        rows = cursor.rowcount
+        cursor.execute(
+            "CREATE INDEX influd_cube_new_grouping_date_idx "
+            "ON influd_cube_new (grouping_id, data_preenchimento)"
+        )
+        cursor.execute("DROP TABLE IF EXISTS influd_cube")
+        cursor.execute("ALTER TABLE influd_cube_new RENAME TO influd_cube")
+        cursor.execute(
+            "ALTER INDEX influd_cube_new_grouping_date_idx "
+            "RENAME TO influd_cube_grouping_date_idx"
+        )
+        cursor.execute("ANALYZE influd_cube")
+        conn.commit()
+        logger.info(
+            f"Cube built with {rows} rows for {len(CUBE_GROUPING_SETS)} grouping sets"
+        )
+        state["stage"] = "cube_built"
+        return state
+    except Exception as e:
+        logger.error(f"Error building cube: {e}")
+        conn.rollback()
+        state["stage"] = "error"
+        return state
+    finally:
+        cursor.close()
+        conn.close()
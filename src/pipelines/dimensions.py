@@ -0,0 +1,112 @@
+"""
+Dictionary encoding of the report dimensions.
+State (SG_UF_NOT), age (NU_IDADE_N/TP_IDADE) and sex (CS_SEXO) are stored as
+small integer codes in influd_data and in the cube, and decoded back to their
+labels only when presented.
+"""
+
+from typing import Any
+import logging
+
+logger = logging.getLogger(__name__)
+
+# IBGE codes of the federative units
+UF_CODES = {
+    "RO": 11, "AC": 12, "AM": 13, "RR": 14, "PA": 15, "AP": 16, "TO": 17,
+    "MA": 21, "PI": 22, "CE": 23, "RN": 24, "PB": 25, "PE": 26, "AL": 27,
+    "SE": 28, "BA": 29, "MG": 31, "ES": 32, "RJ": 33, "SP": 35, "PR": 41,
+    "SC": 42, "RS": 43, "MS": 50, "MT": 51, "GO": 52, "DF": 53,
+}  # fmt: skip
+
+# CS_SEXO, older files use 1/2/9 instead of M/F/I
+SEX_CODES = {"M": 1, "F": 2, "I": 9, "1": 1, "2": 2, "9": 9}
+SEX_LABELS = {1: "M", 2: "F", 9: "I"}
+
+# Age bands: code, label and lower bound in years (inclusive)
+AGE_BANDS = [
+    (1, "0-4", 0),
+    (2, "5-19", 5),
+    (3, "20-39", 20),
+    (4, "40-59", 40),
+    (5, "60-79", 60),
+    (6, "80+", 80),
+]
+
+# TP_IDADE: 1 = days, 2 = months, 3 = years
+AGE_UNIT_YEARS = 3
+
+UNKNOWN_LABEL = "Ignorado"
+
+# Raw columns used to compute the encoded columns
+RAW_DIMENSION_COLUMNS = ["SG_UF_NOT", "NU_IDADE_N", "TP_IDADE", "CS_SEXO"]
+DIMENSION_COLUMNS = ["uf_code", "age_band", "sex_code"]
+
+# Labels of each dimension code, by dimension column
+DIMENSION_LABELS = {
+    "uf_code": {code: uf for uf, code in UF_CODES.items()},
+    "age_band": {code: label for code, label, _ in AGE_BANDS},
+    "sex_code": SEX_LABELS,
+}
+
+
+def encode_dimension(column: str, label: str) -> int:
+    """
+    Purpose: Get the code of a dimension label (e.g. "SP", "20-39", "F").
+    Args:
+        column: str - The dimension column (one of DIMENSION_COLUMNS).
+        label: str - The label.
+    Returns:
+        int - The code.
+    """
+    codes = {value: code for code, value in DIMENSION_LABELS[column].items()}
+    if label not in codes:
+        raise ValueError(
+            f"Invalid {column} value: {label}, use one of {', '.join(codes)}"
+        )
+    return codes[label]
+
+
+def decode_dimension(column: str, code: Any) -> str:
+    if code is None:
+        return UNKNOWN_LABEL
+    return DIMENSION_LABELS[column].get(int(code), UNKNOWN_LABEL)
+
+
+def encode_dimensions(df: Any) -> Any:
+    """
+    Purpose: Replace the raw dimension columns of a bronze dataframe by their
+    small integer codes (uf_code, age_band, sex_code), empty when unknown.
+    Args:
+        df: pandas.DataFrame - Dataframe with the RAW_DIMENSION_COLUMNS.
+    Returns:
+        pandas.DataFrame - The dataframe with the DIMENSION_COLUMNS last instead.
+    """
+    import pandas as pd
+
+    df = df.copy()
+    df["uf_code"] = (
+        df["SG_UF_NOT"].astype("string").str.strip().str.upper().map(UF_CODES)
+    ).astype("Int16")
+    df["sex_code"] = (
+        df["CS_SEXO"].astype("string").str.strip().str.upper().map(SEX_CODES)
+    ).astype("Int16")
+    age = pd.to_numeric(df["NU_IDADE_N"], errors="coerce")
+    age_unit = pd.to_numeric(df["TP_IDADE"], errors="coerce")
+    years = age.where(age_unit == AGE_UNIT_YEARS, 0).where(age_unit.notna())
+    years = years.where((years >= 0) & (years <= 130))
+    df["age_band"] = pd.cut(
+        years,
+        bins=[lower_bound for _, _, lower_bound in AGE_BANDS] + [float("inf")],
+        labels=[code for code, _, _ in AGE_BANDS],
+        right=False,
+    ).astype("Int16")
+    unknown = {
+        column: int(df[column].isna().sum()) for column in DIMENSION_COLUMNS
+    }
+    logger.info(f"Dimensions encoded, unknown values: {unknown}")
+    other_columns = [
+        column
+        for column in df.columns
+        if column not in RAW_DIMENSION_COLUMNS + DIMENSION_COLUMNS
+    ]
+    return df[other_columns + DIMENSION_COLUMNS]
@@ -0,0 +1,242 @@
+"""
+Gold layer export.
+The daily, weekly and monthly aggregates of the report, the dimensional
+rollups of influd_cube and the ICU census and lengths of stay are written to
+src/data/gold as Parquet datasets, Hive-partitioned by year and month. Every
+partition has a fingerprint of the rows of its source table and only
+partitions whose fingerprint changed since the last export are rewritten.
+"""
+
+from datetime import date, timedelta
+from typing import Dict, Any
+import json
+import logging
+import os
+import shutil
+from ..utils.db import get_db_connection
+from .cube import CUBE_DIMENSIONS, CUBE_METRICS, get_grouping_id
+
+logger = logging.getLogger(__name__)
+
+GOLD_DIR = "src/data/gold"
+MANIFEST_NAME = "_manifest.json"
+
+NATIONAL_GROUPING_ID = get_grouping_id(())
+
+METRICS_SQL = ", ".join(f"SUM({metric}) AS {metric}" for metric in CUBE_METRICS)
+
+# Source tables of the datasets, their date column (which sets the month of a
+# row) and the order of the rows in their fingerprint
+GOLD_SOURCES = {
+    "influd_cube": (
+        "data_preenchimento",
+        f"grouping_id, data_preenchimento, {', '.join(CUBE_DIMENSIONS)}",
+    ),
+    "influd_uti_census": ("dia", "grouping_id, dia, uf_code"),
+    "influd_uti_stays": ("mes_entrada", "grouping_id, mes_entrada, uf_code, dias_uti"),
+}
+
+# Columns that are not counts
+DATE_COLUMNS = {"data_preenchimento", "week_start", "month_start", "dia", "mes_entrada"}
+CODE_COLUMNS = {*CUBE_DIMENSIONS, "grouping_id", "dias_uti"}
+
+# Dataset name, its source table, its columns and the query of one partition,
+# which receives the first and last day of the month
+GOLD_DATASETS = {
+    "daily": (
+        "influd_cube",
+        ["data_preenchimento", *CUBE_METRICS],
+        f"""SELECT data_preenchimento, {", ".join(CUBE_METRICS)}
+        FROM influd_cube
+        WHERE grouping_id = {NATIONAL_GROUPING_ID}
+        AND data_preenchimento BETWEEN %(start)s AND %(end)s
+        ORDER BY data_preenchimento""",
+    ),
+    # Weeks (starting on Monday) belong to the month they start in
+    "weekly": (
+        "influd_cube",
+        ["week_start", *CUBE_METRICS],
+        f"""SELECT DATE_TRUNC('week', data_preenchimento)::date AS week_start, {METRICS_SQL}
+        FROM influd_cube
+        WHERE grouping_id = {NATIONAL_GROUPING_ID}
+        AND data_preenchimento BETWEEN %(start)s AND %(end)s::date + 6
+        AND DATE_TRUNC('week', data_preenchimento)::date BETWEEN %(start)s AND %(end)s
+        GROUP BY week_start
+        ORDER BY week_start""",
+    ),
+    "monthly": (
+        "influd_cube",
+        ["month_start", *CUBE_METRICS],
+        f"""SELECT DATE_TRUNC('month', data_preenchimento)::date AS month_start, {METRICS_SQL}
+        FROM influd_cube
+        WHERE grouping_id = {NATIONAL_GROUPING_ID}
+        AND data_preenchimento BETWEEN %(start)s AND %(end)s
+        GROUP BY month_start""",
+    ),
+    "daily_rollups": (
+        "influd_cube",
+        ["data_preenchimento", "grouping_id", *CUBE_DIMENSIONS, *CUBE_METRICS],
+        f"""SELECT data_preenchimento, grouping_id, {", ".join(CUBE_DIMENSIONS)},
+        {", ".join(CUBE_METRICS)}
+        FROM influd_cube
+        WHERE grouping_id <> {NATIONAL_GROUPING_ID}
+        AND data_preenchimento BETWEEN %(start)s AND %(end)s
+        ORDER BY grouping_id, data_preenchimento, {", ".join(CUBE_DIMENSIONS)}""",
+    ),
+    # Patients in the ICU by day, national (uf_code null) and by state
+    "uti_census": (
+        "influd_uti_census",
+        [
+            "dia",
+            "grouping_id",
+            "uf_code",
+            "entradas",
+            "saidas",
+            "ocupacao",
+            "ocupacao_saida_estimada",
+        ],
+        """SELECT dia, grouping_id, uf_code, entradas, saidas, ocupacao,
+        ocupacao_saida_estimada
+        FROM influd_uti_census
+        WHERE dia BETWEEN %(start)s AND %(end)s
+        ORDER BY grouping_id, uf_code, dia""",
+    ),
+    # ICU stays with a discharge date by admission month and days in the ICU
+    "uti_length_of_stay": (
+        "influd_uti_stays",
+        ["mes_entrada", "grouping_id", "uf_code", "dias_uti", "total_internacoes"],
+        """SELECT mes_entrada, grouping_id, uf_code, dias_uti, total_internacoes
+        FROM influd_uti_stays
+        WHERE mes_entrada BETWEEN %(start)s AND %(end)s
+        ORDER BY grouping_id, uf_code, dias_uti""",
+    ),
+}
+
+
+def _get_month_bounds(year: int, month: int) -> tuple[date, date]:
+    start = date(year, month, 1)
+    next_month = date(year + month // 12, month % 12 + 1, 1)
+    return start, next_month - timedelta(days=1)
+
+
+def _get_partition_dir(gold_dir: str, dataset: str, year: int, month: int) -> str:
+    return os.path.join(gold_dir, dataset, f"year={year}", f"month={month:02d}")
+
+
+def get_partition_fingerprints(cursor: Any, source: str) -> dict[str, str]:
+    """
+    Purpose: Get a fingerprint of the rows of every month of a source table.
+    Args:
+        cursor: cursor - The cursor to the database.
+        source: str - The source table, one of GOLD_SOURCES.
+    Returns:
+        dict[str, str] - The md5 of the month rows, by "YYYY-MM".
+    """
+    date_column, order = GOLD_SOURCES[source]
+    cursor.execute(
+        f"""SELECT TO_CHAR({date_column}, 'YYYY-MM') AS partition,
+        MD5(STRING_AGG(source::text, '|' ORDER BY {order}))
+        FROM {source} AS source
+        GROUP BY partition"""
+    )
+    return dict(cursor.fetchall())
+
+
+def _write_partition(cursor: Any, dataset: str, partition: str, gold_dir: str) -> int:
+    """
+    Purpose: Rewrite one partition of a dataset, replacing the previous one
+    with a rename so readers never see a partial file.
+    Returns:
+        int - The rows written.
+    """
+    import pandas as pd
+
+    _, columns, query = GOLD_DATASETS[dataset]
+    year, month = map(int, partition.split("-"))
+    start, end = _get_month_bounds(year, month)
+    cursor.execute(query, {"start": start, "end": end})
+    df = pd.DataFrame(cursor.fetchall(), columns=columns)
+    for column in columns:
+        if column in DATE_COLUMNS:
+            df[column] = pd.to_datetime(df[column])
+        elif column in CODE_COLUMNS:
+            df[column] = df[column].astype("Int16")
+        else:
+            df[column] = df[column].astype("int64")
+    partition_dir = _get_partition_dir(gold_dir, dataset, year, month)
+    if df.empty:
+        shutil.rmtree(partition_dir, ignore_errors=True)
+        return 0
+    os.makedirs(partition_dir, exist_ok=True)
+    path = os.path.join(partition_dir, "part-0.parquet")
+    df.to_parquet(f"{path}.tmp", engine="pyarrow", index=False)
+    os.replace(f"{path}.tmp", path)
+    return len(df)
+
+
+def _get_previous_partition(partition: str) -> str:
+    year, month = map(int, partition.split("-"))
+    return f"{year - 1}-12" if month == 1 else f"{year}-{month - 1:02d}"
+
+
+def export_gold(state: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Purpose: Export the gold datasets of the months whose source rows changed
+    since the last export, and remove the months that no longer have data.
+    """
+    gold_dir = os.getenv("GOLD_DIR", GOLD_DIR)
+    manifest_path = os.path.join(gold_dir, MANIFEST_NAME)
+    try:
+        conn = get_db_connection("srag_brasil")
+        cursor = conn.cursor()
+        previous = {}
+        if os.path.exists(manifest_path):
+            with open(manifest_path, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+            # Manifests before the ICU datasets only had the cube partitions
+            previous = manifest.get("sources") or {
+                "influd_cube": manifest.get("partitions", {})
+            }
+        fingerprints, changed, removed = {}, {}, {}
+        for source in GOLD_SOURCES:
+            fingerprints[source] = get_partition_fingerprints(cursor, source)
+            before = previous.get(source, {})
+            changed[source] = {
+                partition
+                for partition, fingerprint in fingerprints[source].items()
+                if before.get(partition) != fingerprint
+            }
+            removed[source] = set(before) - set(fingerprints[source])
+        rows = 0
+        for dataset, (source, _, _) in GOLD_DATASETS.items():
+            partitions = changed[source] | removed[source]
+            if dataset == "weekly":
+                # The last week of the previous month may reach into a changed month
+                partitions |= {_get_previous_partition(p) for p in set(partitions)}
+                partitions &= set(fingerprints[source]) | removed[source]
+            for partition in sorted(partitions):
+                rows += _write_partition(cursor, dataset, partition, gold_dir)
+        os.makedirs(gold_dir, exist_ok=True)
+        with open(f"{manifest_path}.tmp", "w", encoding="utf-8") as f:
+            json.dump(
+                {"datasets": list(GOLD_DATASETS), "sources": fingerprints},
+                f,
+                indent=2,
+                sort_keys=True,
+            )
+        os.replace(f"{manifest_path}.tmp", manifest_path)
+        for source in GOLD_SOURCES:
+            logger.info(
+                f"Gold export of {source}: {len(changed[source])} changed and "
+                f"{len(removed[source])} removed of {len(fingerprints[source])} partitions"
+            )
+        logger.info(f"Gold export: {rows} rows written")
+        state["stage"] = "gold_exported"
+        return state
+    except Exception as e:
+        logger.error(f"Error exporting gold datasets: {e}")
+        state["stage"] = "error"
+        return state
+    finally:
+        cursor.close()
+        conn.close()
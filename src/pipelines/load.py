@@ -1,9 +1,14 @@
 from langgraph.graph import StateGraph, START, END
 from typing import TypedDict, Dict, Any
-from .setup import create_table, create_database
-import pandas as pd
+from functools import lru_cache
+from .setup import create_table, create_database, insert_deduplicated
+from .cube import build_cube
+from .gold import export_gold
+from .nowcast import build_delay_histogram
+from .occupancy import build_uti_census
 import logging
 from ..utils.db import get_db_connection
+from ..utils.metrics import instrument_node
 
 logger = logging.getLogger(__name__)
 
@@ -13,6 +18,8 @@ def _insert_data(state: Dict[str, Any]) -> Dict[str, Any]:
     This function inserts the data generated by the extract and transform steps
     into the database of the EDA. It uses the pandas copy_from method to recognize csv format
     and insert the data.
+    The rows are copied into a staging table first and moved to influd_data
+    keeping the first row of every origin_id, as the compact layout migration does.
     """
     try:
         # Connect to the target database
@@ -32,14 +39,36 @@ def _insert_data(state: Dict[str, Any]) -> Dict[str, Any]:
             "evolucao",
             "data_evolucao",
             "data_primeiro_sintoma",
+            "uf_code",
+            "age_band",
+            "sex_code",
         ]
 
+        # File order of the rows, which sets the first row of a duplicated origin_id
+        cursor.execute(
+            "CREATE TEMPORARY TABLE influd_data_staging "
+            "(LIKE influd_data, line BIGSERIAL) ON COMMIT DROP"
+        )
+        # Rows without origin_id are counted and left out instead of failing the copy
+        cursor.execute(
+            "ALTER TABLE influd_data_staging ALTER COLUMN origin_id DROP NOT NULL"
+        )
         with open("src/data/silver/INFLUD21-25.csv", "r") as file:
             # Skip the header row by reading the first line
             next(file)
-            cursor.copy_from(file, "influd_data", sep=";", null="", columns=columns)
+            cursor.copy_from(
+                file, "influd_data_staging", sep=";", null="", columns=columns
+            )
+        deduplication = insert_deduplicated(
+            cursor, "influd_data_staging", "influd_data", "line"
+        )
+        cursor.execute("ANALYZE influd_data")
         conn.commit()
-        logger.info("Data inserted successfully.")
+        logger.info(
+            f"Data inserted successfully: {deduplication['inserted_rows']} rows, "
+            f"{deduplication['duplicated_rows_dropped']} duplicated and "
+            f"{deduplication['missing_origin_id_rows_dropped']} without origin_id dropped"
+        )
         state["stage"] = "data_ETL_completed"
         return state
     except Exception as e:
@@ -53,17 +82,46 @@ def _insert_data(state: Dict[str, Any]) -> Dict[str, Any]:
 
 
 class LoadPipelineState(TypedDict):
-    data: pd.DataFrame
+    data: Any
     stage: str
 
 
-graph = StateGraph(state_schema=LoadPipelineState)
-graph.add_node("create_database", create_database)
-graph.add_node("create_table", create_table)
-graph.add_node("insert_data", _insert_data)
-graph.add_edge(START, "create_database")
-graph.add_edge("create_database", "create_table")
-graph.add_edge("create_table", "insert_data")
-graph.add_edge("insert_data", END)
+def _verify_step(state: LoadPipelineState) -> str:
+    # The next steps read the tables of the failed one
+    return "END" if state["stage"] == "error" else "CONTINUE"
 
-compiled_graph = graph.compile()
+
+@lru_cache(maxsize=None)
+def get_compiled_graph():
+    """
+    Purpose: Build and compile the load graph on first use.
+    Returns:
+        CompiledStateGraph - The compiled load graph.
+    """
+    graph = StateGraph(state_schema=LoadPipelineState)
+    nodes = [
+        ("create_database", create_database),
+        ("create_table", create_table),
+        ("insert_data", _insert_data),
+        ("build_cube", build_cube),
+        ("build_delay_histogram", build_delay_histogram),
+        ("build_uti_census", build_uti_census),
+        ("export_gold", export_gold),
+    ]
+    for node_name, node_func in nodes:
+        graph.add_node(node_name, instrument_node(node_name, node_func))
+    graph.add_edge(START, nodes[0][0])
+    # Stop at the first failed step
+    for (node_name, _), (next_node, _) in zip(nodes, nodes[1:]):
+        graph.add_conditional_edges(
+            node_name, _verify_step, {"CONTINUE": next_node, "END": END}
+        )
+    graph.add_edge(nodes[-1][0], END)
+    return graph.compile()
+
+
+def __getattr__(name: str):
+    # Keeps `from src.pipelines.load import compiled_graph` working, built lazily
+    if name == "compiled_graph":
+        return get_compiled_graph()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,202 @@
+"""
+Versioned migrations of the influd_data schema.
+The applied version is recorded in the schema_version table. Databases loaded
+before it existed have the original layout, version 1.
+"""
+
+from datetime import datetime, timedelta
+from typing import Dict, Any, Callable
+import json
+import logging
+import os
+import time
+from ..utils.db import get_db_connection
+from .setup import (
+    INFLUD_COLUMNS,
+    SCHEMA_VERSION,
+    get_create_influd_table_sql,
+    get_date_index_name,
+    insert_deduplicated,
+    set_schema_version,
+)
+
+logger = logging.getLogger(__name__)
+
+MIGRATION_REPORT_DIR = "src/data/reports/migrations"
+
+# Representative report scan, timed before and after each migration
+SCAN_QUERY = """SELECT DATE_PART('month', data_preenchimento) AS month,
+    COUNT(*), COUNT(*) FILTER (WHERE internado_uti = 1),
+    COUNT(*) FILTER (WHERE evolucao = 2)
+    FROM {table}
+    WHERE data_preenchimento BETWEEN %s AND %s
+    GROUP BY month"""
+
+
+def get_schema_version(cursor: Any) -> int:
+    """
+    Purpose: Get the applied schema version of influd_data.
+    Args:
+        cursor: cursor - The cursor to the database.
+    Returns:
+        int - The version, 1 for tables created before versioning, 0 without a table.
+    """
+    cursor.execute("SELECT to_regclass('public.schema_version') IS NOT NULL")
+    if cursor.fetchone()[0]:
+        cursor.execute("SELECT MAX(version) FROM schema_version")
+        version = cursor.fetchone()[0]
+        if version is not None:
+            return version
+    cursor.execute("SELECT to_regclass('public.influd_data') IS NOT NULL")
+    return 1 if cursor.fetchone()[0] else 0
+
+
+def measure_table(cursor: Any, table: str = "influd_data", runs: int = 3) -> dict:
+    """
+    Purpose: Measure the size of a table and the time of a full-year report scan.
+    Args:
+        cursor: cursor - The cursor to the database.
+        table: str - The table name.
+        runs: int - Scan repetitions, the fastest one is reported.
+    Returns:
+        dict - Rows, heap, index and total sizes in bytes and scan seconds.
+    """
+    cursor.execute(
+        f"""SELECT COUNT(*), pg_relation_size(%s::regclass),
+        pg_indexes_size(%s::regclass), pg_total_relation_size(%s::regclass),
+        MAX(data_preenchimento)
+        FROM {table}""",
+        (table, table, table),
+    )
+    rows, heap_bytes, index_bytes, total_bytes, max_date = cursor.fetchone()
+    scan_seconds = None
+    if max_date is not None:
+        start_date = max_date - timedelta(days=365)
+        timings = []
+        for _ in range(runs):
+            start = time.perf_counter()
+            cursor.execute(SCAN_QUERY.format(table=table), (start_date, max_date))
+            cursor.fetchall()
+            timings.append(time.perf_counter() - start)
+        scan_seconds = round(min(timings), 6)
+    return {
+        "rows": rows,
+        "heap_bytes": heap_bytes,
+        "index_bytes": index_bytes,
+        "total_bytes": total_bytes,
+        "bytes_per_row": round(total_bytes / rows, 1) if rows else None,
+        "scan_seconds": scan_seconds,
+    }
+
+
+def _migrate_to_compact_layout(cursor: Any) -> dict:
+    """
+    Purpose: Rewrite influd_data with the compact layout of setup.INFLUD_COLUMNS:
+    SMALLINT flags, alignment-aware column order and origin_id as the primary
+    key instead of (id, origin_id). Rows are written in date order, which keeps
+    the BRIN index tight, and duplicated origin_ids keep their first row.
+    Returns:
+        dict - The deduplication counts of setup.insert_deduplicated.
+    """
+    # Dimension codes only exist in tables loaded after they were added
+    cursor.execute(
+        """SELECT column_name FROM information_schema.columns
+        WHERE table_schema = 'public' AND table_name = 'influd_data'"""
+    )
+    existing = {row[0] for row in cursor.fetchall()}
+    select = ", ".join(
+        name if name in existing else f"NULL::{type_.split()[0]} AS {name}"
+        for name, type_ in INFLUD_COLUMNS
+    )
+    order = "id" if "id" in existing else "origin_id"
+    cursor.execute("DROP TABLE IF EXISTS influd_data_compact")
+    cursor.execute(get_create_influd_table_sql("influd_data_compact"))
+    deduplication = insert_deduplicated(
+        cursor, "influd_data", "influd_data_compact", order, select
+    )
+    logger.info(
+        f"{deduplication['inserted_rows']} rows copied to the compact layout, "
+        f"{deduplication['duplicated_rows_dropped']} duplicated and "
+        f"{deduplication['missing_origin_id_rows_dropped']} without origin_id dropped"
+    )
+    cursor.execute("DROP TABLE influd_data")
+    cursor.execute("ALTER TABLE influd_data_compact RENAME TO influd_data")
+    cursor.execute("ALTER INDEX influd_data_compact_pkey RENAME TO influd_data_pkey")
+    cursor.execute(
+        f"ALTER INDEX {get_date_index_name('influd_data_compact')} "
+        f"RENAME TO {get_date_index_name('influd_data')}"
+    )
+    cursor.execute("ANALYZE influd_data")
+    return {"deduplication": deduplication}
+
+
+# Migration to each version, applied in order
+# Each migration returns the details of its report
+MIGRATIONS: dict[int, tuple[str, Callable[[Any], dict]]] = {
+    2: ("Compact influd_data layout", _migrate_to_compact_layout),
+}
+
+
+def _write_migration_report(version: int, report: dict) -> None:
+    try:
+        os.makedirs(MIGRATION_REPORT_DIR, exist_ok=True)
+        path = os.path.join(MIGRATION_REPORT_DIR, f"v{version}.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        logger.info(f"Migration report saved to: {path}")
+    except Exception as e:
+        logger.error(f"Error writing migration report: {e}")
+
+
+def run_migrations(state: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Purpose: Apply the pending schema migrations of influd_data, each one in
+    its own transaction, and save the table size and scan time before and
+    after each one.
+    """
+    try:
+        conn = get_db_connection("srag_brasil")
+        cursor = conn.cursor()
+        current_version = get_schema_version(cursor)
+        if current_version == 0:
+            logger.info("Table influd_data doesn't exist, nothing to migrate")
+            state["stage"] = "schema_up_to_date"
+            return state
+        for version in range(current_version + 1, SCHEMA_VERSION + 1):
+            description, migrate = MIGRATIONS[version]
+            logger.info(f"Applying migration {version}: {description}")
+            before = measure_table(cursor)
+            start = time.perf_counter()
+            details = migrate(cursor)
+            set_schema_version(cursor, version, description)
+            conn.commit()
+            migration_seconds = time.perf_counter() - start
+            after = measure_table(cursor)
+            conn.commit()
+            _write_migration_report(
+                version,
+                {
+                    "version": version,
+                    "description": description,
+                    "applied_at": datetime.now().isoformat(timespec="seconds"),
+                    "migration_seconds": round(migration_seconds, 3),
+                    "before": before,
+                    "after": after,
+                    **details,
+                },
+            )
+            logger.info(
+                f"Migration {version} applied: {before['total_bytes']} -> "
+                f"{after['total_bytes']} bytes, scan {before['scan_seconds']}s -> "
+                f"{after['scan_seconds']}s"
+            )
+        state["stage"] = "schema_up_to_date"
+        return state
+    except Exception as e:
+        logger.error(f"Error migrating schema: {e}")
+        conn.rollback()
+        state["stage"] = "error"
+        return state
+    finally:
+        cursor.close()
+        conn.close()
@@ -0,0 +1,197 @@
+"""
+Nowcasting of the recent cases.
+Cases of the last days are still being notified, so their counts by symptom
+onset are incomplete. The load builds a histogram of the delay between the
+first symptom and the notification of each case, by onset day, and the report
+corrects the recent days with the delay distribution of the older days, all
+of it vectorized over the days with NumPy.
+"""
+
+from datetime import date, datetime, timedelta
+from typing import Dict, Any
+import logging
+from ..utils.db import get_db_connection
+
+logger = logging.getLogger(__name__)
+
+# Delays from this number of days on are kept in the last histogram bucket
+MAX_DELAY_DAYS = 60
+
+# Fully reported onset days whose delays are used by the estimator
+TRAINING_DAYS = 180
+
+# Days corrected by the report, and the simulations of their intervals
+NOWCAST_DAYS = 30
+NOWCAST_SAMPLES = 2000
+NOWCAST_LEVEL = 0.95
+
+# Lowest reported share a day is divided by, bounds the correction of day 0
+MIN_REPORTED_SHARE = 0.05
+
+
+def build_delay_histogram(state: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Purpose: Rebuild the table 'influd_delay_histogram' with the cases of each
+    symptom onset day by notification delay (in days, capped at MAX_DELAY_DAYS),
+    in a single scan of influd_data. Cases notified before their onset are left out.
+    """
+    try:
+        conn = get_db_connection("srag_brasil")
+        cursor = conn.cursor()
+        cursor.execute("DROP TABLE IF EXISTS influd_delay_histogram_new")
+        cursor.execute(
+            """
+            CREATE TABLE influd_delay_histogram_new (
+                data_primeiro_sintoma DATE NOT NULL,
+                delay_days SMALLINT NOT NULL,
+                total_casos INTEGER NOT NULL,
+                CONSTRAINT influd_delay_histogram_new_pkey
+                    PRIMARY KEY (data_primeiro_sintoma, delay_days)
+            )
+            """
+        )
+        cursor.execute(
+            """
+            INSERT INTO influd_delay_histogram_new
+            SELECT data_primeiro_sintoma,
+                LEAST(data_preenchimento - data_primeiro_sintoma, %s) AS delay_days,
+                COUNT(*)
+            FROM influd_data
+            WHERE data_preenchimento >= data_primeiro_sintoma
+            GROUP BY data_primeiro_sintoma, delay_days
+            """,
+            (MAX_DELAY_DAYS,),
+        )
+        rows = cursor.rowcount
+        cursor.execute("DROP TABLE IF EXISTS influd_delay_histogram")
+        cursor.execute(
+            "ALTER TABLE influd_delay_histogram_new RENAME TO influd_delay_histogram"
+        )
+        cursor.execute(
+            "ALTER INDEX influd_delay_histogram_new_pkey "
+            "RENAME TO influd_delay_histogram_pkey"
+        )
+        cursor.execute("ANALYZE influd_delay_histogram")
+        conn.commit()
+        logger.info(f"Delay histogram built with {rows} rows")
+        state["stage"] = "delay_histogram_built"
+        return state
+    except Exception as e:
+        logger.error(f"Error building delay histogram: {e}")
+        conn.rollback()
+        state["stage"] = "error"
+        return state
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def fetch_delay_histogram(cursor: Any, report_date: str, days: int) -> Any:
+    """
+    Purpose: Fetch the delay histogram of the onset days before a report date,
+    as it was known on that date (cases notified until the report date).
+    Args:
+        cursor: cursor - The cursor to the database.
+        report_date: str - The report date (YYYY-MM-DD).
+        days: int - The onset days, the last one is the report date.
+    Returns:
+        numpy.ndarray - Cases by onset day (rows) and delay (columns).
+    """
+    import numpy as np
+
+    end = datetime.strptime(report_date, "%Y-%m-%d").date()
+    start = end - timedelta(days=days - 1)
+    cursor.execute(
+        """SELECT data_primeiro_sintoma, delay_days, total_casos
+        FROM influd_delay_histogram
+        WHERE data_primeiro_sintoma BETWEEN %s AND %s
+        AND data_primeiro_sintoma + delay_days <= %s""",
+        (start, end, end),
+    )
+    rows = cursor.fetchall()
+    histogram = np.zeros((days, MAX_DELAY_DAYS + 1), dtype=np.int64)
+    if rows:
+        onsets, delays, cases = zip(*rows)
+        day_indexes = (
+            np.array(onsets, dtype="datetime64[D]") - np.datetime64(start, "D")
+        ).astype(np.int64)
+        np.add.at(histogram, (day_indexes, np.array(delays)), np.array(cases))
+    return histogram
+
+
+def estimate_nowcast(
+    histogram: Any,
+    nowcast_days: int = NOWCAST_DAYS,
+    training_days: int = TRAINING_DAYS,
+    samples: int = NOWCAST_SAMPLES,
+    level: float = NOWCAST_LEVEL,
+    seed: int = 0,
+) -> dict[str, Any] | None:
+    """
+    Purpose: Correct the cases of the last onset days by the share of cases
+    already reported after that many days. The delay distribution is estimated
+    from the last training_days fully reported days. Intervals come from
+    Dirichlet draws of that distribution and negative binomial draws of the
+    cases not reported yet, for every day at once.
+    Args:
+        histogram: numpy.ndarray - Cases by onset day and delay, the last day is
+            the report date (see fetch_delay_histogram).
+        nowcast_days: int - The last days to be corrected.
+        training_days: int - Fully reported days used for the delay distribution.
+        samples: int - Simulations of the intervals.
+        level: float - Interval level.
+        seed: int - Seed of the simulations, fixed for reproducible reports.
+    Returns:
+        dict[str, numpy.ndarray] | None - Observed, estimated, lower and upper
+            cases of the last nowcast_days, None without fully reported days.
+    """
+    import numpy as np
+
+    days, delays = histogram.shape
+    # Days between each onset day and the report date
+    elapsed = np.arange(days)[::-1]
+    delay_counts = histogram[elapsed >= delays - 1][-training_days:].sum(axis=0)
+    if delay_counts.sum() == 0:
+        return None
+    recent = histogram[-nowcast_days:]
+    observed = recent.sum(axis=1)
+    observable = np.minimum(elapsed[-nowcast_days:], delays - 1)
+    reported = np.cumsum(delay_counts)[observable] / delay_counts.sum()
+    estimated = observed / np.clip(reported, MIN_REPORTED_SHARE, 1)
+
+    rng = np.random.default_rng(seed)
+    delay_shares = rng.dirichlet(delay_counts + 1, size=samples)
+    sampled_reported = np.clip(
+        np.cumsum(delay_shares, axis=1)[:, observable], MIN_REPORTED_SHARE, 1
+    )
+    totals = observed + rng.negative_binomial(observed + 1, sampled_reported)
+    lower, upper = np.quantile(totals, [(1 - level) / 2, (1 + level) / 2], axis=0)
+    return {
+        "observed": observed,
+        "estimated": np.maximum(estimated, observed),
+        "lower": np.maximum(lower, observed),
+        "upper": upper,
+        "reported_share": reported,
+    }
+
+
+def get_nowcast_csv(report_date: str, nowcast: dict[str, Any]) -> str:
+    """
+    Purpose: Get the nowcast as a csv string, in the format of the query tool.
+    Args:
+        report_date: str - The report date (YYYY-MM-DD).
+        nowcast: dict[str, numpy.ndarray] - The estimate_nowcast result.
+    Returns:
+        str - Csv string with the day and the observed, estimated, lower and upper cases.
+    """
+    end: date = datetime.strptime(report_date, "%Y-%m-%d").date()
+    days = len(nowcast["observed"])
+    csv_data = "Dia,Casos observados,Casos estimados,Limite inferior,Limite superior\n"
+    for i in range(days):
+        day = end - timedelta(days=days - 1 - i)
+        csv_data += (
+            f"{day.strftime('%d/%m')},{int(nowcast['observed'][i])},"
+            f"{round(float(nowcast['estimated'][i]))},"
+            f"{round(float(nowcast['lower'][i]))},{round(float(nowcast['upper'][i]))}\n"
+        )
+    return csv_data
@@ -0,0 +1,218 @@
+"""
+ICU occupancy census.
+The patients in the ICU on each day are counted from the admission and
+discharge dates of every stay with a difference array: each stay adds +1 on
+its admission day and -1 after its discharge day, and a running sum over the
+days gives the census. This is one pass over influd_data and one over the days
+(O(stays + days)), instead of joining every day with the stays that overlap it.
+The load also keeps the length of stay distribution by admission month.
+"""
+
+from typing import Dict, Any
+import logging
+from ..utils.db import get_db_connection
+from .cube import get_grouping_id
+
+logger = logging.getLogger(__name__)
+
+NATIONAL_GROUPING_ID = get_grouping_id(())
+UF_GROUPING_ID = get_grouping_id(("uf_code",))
+
+# Stays from this number of days on are kept in the last length of stay bucket
+MAX_LOS_DAYS = 90
+
+# Longer stays, or discharges before the admission, are data entry errors
+MAX_STAY_DAYS = 365
+
+# Stay of the admissions without any discharge or outcome date when no stay
+# has a discharge date to take the median from
+DEFAULT_STAY_DAYS = 7
+
+STAYS_SQL = """
+    INSERT INTO influd_uti_stays_new
+    SELECT mes_entrada,
+        CASE WHEN GROUPING(uf_code) = 1 THEN %(national)s ELSE %(uf)s END,
+        uf_code, dias_uti, COUNT(*)
+    FROM (
+        SELECT DATE_TRUNC('month', data_entrada_uti)::date AS mes_entrada, uf_code,
+            LEAST(data_saida_uti - data_entrada_uti, %(max_los)s) AS dias_uti
+        FROM influd_data
+        WHERE internado_uti = 1
+        AND data_saida_uti BETWEEN data_entrada_uti
+            AND data_entrada_uti + %(max_stay)s
+    ) AS stays
+    GROUP BY GROUPING SETS ((mes_entrada, dias_uti), (mes_entrada, uf_code, dias_uti))
+    HAVING GROUPING(uf_code) = 1 OR uf_code IS NOT NULL
+    """
+
+# A stay ends on its discharge day, or else on its outcome day, or else after
+# the median stay (saida_estimada). Each stay is an admission event and a
+# discharge event; the census of a day is the running sum of admissions minus
+# the discharges of the previous days.
+CENSUS_SQL = """
+    INSERT INTO influd_uti_census_new
+    WITH stays AS (
+        SELECT uf_code, data_entrada_uti AS entrada,
+            CASE
+                WHEN data_saida_uti IS NOT NULL THEN data_saida_uti
+                WHEN data_evolucao >= data_entrada_uti THEN data_evolucao
+                ELSE data_entrada_uti + %(imputed_stay)s
+            END AS saida,
+            (data_saida_uti IS NULL)::int AS saida_estimada
+        FROM influd_data
+        WHERE internado_uti = 1 AND data_entrada_uti IS NOT NULL
+    ),
+    events AS (
+        SELECT uf_code, entrada AS dia, 1 AS entradas, 0 AS saidas,
+            saida_estimada AS entradas_estimadas, 0 AS saidas_estimadas
+        FROM stays
+        WHERE saida BETWEEN entrada AND entrada + %(max_stay)s
+        UNION ALL
+        SELECT uf_code, saida, 0, 1, 0, saida_estimada
+        FROM stays
+        WHERE saida BETWEEN entrada AND entrada + %(max_stay)s
+    ),
+    deltas AS (
+        SELECT dia,
+            CASE WHEN GROUPING(uf_code) = 1 THEN %(national)s ELSE %(uf)s END
+                AS grouping_id,
+            uf_code, SUM(entradas) AS entradas, SUM(saidas) AS saidas,
+            SUM(entradas_estimadas) AS entradas_estimadas,
+            SUM(saidas_estimadas) AS saidas_estimadas
+        FROM events
+        GROUP BY GROUPING SETS ((dia), (dia, uf_code))
+        HAVING GROUPING(uf_code) = 1 OR uf_code IS NOT NULL
+    ),
+    areas AS (SELECT DISTINCT grouping_id, uf_code FROM deltas),
+    days AS (
+        SELECT generate_series(
+            (SELECT MIN(dia) FROM deltas),
+            (SELECT MAX(data_preenchimento) FROM influd_data),
+            INTERVAL '1 day'
+        )::date AS dia
+    ),
+    grid AS (
+        SELECT days.dia, areas.grouping_id, areas.uf_code,
+            COALESCE(deltas.entradas, 0) AS entradas,
+            COALESCE(deltas.saidas, 0) AS saidas,
+            COALESCE(deltas.entradas_estimadas, 0) AS entradas_estimadas,
+            COALESCE(deltas.saidas_estimadas, 0) AS saidas_estimadas
+        FROM days
+        CROSS JOIN areas
+        LEFT JOIN deltas ON deltas.dia = days.dia
+            AND deltas.grouping_id = areas.grouping_id
+            AND deltas.uf_code IS NOT DISTINCT FROM areas.uf_code
+    )
+    SELECT dia, grouping_id, uf_code, entradas, saidas,
+        SUM(entradas - saidas) OVER area_days + saidas,
+        SUM(entradas_estimadas - saidas_estimadas) OVER area_days + saidas_estimadas
+    FROM grid
+    WINDOW area_days AS (PARTITION BY grouping_id, uf_code ORDER BY dia)
+    """
+
+
+def get_median_stay(histogram: list[tuple[int, int]]) -> int:
+    """
+    Purpose: Get the median length of stay from a length of stay histogram.
+    Args:
+        histogram: list[tuple[int, int]] - Stays by days in the ICU, sorted by days.
+    Returns:
+        int - The median days, DEFAULT_STAY_DAYS without stays.
+    """
+    total = sum(stays for _, stays in histogram)
+    if total == 0:
+        return DEFAULT_STAY_DAYS
+    cumulative = 0
+    for days, stays in histogram:
+        cumulative += stays
+        if 2 * cumulative >= total:
+            return int(days)
+    return int(histogram[-1][0])
+
+
+def _swap_table(cursor: Any, table: str, index: str) -> None:
+    cursor.execute(f"DROP TABLE IF EXISTS {table}")
+    cursor.execute(f"ALTER TABLE {table}_new RENAME TO {table}")
+    cursor.execute(f"ALTER INDEX {table}_new_{index} RENAME TO {table}_{index}")
+    cursor.execute(f"ANALYZE {table}")
+
+
+def build_uti_census(state: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Purpose: Rebuild the tables 'influd_uti_stays', with the ICU stays by
+    admission month and length of stay (in days, capped at MAX_LOS_DAYS), and
+    'influd_uti_census', with the admissions, discharges and patients in the
+    ICU on every day, national and by state. Both are built aside and swapped
+    in within the same transaction.
+    """
+    try:
+        conn = get_db_connection("srag_brasil")
+        cursor = conn.cursor()
+        parameters = {
+            "national": NATIONAL_GROUPING_ID,
+            "uf": UF_GROUPING_ID,
+            "max_los": MAX_LOS_DAYS,
+            "max_stay": MAX_STAY_DAYS,
+        }
+        cursor.execute("DROP TABLE IF EXISTS influd_uti_stays_new")
+        cursor.execute(
+            """
+            CREATE TABLE influd_uti_stays_new (
+                mes_entrada DATE NOT NULL,
+                grouping_id SMALLINT NOT NULL,
+                uf_code SMALLINT,
+                dias_uti SMALLINT NOT NULL,
+                total_internacoes INTEGER NOT NULL
+            )
+            """
+        )
+        cursor.execute(STAYS_SQL, parameters)
+        stays_rows = cursor.rowcount
+        cursor.execute(
+            "CREATE INDEX influd_uti_stays_new_grouping_month_idx "
+            "ON influd_uti_stays_new (grouping_id, mes_entrada)"
+        )
+        cursor.execute(
+            """SELECT dias_uti, SUM(total_internacoes) FROM influd_uti_stays_new
+            WHERE grouping_id = %s GROUP BY dias_uti ORDER BY dias_uti""",
+            (NATIONAL_GROUPING_ID,),
+        )
+        imputed_stay = get_median_stay(cursor.fetchall())
+
+        cursor.execute("DROP TABLE IF EXISTS influd_uti_census_new")
+        cursor.execute(
+            """
+            CREATE TABLE influd_uti_census_new (
+                dia DATE NOT NULL,
+                grouping_id SMALLINT NOT NULL,
+                uf_code SMALLINT,
+                entradas INTEGER NOT NULL,
+                saidas INTEGER NOT NULL,
+                ocupacao INTEGER NOT NULL,
+                ocupacao_saida_estimada INTEGER NOT NULL
+            )
+            """
+        )
+        cursor.execute(CENSUS_SQL, {**parameters, "imputed_stay": imputed_stay})
+        census_rows = cursor.rowcount
+        cursor.execute(
+            "CREATE INDEX influd_uti_census_new_grouping_date_idx "
+            "ON influd_uti_census_new (grouping_id, dia)"
+        )
+        _swap_table(cursor, "influd_uti_stays", "grouping_month_idx")
+        _swap_table(cursor, "influd_uti_census", "grouping_date_idx")
+        conn.commit()
+        logger.info(
+            f"ICU census built with {census_rows} rows and {stays_rows} length of "
+            f"stay rows, stays without an end date last {imputed_stay} days"
+        )
+        state["stage"] = "uti_census_built"
+        return state
+    except Exception as e:
+        logger.error(f"Error building ICU census: {e}")
+        conn.rollback()
+        state["stage"] = "error"
+        return state
+    finally:
+        cursor.close()
+        conn.close()
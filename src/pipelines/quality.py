@@ -0,0 +1,264 @@
+"""
+Data quality of the bronze files.
+Each INFLUD file is read once, in chunks, and the column statistics (null
+rates, value domains, date ranges) are accumulated along the way. Malformed
+lines go to a quarantine file and rows the transform rejects are counted.
+The result is a small JSON profile per year, recomputed only when its file
+changed.
+"""
+
+from collections import Counter
+from datetime import datetime
+from typing import Dict, Any, Iterator
+import csv
+import json
+import logging
+import os
+from .dimensions import RAW_DIMENSION_COLUMNS, SEX_CODES, UF_CODES
+
+logger = logging.getLogger(__name__)
+
+BRONZE_DIR = "src/data/bronze"
+QUALITY_DIR = "src/data/profiles/quality"
+BRONZE_FILES = ["INFLUD21", "INFLUD22", "INFLUD23", "INFLUD24", "INFLUD25"]
+
+# Bumped when the profile content changes, so every year is recomputed
+QUALITY_PROFILE_VERSION = "1"
+
+# Bronze columns kept by the transform and their silver names
+COLUMNS_MAPPING = {
+    "NU_NOTIFIC": "origin_id",
+    "DT_NOTIFIC": "data_preenchimento",
+    "VACINA_COV": "vacina_covid",
+    "VACINA": "vacina_gripe",
+    "HOSPITAL": "internado_hospital",
+    "DT_INTERNA": "data_internacao_hospital",
+    "UTI": "internado_uti",
+    "DT_ENTUTI": "data_entrada_uti",
+    "DT_SAIDUTI": "data_saida_uti",
+    "CLASSI_FIN": "diagnostico_final",
+    "EVOLUCAO": "evolucao",
+    "DT_EVOLUCA": "data_evolucao",
+    "DT_SIN_PRI": "data_primeiro_sintoma",
+}
+FEATURES = list(COLUMNS_MAPPING) + RAW_DIMENSION_COLUMNS
+TIME_COLUMNS = ["DT_NOTIFIC", "DT_INTERNA", "DT_ENTUTI", "DT_SAIDUTI", "DT_EVOLUCA", "DT_SIN_PRI"]  # fmt: skip
+
+# Rows with any date after this year are dropped by the transform
+MAX_YEAR = 2025
+
+# Expected values of the coded columns (SIVEP-Gripe dictionary)
+COLUMN_DOMAINS = {
+    "VACINA_COV": {"1", "2", "9"},
+    "VACINA": {"1", "2", "9"},
+    "HOSPITAL": {"1", "2", "9"},
+    "UTI": {"1", "2", "9"},
+    "CLASSI_FIN": {"1", "2", "3", "4", "5"},
+    "EVOLUCAO": {"1", "2", "3", "9"},
+    "TP_IDADE": {"1", "2", "3"},
+    "SG_UF_NOT": set(UF_CODES),
+    "CS_SEXO": set(SEX_CODES),
+}
+
+# Most frequent values kept in the profile of each coded column
+MAX_DOMAIN_VALUES = 30
+
+
+def get_input_fingerprint(path: str) -> dict:
+    stat = os.stat(path)
+    return {
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "version": QUALITY_PROFILE_VERSION,
+    }
+
+
+def _iter_chunks(
+    path: str, quarantine: Any, profile: "QualityProfile", chunk_rows: int
+) -> Iterator[Any]:
+    """
+    Purpose: Stream the FEATURES of a bronze file as dataframes of strings.
+    Lines with a different number of fields than the header are written to
+    the quarantine writer instead, with their line number.
+    """
+    import pandas as pd
+
+    with open(path, "r", encoding="latin1", newline="") as file:
+        reader = csv.reader(file, delimiter=";")
+        header = next(reader)
+        indexes = [header.index(column) for column in FEATURES]
+        quarantine.writerow(["line", "fields", *header])
+        rows = []
+        for row in reader:
+            if len(row) != len(header):
+                quarantine.writerow([reader.line_num, len(row), *row])
+                profile.bad_lines += 1
+                continue
+            rows.append([row[i] for i in indexes])
+            if len(rows) == chunk_rows:
+                yield pd.DataFrame(rows, columns=FEATURES).replace("", pd.NA)
+                rows = []
+        if rows:
+            yield pd.DataFrame(rows, columns=FEATURES).replace("", pd.NA)
+
+
+class QualityProfile:
+    """Column statistics of a bronze file, accumulated chunk by chunk."""
+
+    def __init__(self):
+        self.rows = 0
+        self.bad_lines = 0
+        self.rejected_rows = 0
+        self.nulls = Counter()
+        self.values = {column: Counter() for column in COLUMN_DOMAINS}
+        self.dates = {
+            column: {"min": None, "max": None, "invalid": 0, "after_max_year": 0}
+            for column in TIME_COLUMNS
+        }
+        self.age = {"min": None, "max": None, "invalid": 0}
+
+    def update(self, chunk: Any) -> None:
+        import pandas as pd
+
+        self.rows += len(chunk)
+        self.nulls.update(chunk.isna().sum().to_dict())
+        for column in COLUMN_DOMAINS:
+            self.values[column].update(
+                chunk[column].dropna().str.strip().str.upper().value_counts().to_dict()
+            )
+        rejected = pd.Series(False, index=chunk.index)
+        for column in TIME_COLUMNS:
+            parsed = pd.to_datetime(chunk[column], errors="coerce")
+            stats = self.dates[column]
+            stats["invalid"] += int((chunk[column].notna() & parsed.isna()).sum())
+            after_max_year = parsed.dt.year > MAX_YEAR
+            stats["after_max_year"] += int(after_max_year.sum())
+            rejected |= after_max_year
+            if parsed.notna().any():
+                low, high = parsed.min().date(), parsed.max().date()
+                stats["min"] = min(low, stats["min"] or low)
+                stats["max"] = max(high, stats["max"] or high)
+        self.rejected_rows += int(rejected.sum())
+        age = pd.to_numeric(chunk["NU_IDADE_N"], errors="coerce")
+        self.age["invalid"] += int((chunk["NU_IDADE_N"].notna() & age.isna()).sum())
+        if age.notna().any():
+            low, high = float(age.min()), float(age.max())
+            self.age["min"] = low if self.age["min"] is None else min(low, self.age["min"])
+            self.age["max"] = high if self.age["max"] is None else max(high, self.age["max"])
+
+    def to_dict(self) -> dict:
+        columns = {}
+        for column in FEATURES:
+            nulls = self.nulls[column]
+            stats = {
+                "nulls": nulls,
+                "null_rate": round(nulls / self.rows, 6) if self.rows else None,
+            }
+            if column in COLUMN_DOMAINS:
+                values = self.values[column]
+                stats["distinct"] = len(values)
+                stats["out_of_domain"] = sum(
+                    count
+                    for value, count in values.items()
+                    if value not in COLUMN_DOMAINS[column]
+                )
+                stats["values"] = dict(values.most_common(MAX_DOMAIN_VALUES))
+            if column in self.dates:
+                stats.update(
+                    {
+                        key: value.isoformat() if hasattr(value, "isoformat") else value
+                        for key, value in self.dates[column].items()
+                    }
+                )
+            if column == "NU_IDADE_N":
+                stats.update(self.age)
+            columns[column] = stats
+        return {
+            "rows": self.rows,
+            "bad_lines": self.bad_lines,
+            "rejected_rows": self.rejected_rows,
+            "columns": columns,
+        }
+
+
+def profile_file(file: str, bronze_dir: str, quality_dir: str) -> dict:
+    """
+    Purpose: Profile a bronze file in a single streaming pass.
+    Args:
+        file: str - The file name, without extension (e.g. "INFLUD24").
+        bronze_dir: str - The directory of the bronze files.
+        quality_dir: str - The directory of the profiles and quarantine files.
+    Returns:
+        dict - The profile, also saved to {quality_dir}/{file}.json.
+    """
+    path = os.path.join(bronze_dir, f"{file}.csv")
+    chunk_rows = int(os.getenv("QUALITY_CHUNK_ROWS", "100000"))
+    quarantine_path = os.path.join(quality_dir, f"{file}.quarantine.csv")
+    profile = QualityProfile()
+    with open(f"{quarantine_path}.tmp", "w", encoding="utf-8", newline="") as f:
+        quarantine = csv.writer(f, delimiter=";")
+        for chunk in _iter_chunks(path, quarantine, profile, chunk_rows):
+            profile.update(chunk)
+    if profile.bad_lines:
+        os.replace(f"{quarantine_path}.tmp", quarantine_path)
+    else:
+        os.remove(f"{quarantine_path}.tmp")
+        if os.path.exists(quarantine_path):
+            os.remove(quarantine_path)
+    result = {
+        "file": file,
+        "input": get_input_fingerprint(path),
+        "profiled_at": datetime.now().isoformat(timespec="seconds"),
+        **profile.to_dict(),
+    }
+    profile_path = os.path.join(quality_dir, f"{file}.json")
+    with open(f"{profile_path}.tmp", "w", encoding="utf-8") as f:
+        json.dump(result, f, ensure_ascii=False, indent=2)
+    os.replace(f"{profile_path}.tmp", profile_path)
+    return result
+
+
+def _get_saved_profile(file: str, bronze_dir: str, quality_dir: str) -> dict | None:
+    """
+    Purpose: Get the saved profile of a file if its input didn't change.
+    """
+    profile_path = os.path.join(quality_dir, f"{file}.json")
+    if not os.path.exists(profile_path):
+        return None
+    with open(profile_path, "r", encoding="utf-8") as f:
+        profile = json.load(f)
+    path = os.path.join(bronze_dir, f"{file}.csv")
+    return profile if profile.get("input") == get_input_fingerprint(path) else None
+
+
+def check_data_quality(state: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Purpose: Profile the bronze files whose content changed since their last
+    profile, and reuse the saved profile of the others.
+    """
+    bronze_dir = os.getenv("BRONZE_DIR", BRONZE_DIR)
+    quality_dir = os.getenv("QUALITY_DIR", QUALITY_DIR)
+    try:
+        os.makedirs(quality_dir, exist_ok=True)
+        summary = {}
+        for file in BRONZE_FILES:
+            if not os.path.exists(os.path.join(bronze_dir, f"{file}.csv")):
+                logger.warning(f"Bronze file {file}.csv not found, skipping")
+                continue
+            profile = _get_saved_profile(file, bronze_dir, quality_dir)
+            if profile is None:
+                logger.info(f"Profiling {file}...")
+                profile = profile_file(file, bronze_dir, quality_dir)
+            else:
+                logger.info(f"{file} unchanged, reusing its profile")
+            summary[file] = {
+                key: profile[key] for key in ["rows", "rejected_rows", "bad_lines"]
+            }
+            logger.info(f"{file}: {summary[file]}")
+        state["data"] = summary
+        state["stage"] = "data_quality_checked"
+        return state
+    except Exception as e:
+        logger.error(f"Error checking data quality: {e}")
+        state["stage"] = "error"
+        return state
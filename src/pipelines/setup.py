@@ -1,10 +1,138 @@
 from typing import Dict, Any
 import logging
+import os
 import psycopg2
 from ..utils.db import get_db_connection
 
 logger = logging.getLogger(__name__)
 
+# Version of the influd_data layout created by create_table, see migrations.py
+SCHEMA_VERSION = 2
+
+# Columns of influd_data, ordered by alignment (8, 4 then 2 bytes) so that
+# rows have no padding. Flags and dimension codes fit in a SMALLINT.
+INFLUD_COLUMNS = [
+    ("origin_id", "BIGINT NOT NULL"),
+    ("data_preenchimento", "DATE"),
+    ("data_internacao_hospital", "DATE"),
+    ("data_entrada_uti", "DATE"),
+    ("data_saida_uti", "DATE"),
+    ("data_evolucao", "DATE"),
+    ("data_primeiro_sintoma", "DATE"),
+    ("vacina_covid", "SMALLINT"),
+    ("vacina_gripe", "SMALLINT"),
+    ("internado_hospital", "SMALLINT"),
+    ("internado_uti", "SMALLINT"),
+    ("diagnostico_final", "SMALLINT"),
+    ("evolucao", "SMALLINT"),
+    ("uf_code", "SMALLINT"),
+    ("age_band", "SMALLINT"),
+    ("sex_code", "SMALLINT"),
+]
+
+
+def get_date_index_method() -> str:
+    """
+    Purpose: Get the index method of the influd_data dates: BRIN for the default
+    heap storage, btree for other access methods (Citus columnar only supports
+    btree and hash indexes).
+    Returns:
+        str - "brin" or "btree".
+    """
+    access_method = os.getenv("INFLUD_TABLE_ACCESS_METHOD")
+    return "brin" if access_method in (None, "", "heap") else "btree"
+
+
+def get_date_index_name(table: str) -> str:
+    return f"{table}_data_preenchimento_{get_date_index_method()}"
+
+
+def get_create_influd_table_sql(table: str) -> str:
+    """
+    Purpose: Get the statements that create an influd_data table: origin_id as
+    the primary key and an index for the date range scans of the reports.
+    INFLUD_TABLE_ACCESS_METHOD selects another storage (e.g. "columnar" with
+    the Citus extension).
+    Args:
+        table: str - The table name.
+    Returns:
+        str - The CREATE TABLE and CREATE INDEX statements.
+    """
+    access_method = os.getenv("INFLUD_TABLE_ACCESS_METHOD")
+    using = f" USING {access_method}" if access_method else ""
+    columns = ",\n            ".join(f"{name} {type_}" for name, type_ in INFLUD_COLUMNS)
+    return f"""
+        CREATE TABLE srag_brasil.public.{table} (
+            {columns},
+            CONSTRAINT {table}_pkey PRIMARY KEY (origin_id)
+        ){using};
+        CREATE INDEX {get_date_index_name(table)}
+            ON srag_brasil.public.{table} USING {get_date_index_method().upper()} (data_preenchimento);
+        """
+
+
+def insert_deduplicated(
+    cursor: Any, source: str, target: str, order: str, select: str | None = None
+) -> dict:
+    """
+    Purpose: Copy the rows of a table into an influd_data table, keeping the
+    first row (by order) of every origin_id and leaving out rows without one.
+    The rows are written in date order, which keeps the BRIN index tight.
+    Args:
+        cursor: cursor - The cursor to the database.
+        source: str - The table the rows are copied from.
+        target: str - The influd_data table the rows are copied to.
+        order: str - The column that sets the first row of a duplicated origin_id.
+        select: str | None - The select list of the source, in INFLUD_COLUMNS
+            order, when its columns differ from influd_data.
+    Returns:
+        dict - The source rows, the rows inserted and the duplicated and
+            missing origin_id rows dropped.
+    """
+    columns = ", ".join(name for name, _ in INFLUD_COLUMNS)
+    cursor.execute(f"SELECT COUNT(*), COUNT(origin_id) FROM {source}")
+    source_rows, with_origin_id = cursor.fetchone()
+    cursor.execute(
+        f"""INSERT INTO {target} ({columns})
+        SELECT {columns} FROM (
+            SELECT DISTINCT ON (origin_id) {select or columns}
+            FROM {source}
+            WHERE origin_id IS NOT NULL
+            ORDER BY origin_id, {order}
+        ) deduplicated
+        ORDER BY data_preenchimento"""
+    )
+    inserted = cursor.rowcount
+    return {
+        "source_rows": source_rows,
+        "inserted_rows": inserted,
+        "duplicated_rows_dropped": with_origin_id - inserted,
+        "missing_origin_id_rows_dropped": source_rows - with_origin_id,
+    }
+
+
+def set_schema_version(cursor: Any, version: int, description: str) -> None:
+    """
+    Purpose: Record the schema version of influd_data.
+    Args:
+        cursor: cursor - The cursor to the database.
+        version: int - The schema version.
+        description: str - What the version changed.
+    """
+    cursor.execute(
+        """CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            description TEXT,
+            applied_at TIMESTAMPTZ NOT NULL DEFAULT now()
+        )"""
+    )
+    cursor.execute(
+        """INSERT INTO schema_version (version, description) VALUES (%s, %s)
+        ON CONFLICT (version) DO UPDATE
+        SET description = EXCLUDED.description, applied_at = now()""",
+        (version, description),
+    )
+
 
 def create_database(state: Dict[str, Any]) -> Dict[str, Any]:
     """
@@ -42,28 +170,11 @@ def create_table(state: Dict[str, Any]) -> Dict[str, Any]:
         cursor = conn.cursor()
         drop_table_sql = "DROP TABLE IF EXISTS srag_brasil.public.influd_data;"
 
-        create_table_sql = """
-        CREATE TABLE srag_brasil.public.influd_data (
-            id BIGSERIAL,                    
-            origin_id BIGINT,             
-            data_preenchimento DATE,
-            vacina_covid INTEGER,
-            vacina_gripe INTEGER,
-            internado_hospital INTEGER,
-            data_internacao_hospital DATE,
-            internado_uti INTEGER,
-            data_entrada_uti DATE,
-            data_saida_uti DATE,
-            diagnostico_final INTEGER,
-            evolucao INTEGER,
-            data_evolucao DATE,
-            data_primeiro_sintoma DATE,
-            PRIMARY KEY (id, origin_id)   
-        )
-        """
+        create_table_sql = get_create_influd_table_sql("influd_data")
 
         cursor.execute(drop_table_sql)
         cursor.execute(create_table_sql)
+        set_schema_version(cursor, SCHEMA_VERSION, "Create influd_data")
         conn.commit()
         logger.info("Table created successfully...")
         state["stage"] = "table_created"
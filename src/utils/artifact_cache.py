@@ -0,0 +1,165 @@
+from datetime import datetime
+from typing import Any
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+
+logger = logging.getLogger(__name__)
+
+# Part of every key, bump it when the rendering code changes its outputs
+ARTIFACT_CACHE_VERSION = "1"
+
+
+def get_file_digest(path: str) -> str:
+    """
+    Purpose: Get the sha256 of a file content.
+    Args:
+        path: str - The file path.
+    Returns:
+        str - The hex digest.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 16), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def get_artifact_key(stage: str, inputs: Any) -> str:
+    """
+    Purpose: Get the content address of a stage output from its inputs.
+    Args:
+        stage: str - The stage name (e.g. "chart", "pdf").
+        inputs: Any - JSON serializable inputs of the stage.
+    Returns:
+        str - The hex digest of the stage, cache version and inputs.
+    """
+    payload = json.dumps(
+        [ARTIFACT_CACHE_VERSION, stage, inputs],
+        ensure_ascii=False,
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ArtifactCache:
+    """
+    Purpose: Content-addressed store of report artifacts (charts, .tex, PDF).
+    Each entry is a directory named by its key holding the output files.
+    Args:
+        cache_dir: str | None - The cache directory, defaults to ARTIFACT_CACHE_DIR.
+    """
+
+    def __init__(self, cache_dir: str = None):
+        self.cache_dir = cache_dir or os.getenv(
+            "ARTIFACT_CACHE_DIR", "src/data/cache/artifacts"
+        )
+        self.enabled = os.getenv("ARTIFACT_CACHE", "true").lower() != "false"
+
+    def _get_entry_dir(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], key)
+
+    def restore(self, key: str, outputs: dict[str, str]) -> bool:
+        """
+        Purpose: Copy the cached files of an entry to their output paths.
+        Args:
+            key: str - The entry key.
+            outputs: dict[str, str] - Output paths by cached file name.
+        Returns:
+            bool - True if every output was restored.
+        """
+        if not self.enabled:
+            return False
+        entry_dir = self._get_entry_dir(key)
+        if not all(os.path.exists(os.path.join(entry_dir, name)) for name in outputs):
+            return False
+        try:
+            for name, path in outputs.items():
+                os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+                tmp_path = f"{path}.tmp"
+                shutil.copyfile(os.path.join(entry_dir, name), tmp_path)
+                os.replace(tmp_path, path)
+            return True
+        except OSError as e:
+            logger.warning(f"Error restoring artifact {key}: {e}")
+            return False
+
+    def store(self, key: str, outputs: dict[str, str]) -> None:
+        """
+        Purpose: Store the output files of a stage under its key. The entry is
+        written to a temporary directory and renamed, so readers never see it
+        half written.
+        Args:
+            key: str - The entry key.
+            outputs: dict[str, str] - Output paths by cached file name.
+        """
+        if not self.enabled:
+            return
+        entry_dir = self._get_entry_dir(key)
+        if os.path.exists(entry_dir):
+            return
+        try:
+            os.makedirs(os.path.dirname(entry_dir), exist_ok=True)
+            tmp_dir = tempfile.mkdtemp(dir=os.path.dirname(entry_dir))
+            for name, path in outputs.items():
+                shutil.copyfile(path, os.path.join(tmp_dir, name))
+            try:
+                os.rename(tmp_dir, entry_dir)
+            except OSError:
+                # Stored by a concurrent run in the meantime
+                shutil.rmtree(tmp_dir, ignore_errors=True)
+        except OSError as e:
+            logger.warning(f"Error storing artifact {key}: {e}")
+
+
+def get_artifact_entry(
+    stage: str, key: str, reused: bool, outputs: dict[str, str]
+) -> dict[str, Any]:
+    """
+    Purpose: Get the manifest entry of a stage output.
+    Args:
+        stage: str - The stage name.
+        key: str - The entry key.
+        reused: bool - Whether the outputs were restored from the cache.
+        outputs: dict[str, str] - Output paths by cached file name.
+    Returns:
+        dict[str, Any] - The manifest entry.
+    """
+    return {
+        "stage": stage,
+        "key": key,
+        "status": "reused" if reused else "rebuilt",
+        "outputs": sorted(outputs.values()),
+    }
+
+
+def write_manifest(path: str, report_date: str, artifacts: list[dict[str, Any]]):
+    """
+    Purpose: Write the manifest of which artifacts of a report were rebuilt.
+    Args:
+        path: str - The manifest JSON path.
+        report_date: str - The report date.
+        artifacts: list[dict[str, Any]] - The manifest entries.
+    """
+    try:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "report_date": report_date,
+                    "created_at": datetime.now().isoformat(timespec="seconds"),
+                    "rebuilt": sum(1 for a in artifacts if a["status"] == "rebuilt"),
+                    "reused": sum(1 for a in artifacts if a["status"] == "reused"),
+                    "artifacts": artifacts,
+                },
+                f,
+                ensure_ascii=False,
+                indent=2,
+            )
+        logger.info(f"Artifact manifest saved to: {path}")
+    except Exception as e:
+        logger.error(f"Error writing artifact manifest: {e}")
@@ -1,9 +1,92 @@
 import psycopg2
+import psycopg2.extensions
+from psycopg2.pool import ThreadedConnectionPool
 import os
+import threading
+import time
+from src.utils.metrics import record_db_query
+from src.utils.tracing import span
+
+
+class InstrumentedCursor(psycopg2.extensions.cursor):
+    """Cursor that records its statements in the run metrics and as trace spans"""
+
+    def execute(self, query, vars=None):
+        start = time.perf_counter()
+        try:
+            with span("sql", statement=" ".join(str(query).split())[:1000]):
+                return super().execute(query, vars)
+        finally:
+            record_db_query(time.perf_counter() - start)
+
+    def copy_from(self, file, table, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            with span("sql copy_from", table=table):
+                return super().copy_from(file, table, *args, **kwargs)
+        finally:
+            record_db_query(time.perf_counter() - start)
+
+    def copy_expert(self, sql, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            with span("sql copy_expert", statement=" ".join(str(sql).split())[:1000]):
+                return super().copy_expert(sql, *args, **kwargs)
+        finally:
+            record_db_query(time.perf_counter() - start)
+
+
+class PooledConnection:
+    """Connection proxy that gives the connection back to the pool on close()"""
+
+    def __init__(self, pool: ThreadedConnectionPool, conn):
+        self._pool = pool
+        self._conn = conn
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def close(self):
+        if self._conn is None:
+            return
+        conn, self._conn = self._conn, None
+        try:
+            if not conn.closed:
+                # Discard uncommitted work and session changes of the borrower
+                conn.reset()
+            self._pool.putconn(conn, close=bool(conn.closed))
+        except Exception:
+            self._pool.putconn(conn, close=True)
+
+
+_pool: ThreadedConnectionPool = None
+_pool_lock = threading.Lock()
+
+
+def enable_connection_pool(minconn: int = 1, maxconn: int = 8) -> None:
+    """
+    Purpose: Serve connections to the default database from a shared pool, for
+    long-running processes. Connections to other databases are not pooled.
+    Args:
+        minconn: int - Connections opened up front.
+        maxconn: int - Maximum open connections.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadedConnectionPool(
+                minconn,
+                maxconn,
+                os.getenv("POSTGRES_SERVER_URL") + "srag_brasil",
+                cursor_factory=InstrumentedCursor,
+            )
+
 
 def get_db_connection(database: str = "srag_brasil"):
+    if _pool is not None and database == "srag_brasil":
+        return PooledConnection(_pool, _pool.getconn())
     url = os.getenv("POSTGRES_SERVER_URL") + database
-    conn = psycopg2.connect(url)
+    conn = psycopg2.connect(url, cursor_factory=InstrumentedCursor)
     return conn
 
 def verify_data_exists(cursor: psycopg2.extensions.cursor, table: str, 
@@ -13,4 +96,4 @@ def verify_data_exists(cursor: psycopg2.extensions.cursor, table: str,
     for column in columns[1:]:
         query += f" AND {column} = '{value}'"
     cursor.execute(query)
-    return cursor.fetchone()[0] > 0
\ No newline at end of file
+    return cursor.fetchone()[0] > 0
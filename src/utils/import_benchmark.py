@@ -0,0 +1,86 @@
+"""
+Import-time benchmark for the runner entry points.
+Usage:
+python -m src.utils.import_benchmark
+python -m src.utils.import_benchmark --budget-ms 300
+"""
+
+import argparse
+import subprocess
+import sys
+
+# Modules that must not be imported just by importing each entry point
+HEAVY_MODULES = {
+    "Runner": [
+        "langgraph",
+        "langchain_openai",
+        "tavily",
+        "pandas",
+        "matplotlib",
+        "pylatex",
+        "psycopg2",
+    ],
+    "src.app.Graph": [
+        "langchain_openai",
+        "tavily",
+        "pandas",
+        "matplotlib",
+        "pylatex",
+    ],
+    "src.pipelines.load": ["pandas", "matplotlib", "pylatex", "langchain_openai"],
+}
+
+
+def measure_import(module: str) -> tuple[float, set[str]]:
+    """
+    Purpose: Import a module in a fresh interpreter and measure it.
+    Args:
+        module: str - The module to be imported.
+    Returns:
+        tuple[float, set[str]] - Cumulative import time in ms and the imported modules.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    total_us = 0
+    imported = set()
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:") :].split("|")
+        name = name.strip()
+        imported.add(name.split(".")[0])
+        if name == module:
+            total_us = int(cumulative)
+    return total_us / 1000, imported
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Import-time benchmark")
+    parser.add_argument(
+        "--budget-ms",
+        type=float,
+        default=None,
+        help="Fail if importing Runner takes longer than this (milliseconds)",
+    )
+    args = parser.parse_args()
+
+    failed = False
+    for module, heavy_modules in HEAVY_MODULES.items():
+        elapsed_ms, imported = measure_import(module)
+        leaked = sorted(set(heavy_modules) & imported)
+        print(f"{module}: {elapsed_ms:.1f} ms")
+        if leaked:
+            print(f"  eagerly imports: {', '.join(leaked)}")
+            failed = True
+        if module == "Runner" and args.budget_ms and elapsed_ms > args.budget_ms:
+            print(f"  exceeds budget of {args.budget_ms:.1f} ms")
+            failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
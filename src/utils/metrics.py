@@ -0,0 +1,237 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Any, Callable, Iterator
+import json
+import logging
+import os
+import time
+import uuid
+from src.utils.profiling import profile_node
+from src.utils.tracing import get_trace_id, span
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+_current_run: ContextVar["RunMetrics"] = ContextVar("current_run", default=None)
+_current_node: ContextVar[dict[str, Any]] = ContextVar("current_node", default=None)
+
+
+def _get_peak_rss_kb() -> int:
+    """
+    Returns:
+        int - Peak resident set size of the process in KB (0 if unavailable).
+    """
+    if resource is None:
+        return 0
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+class RunMetrics:
+    """
+    Purpose: Collect per-node wall time, CPU time, peak RSS growth, DB queries
+    and LLM tokens of one graph run.
+    Args:
+        run_name: str - The name of the run (e.g. "report", "load").
+    """
+
+    def __init__(self, run_name: str):
+        self.run_name = run_name
+        self.run_id = uuid.uuid4().hex
+        self.trace_id = get_trace_id()
+        self.started_at = datetime.now().isoformat(timespec="seconds")
+        self.nodes: list[dict[str, Any]] = []
+        self.wall_seconds = 0.0
+        self.cpu_seconds = 0.0
+        self.status = "running"
+
+    @contextmanager
+    def measure_node(self, node_name: str) -> Iterator[dict[str, Any]]:
+        node = {
+            "node": node_name,
+            "stage": None,
+            "wall_seconds": 0.0,
+            "cpu_seconds": 0.0,
+            "peak_rss_delta_kb": 0,
+            "db_queries": 0,
+            "db_seconds": 0.0,
+            "llm_calls": 0,
+            "prompt_tokens": 0,
+            "completion_tokens": 0,
+        }
+        token = _current_node.set(node)
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        rss_start = _get_peak_rss_kb()
+        try:
+            yield node
+        finally:
+            node["wall_seconds"] = round(time.perf_counter() - wall_start, 6)
+            node["cpu_seconds"] = round(time.process_time() - cpu_start, 6)
+            node["peak_rss_delta_kb"] = _get_peak_rss_kb() - rss_start
+            node["db_seconds"] = round(node["db_seconds"], 6)
+            _current_node.reset(token)
+            self.nodes.append(node)
+
+    def summary(self) -> dict[str, Any]:
+        return {
+            "run": self.run_name,
+            "run_id": self.run_id,
+            "trace_id": self.trace_id,
+            "started_at": self.started_at,
+            "status": self.status,
+            "wall_seconds": round(self.wall_seconds, 6),
+            "cpu_seconds": round(self.cpu_seconds, 6),
+            "nodes": self.nodes,
+        }
+
+    def write_summary(self, path: str) -> None:
+        """
+        Purpose: Write the run summary as JSON.
+        Args:
+            path: str - The JSON file path.
+        """
+        try:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(self.summary(), f, ensure_ascii=False, indent=2)
+            logger.info(f"Run metrics saved to: {path}")
+        except Exception as e:
+            logger.error(f"Error writing run metrics: {e}")
+
+    def write_prometheus(self, path: str) -> None:
+        """
+        Purpose: Write the run metrics in the Prometheus textfile collector format.
+        The file is replaced atomically, as the collector may read it at any time.
+        Args:
+            path: str - The .prom file path.
+        """
+        metrics = {
+            "wall_seconds": "Wall time of the node",
+            "cpu_seconds": "CPU time of the process during the node",
+            "peak_rss_delta_kb": "Peak RSS growth during the node",
+            "db_queries": "Number of DB statements",
+            "db_seconds": "Time spent in DB statements",
+            "prompt_tokens": "LLM prompt tokens",
+            "completion_tokens": "LLM completion tokens",
+        }
+        lines = []
+        for metric, description in metrics.items():
+            name = f"srag_node_{metric}"
+            lines.append(f"# HELP {name} {description}")
+            lines.append(f"# TYPE {name} gauge")
+            for node in self.nodes:
+                labels = f'run="{self.run_name}",node="{node["node"]}"'
+                lines.append(f"{name}{{{labels}}} {node[metric]}")
+        lines.append("# HELP srag_run_wall_seconds Wall time of the run")
+        lines.append("# TYPE srag_run_wall_seconds gauge")
+        lines.append(
+            f'srag_run_wall_seconds{{run="{self.run_name}"}} {self.wall_seconds}'
+        )
+        try:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write("\n".join(lines) + "\n")
+            os.replace(tmp_path, path)
+        except Exception as e:
+            logger.error(f"Error writing Prometheus metrics: {e}")
+
+
+@contextmanager
+def collect_run_metrics(run_name: str) -> Iterator[RunMetrics]:
+    """
+    Purpose: Collect the metrics of every instrumented node run inside the block.
+    Args:
+        run_name: str - The name of the run.
+    Returns:
+        Iterator[RunMetrics] - The run metrics.
+    """
+    run = RunMetrics(run_name)
+    token = _current_run.set(run)
+    wall_start = time.perf_counter()
+    cpu_start = time.process_time()
+    try:
+        yield run
+    finally:
+        run.wall_seconds = time.perf_counter() - wall_start
+        run.cpu_seconds = time.process_time() - cpu_start
+        _current_run.reset(token)
+
+
+def get_current_run() -> RunMetrics | None:
+    return _current_run.get()
+
+
+def export_run_metrics(run: RunMetrics, summary_path: str) -> None:
+    """
+    Purpose: Write the JSON summary and, if METRICS_PROMETHEUS_DIR is set,
+    the Prometheus textfile (srag_<run_name>.prom) of a run.
+    Args:
+        run: RunMetrics - The run metrics.
+        summary_path: str - The JSON summary path.
+    """
+    run.write_summary(summary_path)
+    prometheus_dir = os.getenv("METRICS_PROMETHEUS_DIR")
+    if prometheus_dir:
+        run.write_prometheus(
+            os.path.join(prometheus_dir, f"srag_{run.run_name}.prom")
+        )
+
+
+def instrument_node(node_name: str, node_func: Callable) -> Callable:
+    """
+    Purpose: Wrap a graph node so that it is measured within the current run,
+    traced as a span of the current trace and profiled if profiling is active.
+    Args:
+        node_name: str - The name of the node.
+        node_func: Callable - The node function.
+    Returns:
+        Callable - The wrapped node.
+    """
+
+    def measured_node(state: dict[str, Any]) -> dict[str, Any]:
+        with span(f"node {node_name}", node=node_name) as node_span:
+            run = _current_run.get()
+            if run is None:
+                with profile_node(node_name):
+                    result_state = node_func(state)
+            else:
+                with run.measure_node(node_name) as node, profile_node(node_name):
+                    result_state = node_func(state)
+                node["stage"] = result_state.get("stage")
+            if node_span is not None:
+                node_span["attributes"]["stage"] = result_state.get("stage")
+        return result_state
+
+    return measured_node
+
+
+def record_db_query(duration: float) -> None:
+    """
+    Purpose: Add a DB statement to the node being measured.
+    Args:
+        duration: float - The statement duration in seconds.
+    """
+    node = _current_node.get()
+    if node is not None:
+        node["db_queries"] += 1
+        node["db_seconds"] += duration
+
+
+def record_llm_usage(prompt_tokens: int, completion_tokens: int) -> None:
+    """
+    Purpose: Add an LLM call to the node being measured.
+    Args:
+        prompt_tokens: int - The prompt tokens of the call.
+        completion_tokens: int - The completion tokens of the call.
+    """
+    node = _current_node.get()
+    if node is not None:
+        node["llm_calls"] += 1
+        node["prompt_tokens"] += prompt_tokens
+        node["completion_tokens"] += completion_tokens
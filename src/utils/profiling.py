@@ -0,0 +1,190 @@
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Any, Iterator
+import cProfile
+import io
+import json
+import logging
+import os
+import pstats
+import time
+from src.utils.tracing import get_current_trace
+
+logger = logging.getLogger(__name__)
+
+_current_session: ContextVar["ProfileSession"] = ContextVar(
+    "current_profile_session", default=None
+)
+
+# Trace spans of calls to external services, reported next to the node CPU time
+WAIT_SPAN_CATEGORIES = {
+    "llm": "llm_seconds",
+    "search": "search_seconds",
+    "sql": "db_seconds",
+    "sql copy_from": "db_seconds",
+    "sql copy_expert": "db_seconds",
+}
+
+
+def _get_union_seconds(intervals: list[tuple[int, int]]) -> float:
+    """
+    Purpose: Get the length of the union of time intervals, so that concurrent
+    searches are not counted twice.
+    Args:
+        intervals: list[tuple[int, int]] - Start and end times in nanoseconds.
+    Returns:
+        float - The covered time in seconds.
+    """
+    total = 0
+    current_start, current_end = None, None
+    for start, end in sorted(intervals):
+        if current_end is None or start > current_end:
+            if current_end is not None:
+                total += current_end - current_start
+            current_start, current_end = start, end
+        else:
+            current_end = max(current_end, end)
+    if current_end is not None:
+        total += current_end - current_start
+    return total / 1e9
+
+
+class ProfileSession:
+    """
+    Purpose: Profile every instrumented node of a run with cProfile and write
+    one artifact set per node to the output directory.
+    Args:
+        run_name: str - The name of the run (e.g. "report", "load").
+        output_dir: str - The base directory of the profiling artifacts.
+    """
+
+    def __init__(self, run_name: str, output_dir: str):
+        self.run_name = run_name
+        self.output_dir = os.path.join(
+            output_dir, f"{run_name}-{datetime.now().strftime('%Y%m%d-%H%M%S')}"
+        )
+        self.nodes: list[dict[str, Any]] = []
+
+    def _get_wait_seconds(self, start_ns: int, end_ns: int) -> dict[str, float]:
+        trace = get_current_trace()
+        waits = {category: [] for category in set(WAIT_SPAN_CATEGORIES.values())}
+        for finished_span in trace.spans if trace else []:
+            category = WAIT_SPAN_CATEGORIES.get(finished_span["name"])
+            if category and finished_span["start_time_unix_nano"] >= start_ns:
+                if finished_span["end_time_unix_nano"] <= end_ns:
+                    waits[category].append(
+                        (
+                            finished_span["start_time_unix_nano"],
+                            finished_span["end_time_unix_nano"],
+                        )
+                    )
+        return {
+            category: round(_get_union_seconds(intervals), 6)
+            for category, intervals in sorted(waits.items())
+        }
+
+    def _write_node_artifacts(self, node_name: str, profiler: cProfile.Profile):
+        """
+        Purpose: Write the binary pstats file and a text report sorted by
+        cumulative time, which is easy to diff between releases.
+        """
+        profiler.dump_stats(os.path.join(self.output_dir, f"{node_name}.pstats"))
+        stream = io.StringIO()
+        stats = pstats.Stats(profiler, stream=stream)
+        stats.strip_dirs().sort_stats("cumulative", "name").print_stats(60)
+        with open(
+            os.path.join(self.output_dir, f"{node_name}.txt"), "w", encoding="utf-8"
+        ) as f:
+            f.write(stream.getvalue())
+
+    @contextmanager
+    def profile_node(self, node_name: str) -> Iterator[None]:
+        os.makedirs(self.output_dir, exist_ok=True)
+        profiler = cProfile.Profile()
+        start_ns = time.time_ns()
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.disable()
+            wall_seconds = time.perf_counter() - wall_start
+            cpu_seconds = time.process_time() - cpu_start
+            try:
+                self._write_node_artifacts(node_name, profiler)
+                self.nodes.append(
+                    {
+                        "node": node_name,
+                        "wall_seconds": round(wall_seconds, 6),
+                        "cpu_seconds": round(cpu_seconds, 6),
+                        "wait_seconds": round(max(wall_seconds - cpu_seconds, 0), 6),
+                        **self._get_wait_seconds(start_ns, time.time_ns()),
+                    }
+                )
+            except Exception as e:
+                logger.error(f"Error writing profile of node {node_name}: {e}")
+
+    def write_summary(self) -> None:
+        try:
+            os.makedirs(self.output_dir, exist_ok=True)
+            path = os.path.join(self.output_dir, "summary.json")
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(
+                    {"run": self.run_name, "nodes": self.nodes},
+                    f,
+                    ensure_ascii=False,
+                    indent=2,
+                )
+            logger.info(f"Profile saved to: {self.output_dir}")
+        except Exception as e:
+            logger.error(f"Error writing profile summary: {e}")
+
+
+@contextmanager
+def profile_session(run_name: str, output_dir: str) -> Iterator[ProfileSession]:
+    """
+    Purpose: Profile every instrumented node run inside the block.
+    Args:
+        run_name: str - The name of the run.
+        output_dir: str - The base directory of the profiling artifacts.
+    Returns:
+        Iterator[ProfileSession] - The profiling session.
+    """
+    session = ProfileSession(run_name, output_dir)
+    token = _current_session.set(session)
+    try:
+        yield session
+    finally:
+        _current_session.reset(token)
+        session.write_summary()
+
+
+@contextmanager
+def profile_node(node_name: str) -> Iterator[None]:
+    """
+    Purpose: Profile a node if a profiling session is active.
+    Args:
+        node_name: str - The name of the node.
+    """
+    session = _current_session.get()
+    if session is None:
+        yield
+        return
+    with session.profile_node(node_name):
+        yield
+
+
+def maybe_profile_session(run_name: str, output_dir: str | None):
+    """
+    Purpose: Profile a run only if a profiling directory was given.
+    Args:
+        run_name: str - The name of the run.
+        output_dir: str | None - The base directory of the profiling artifacts.
+    Returns:
+        ContextManager - The profiling session, or a no-op context.
+    """
+    if output_dir is None:
+        return nullcontext()
+    return profile_session(run_name, output_dir)
@@ -0,0 +1,367 @@
+"""
+Query-plan and latency regression suite for the report queries.
+Loads a fixed synthetic dataset into a local Postgres, runs every QueryDataTool
+query with EXPLAIN (ANALYZE, BUFFERS) and compares the plan shape, shared
+buffers and execution time of each one with the baseline saved in the repo.
+The whole process is pointed at QUERY_BENCHMARK_SERVER_URL, as the dataset
+replaces influd_data, influd_cube and the uti census tables there: never use
+the real database.
+Usage:
+python -m src.utils.query_benchmark
+python -m src.utils.query_benchmark --update-baseline
+python -m src.utils.query_benchmark --skip-load --runs 10
+"""
+
+from datetime import date, timedelta
+from typing import Any, Callable
+import argparse
+import json
+import os
+import sys
+
+BASELINE_PATH = "src/utils/baselines/query_plans.json"
+
+# Size of the synthetic dataset and the last day of its data
+DEFAULT_ROWS = 500_000
+DATASET_START = date(2021, 1, 1)
+REFERENCE_DATE = date(2025, 8, 28)
+
+# Report window of each group by
+WINDOWS = {
+    "day": timedelta(days=30),
+    "month": timedelta(days=365),
+    "year": timedelta(days=4 * 365),
+}
+
+# Allowed growth over the baseline
+BUFFER_TOLERANCE = 0.25
+LATENCY_TOLERANCE = 2.0
+LATENCY_SLACK_MS = 5.0
+
+
+class PlanRecorder:
+    """Cursor proxy that runs EXPLAIN (ANALYZE, BUFFERS) before each statement"""
+
+    def __init__(self, cursor: Any):
+        self._cursor = cursor
+        self.plans = []
+
+    def execute(self, query, vars=None):
+        self._cursor.execute(f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {query}", vars)
+        self.plans.append(self._cursor.fetchone()[0][0])
+        return self._cursor.execute(query, vars)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+def load_synthetic_dataset(rows: int) -> None:
+    """
+    Purpose: Recreate influd_data with a deterministic synthetic dataset, in
+    date order as the load pipeline inserts it, and rebuild the cube and the
+    uti census.
+    Args:
+        rows: int - The number of notifications.
+    """
+    from src.pipelines.cube import build_cube
+    from src.pipelines.occupancy import build_uti_census
+    from src.pipelines.dimensions import AGE_BANDS, UF_CODES
+    from src.pipelines.setup import create_database, create_table
+    from src.utils.db import get_db_connection
+
+    for node in [create_database, create_table]:
+        if node({})["stage"] == "error":
+            raise RuntimeError(f"{node.__name__} failed")
+    days = (REFERENCE_DATE - DATASET_START).days + 1
+    uf_codes = ", ".join(map(str, UF_CODES.values()))
+    conn = get_db_connection("srag_brasil")
+    cursor = conn.cursor()
+    try:
+        # A multiplicative hash of the row number spreads the values
+        cursor.execute(
+            f"""INSERT INTO influd_data (origin_id, data_preenchimento,
+                data_internacao_hospital, data_entrada_uti, data_saida_uti,
+                data_evolucao, data_primeiro_sintoma, vacina_covid, vacina_gripe,
+                internado_hospital, internado_uti, diagnostico_final, evolucao,
+                uf_code, age_band, sex_code)
+            SELECT i, day, day + 1,
+                CASE WHEN h %% 10 = 0 THEN day + 2 END,
+                CASE WHEN h %% 10 = 0 THEN day + 2 + h %% 14 END,
+                day + h %% 30, day - h %% 7,
+                1 + h %% 2, 1 + h / 2 %% 2, 1 + h / 4 %% 2,
+                CASE WHEN h %% 10 = 0 THEN 1 ELSE 2 END,
+                1 + h / 8 %% 5,
+                CASE WHEN h %% 17 = 0 THEN 2 ELSE 1 END,
+                (ARRAY[{uf_codes}])[1 + h / 16 %% {len(UF_CODES)}],
+                1 + h / 512 %% {len(AGE_BANDS)},
+                CASE WHEN h %% 3 = 0 THEN 1 ELSE 2 END
+            FROM (
+                SELECT i, ((i * 2654435761) %% 1000003)::int AS h,
+                    %s::date + (i * 2654435761 %% 1000003 %% %s)::int AS day
+                FROM generate_series(1, %s) AS i
+            ) synthetic
+            ORDER BY day""",
+            (DATASET_START, days, rows),
+        )
+        cursor.execute("ANALYZE influd_data")
+        conn.commit()
+    finally:
+        cursor.close()
+        conn.close()
+    for node in [build_cube, build_uti_census]:
+        if node({})["stage"] == "error":
+            raise RuntimeError(f"{node.__name__} failed")
+
+
+def get_cases() -> dict[str, tuple[Callable[[Any], Any], bool]]:
+    """
+    Purpose: Get the benchmark cases: every QueryDataTool metric and group by
+    over its report window, the prefetched daily aggregates and the cube
+    filters and breakdowns.
+    Returns:
+        dict[str, tuple[Callable, bool]] - Function of a cursor running the
+            case, and whether its tables must be read through an index, by name.
+    """
+    from src.app.tools import query_data_tool as tool
+
+    fetchers = {
+        "total_cases": tool._fetch_total_cases,
+        "vaccination_rate": tool._fetch_vaccination_rate,
+        "uti_admissions": tool._fetch_uti_admissions,
+        "mortality_rate": tool._fetch_mortality_rate,
+    }
+    end = REFERENCE_DATE.isoformat()
+    starts = {
+        group_by: (REFERENCE_DATE - window).isoformat()
+        for group_by, window in WINDOWS.items()
+    }
+    cases = {}
+    for metric, fetch in fetchers.items():
+        for group_by, start in starts.items():
+            cases[f"influd_data/{metric}/{group_by}"] = (
+                lambda cursor, fetch=fetch, start=start, group_by=group_by: fetch(
+                    cursor, start, end, group_by
+                ),
+                # Only the 30 days window is selective enough for the BRIN index
+                group_by == "day",
+            )
+    cases["influd_data/daily_aggregates/4y"] = (
+        lambda cursor: (
+            cursor.execute(tool.DAILY_AGGREGATES_QUERY, (starts["year"], end)),
+            cursor.fetchall(),
+        ),
+        False,
+    )
+    cube_cases = {
+        "uf=SP": ({"uf_code": 35}, None),
+        "age_band=60-79,sex=F": ({"age_band": 5, "sex_code": 2}, None),
+        "breakdown=uf": ({}, "uf_code"),
+        "breakdown=age_band": ({}, "age_band"),
+        "uf=SP,breakdown=sex": ({"uf_code": 35}, "sex_code"),
+    }
+    for group_by in ["day", "month"]:
+        for name, (filters, breakdown_by) in cube_cases.items():
+            cases[f"influd_cube/all/{group_by}/{name}"] = (
+                lambda cursor, group_by=group_by, filters=filters, breakdown_by=breakdown_by: (
+                    tool._fetch_from_cube(
+                        cursor, "all", starts[group_by], end, group_by, filters, breakdown_by
+                    )
+                ),
+                True,
+            )
+    for name, filters in [("national", {}), ("uf=SP", {"uf_code": 35})]:
+        cases[f"influd_cube/indicators/day/{name}"] = (
+            lambda cursor, filters=filters: tool._fetch_indicators(
+                cursor, starts["day"], end, filters
+            ),
+            True,
+        )
+    for group_by in ["day", "month"]:
+        for name, uf_code in [("national", None), ("uf=SP", 35)]:
+            cases[f"influd_uti_census/occupancy/{group_by}/{name}"] = (
+                lambda cursor, group_by=group_by, uf_code=uf_code: (
+                    tool._fetch_uti_occupancy(
+                        cursor, starts[group_by], end, group_by, uf_code
+                    )
+                ),
+                group_by == "day",
+            )
+    return cases
+
+
+def summarize_plan(plan: dict) -> dict:
+    """
+    Purpose: Get the plan shape, shared buffers and execution time of an
+    EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) result.
+    Args:
+        plan: dict - The EXPLAIN result.
+    Returns:
+        dict - Scans (node type, relation and index), buffers and execution ms.
+    """
+    scans, nodes = [], [plan["Plan"]]
+    while nodes:
+        node = nodes.pop()
+        nodes.extend(node.get("Plans", []))
+        if "Relation Name" in node or "Index Name" in node:
+            scan = node["Node Type"]
+            if "Relation Name" in node:
+                scan += f" on {node['Relation Name']}"
+            if "Index Name" in node:
+                scan += f" using {node['Index Name']}"
+            scans.append(scan)
+    root = plan["Plan"]
+    return {
+        "scans": sorted(scans),
+        "buffers": root.get("Shared Hit Blocks", 0) + root.get("Shared Read Blocks", 0),
+        "execution_ms": round(plan["Execution Time"], 3),
+    }
+
+
+def run_case(cursor: Any, run: Callable[[Any], Any], runs: int) -> dict:
+    """
+    Purpose: Run a case several times and keep the fastest execution.
+    Returns:
+        dict - The summary of each statement of the case.
+    """
+    best = None
+    for _ in range(runs):
+        recorder = PlanRecorder(cursor)
+        run(recorder)
+        if not recorder.plans:
+            raise RuntimeError("the case didn't run any statement")
+        summaries = [summarize_plan(plan) for plan in recorder.plans]
+        total_ms = sum(summary["execution_ms"] for summary in summaries)
+        if best is None or total_ms < sum(s["execution_ms"] for s in best):
+            best = summaries
+    return {"statements": best}
+
+
+def check_case(result: dict, baseline: dict | None, indexed: bool) -> list[str]:
+    """
+    Purpose: Compare a case result with its baseline and plan requirements.
+    Returns:
+        list[str] - The regressions found.
+    """
+    problems = []
+    for i, statement in enumerate(result["statements"]):
+        seq_scans = [scan for scan in statement["scans"] if scan.startswith("Seq Scan")]
+        if indexed and seq_scans:
+            problems.append(f"statement {i} reads without an index: {', '.join(seq_scans)}")
+    if baseline is None:
+        return problems + ["no baseline"]
+    if len(baseline["statements"]) != len(result["statements"]):
+        return problems + [
+            f"{len(result['statements'])} statements instead of "
+            f"{len(baseline['statements'])}"
+        ]
+    for i, (statement, expected) in enumerate(
+        zip(result["statements"], baseline["statements"])
+    ):
+        if statement["scans"] != expected["scans"]:
+            problems.append(
+                f"statement {i} plan changed: {expected['scans']} -> {statement['scans']}"
+            )
+        buffer_budget = expected["buffers"] * (1 + BUFFER_TOLERANCE)
+        if statement["buffers"] > buffer_budget:
+            problems.append(
+                f"statement {i} reads {statement['buffers']} buffers, "
+                f"budget {buffer_budget:.0f} (baseline {expected['buffers']})"
+            )
+        latency_budget = expected["execution_ms"] * LATENCY_TOLERANCE + LATENCY_SLACK_MS
+        if statement["execution_ms"] > latency_budget:
+            problems.append(
+                f"statement {i} takes {statement['execution_ms']} ms, "
+                f"budget {latency_budget:.1f} ms (baseline {expected['execution_ms']} ms)"
+            )
+    return problems
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Query-plan and latency benchmark")
+    parser.add_argument(
+        "--rows", type=int, default=DEFAULT_ROWS, help="Synthetic notifications"
+    )
+    parser.add_argument("--runs", type=int, default=5, help="Runs of each case")
+    parser.add_argument(
+        "--skip-load",
+        action="store_true",
+        help="Reuse the dataset already loaded in the benchmark database",
+    )
+    parser.add_argument(
+        "--update-baseline",
+        action="store_true",
+        help=f"Save the results as the new baseline ({BASELINE_PATH})",
+    )
+    args = parser.parse_args()
+
+    server_url = os.getenv("QUERY_BENCHMARK_SERVER_URL")
+    if not server_url:
+        print("Set QUERY_BENCHMARK_SERVER_URL to a local Postgres server")
+        return 2
+    os.environ["POSTGRES_SERVER_URL"] = server_url
+    from src.utils.db import get_db_connection
+
+    if not args.skip_load:
+        print(f"Loading {args.rows} synthetic rows...")
+        load_synthetic_dataset(args.rows)
+
+    baseline = {}
+    if os.path.exists(BASELINE_PATH):
+        with open(BASELINE_PATH, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+    if baseline and baseline.get("rows") != args.rows and not args.update_baseline:
+        print(f"The baseline was recorded with {baseline.get('rows')} rows, use --rows")
+        return 2
+
+    conn = get_db_connection("srag_brasil")
+    cursor = conn.cursor()
+    # Plans can change between major versions (e.g. 160002 -> 16)
+    server_version = conn.server_version
+    baseline_version = baseline.get("server_version")
+    if baseline_version and baseline_version // 10000 != server_version // 10000:
+        print(
+            f"The baseline was recorded on Postgres {baseline_version // 10000}, "
+            f"this server is {server_version // 10000}: plan changes may come from it"
+        )
+    results, failed = {}, False
+    try:
+        for name, (run, indexed) in get_cases().items():
+            try:
+                results[name] = run_case(cursor, run, args.runs)
+            except Exception as e:
+                conn.rollback()
+                print(f"{name}: error: {e}")
+                failed = True
+                continue
+            statements = results[name]["statements"]
+            print(
+                f"{name}: {sum(s['execution_ms'] for s in statements):.2f} ms, "
+                f"{sum(s['buffers'] for s in statements)} buffers"
+            )
+            if args.update_baseline:
+                continue
+            for problem in check_case(
+                results[name], baseline.get("cases", {}).get(name), indexed
+            ):
+                print(f"  {problem}")
+                failed = True
+    finally:
+        cursor.close()
+        conn.close()
+
+    if args.update_baseline:
+        os.makedirs(os.path.dirname(BASELINE_PATH), exist_ok=True)
+        with open(BASELINE_PATH, "w", encoding="utf-8") as f:
+            json.dump(
+                {"rows": args.rows, "server_version": server_version, "cases": results},
+                f,
+                indent=2,
+                sort_keys=True,
+            )
+            f.write("\n")
+        print(f"Baseline saved to: {BASELINE_PATH}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
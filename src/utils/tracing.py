@@ -0,0 +1,191 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Iterator
+import json
+import logging
+import os
+import secrets
+import threading
+import time
+import urllib.request
+
+logger = logging.getLogger(__name__)
+
+_current_trace: ContextVar["Trace"] = ContextVar("current_trace", default=None)
+_current_span: ContextVar[dict[str, Any]] = ContextVar("current_span", default=None)
+
+
+class Trace:
+    """
+    Purpose: Hold the finished spans of one run, all sharing the run trace id.
+    Args:
+        name: str - The name of the run (e.g. "report", "load").
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.trace_id = secrets.token_hex(16)
+        self.spans: list[dict[str, Any]] = []
+        self._lock = threading.Lock()
+
+    def add_span(self, span: dict[str, Any]) -> None:
+        with self._lock:
+            self.spans.append(span)
+
+
+def get_current_trace() -> Trace | None:
+    return _current_trace.get()
+
+
+def get_trace_id() -> str | None:
+    """
+    Returns:
+        str | None - The trace id of the current run, None outside a trace.
+    """
+    trace = _current_trace.get()
+    return trace.trace_id if trace else None
+
+
+@contextmanager
+def span(name: str, **attributes: Any) -> Iterator[dict[str, Any] | None]:
+    """
+    Purpose: Record a span nested in the current span of the current trace.
+    Outside a trace nothing is recorded and None is yielded.
+    Args:
+        name: str - The name of the span.
+        attributes: Any - Attributes of the span, more can be set on the yielded span.
+    Returns:
+        Iterator[dict[str, Any] | None] - The span.
+    """
+    trace = _current_trace.get()
+    if trace is None:
+        yield None
+        return
+    parent = _current_span.get()
+    current = {
+        "trace_id": trace.trace_id,
+        "span_id": secrets.token_hex(8),
+        "parent_span_id": parent["span_id"] if parent else None,
+        "name": name,
+        "start_time_unix_nano": time.time_ns(),
+        "end_time_unix_nano": None,
+        "attributes": dict(attributes),
+        "status": "ok",
+    }
+    token = _current_span.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current["status"] = "error"
+        current["attributes"]["error"] = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        current["end_time_unix_nano"] = time.time_ns()
+        _current_span.reset(token)
+        trace.add_span(current)
+
+
+def _export_to_file(trace: Trace, trace_dir: str) -> None:
+    path = os.path.join(trace_dir, f"{trace.name}-{trace.trace_id}.jsonl")
+    os.makedirs(trace_dir, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        for finished_span in trace.spans:
+            f.write(json.dumps(finished_span, ensure_ascii=False, default=str) + "\n")
+    logger.info(f"Trace {trace.trace_id} saved to: {path}")
+
+
+def _get_otlp_value(value: Any) -> dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def _export_to_otlp(trace: Trace, endpoint: str) -> None:
+    """
+    Purpose: Send the spans to an OTLP/HTTP collector using the JSON encoding.
+    Args:
+        trace: Trace - The finished trace.
+        endpoint: str - The collector base url (e.g. http://localhost:4318).
+    """
+    spans = [
+        {
+            "traceId": finished_span["trace_id"],
+            "spanId": finished_span["span_id"],
+            "parentSpanId": finished_span["parent_span_id"] or "",
+            "name": finished_span["name"],
+            "kind": 1,
+            "startTimeUnixNano": str(finished_span["start_time_unix_nano"]),
+            "endTimeUnixNano": str(finished_span["end_time_unix_nano"]),
+            "attributes": [
+                {"key": key, "value": _get_otlp_value(value)}
+                for key, value in finished_span["attributes"].items()
+            ],
+            "status": {"code": 2 if finished_span["status"] == "error" else 1},
+        }
+        for finished_span in trace.spans
+    ]
+    payload = {
+        "resourceSpans": [
+            {
+                "resource": {
+                    "attributes": [
+                        {
+                            "key": "service.name",
+                            "value": {"stringValue": f"srag-{trace.name}"},
+                        }
+                    ]
+                },
+                "scopeSpans": [{"scope": {"name": "srag"}, "spans": spans}],
+            }
+        ]
+    }
+    request = urllib.request.Request(
+        f"{endpoint.rstrip('/')}/v1/traces",
+        data=json.dumps(payload).encode("utf-8"),
+        headers={"Content-Type": "application/json"},
+        method="POST",
+    )
+    with urllib.request.urlopen(request, timeout=10):
+        pass
+    logger.info(f"Trace {trace.trace_id} exported to: {endpoint}")
+
+
+def export_trace(trace: Trace) -> None:
+    """
+    Purpose: Export a finished trace to the OTLP endpoint when
+    OTEL_EXPORTER_OTLP_ENDPOINT is set, otherwise to a JSONL file at TRACE_DIR.
+    Args:
+        trace: Trace - The finished trace.
+    """
+    try:
+        endpoint = os.getenv("OTEL_EXPORTER_OTLP_ENDPOINT")
+        if endpoint:
+            _export_to_otlp(trace, endpoint)
+        else:
+            _export_to_file(trace, os.getenv("TRACE_DIR", "src/data/traces"))
+    except Exception as e:
+        logger.error(f"Error exporting trace {trace.trace_id}: {e}")
+
+
+@contextmanager
+def start_trace(name: str, **attributes: Any) -> Iterator[Trace]:
+    """
+    Purpose: Start a run-level trace with a root span, exported when the block ends.
+    Args:
+        name: str - The name of the run.
+        attributes: Any - Attributes of the root span.
+    Returns:
+        Iterator[Trace] - The trace.
+    """
+    trace = Trace(name)
+    token = _current_trace.set(trace)
+    try:
+        with span(name, **attributes):
+            yield trace
+    finally:
+        _current_trace.reset(token)
+        export_trace(trace)
@@ -0,0 +1,73 @@
+import asyncio
+import unittest
+from src.app.tools.search_cache import CachedSearchClient, SearchCache, _inflight
+
+
+class SlowSearchClient:
+    """
+    Purpose: Async search client that blocks until released, counting its calls.
+    """
+
+    def __init__(self):
+        self.calls = 0
+        self.started = asyncio.Event()
+        self.release = asyncio.Event()
+
+    async def search(self, query: str, **params) -> dict:
+        self.calls += 1
+        self.started.set()
+        await self.release.wait()
+        return {"query": query, "answer": None, "results": [self.calls]}
+
+
+class CachedSearchClientTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.client = SlowSearchClient()
+        self.search = CachedSearchClient(self.client, SearchCache(ttl=0))
+
+    def tearDown(self):
+        _inflight.clear()
+
+    async def test_joiner_shares_owner_search(self):
+        owner = asyncio.create_task(self.search._search("srag"))
+        await self.client.started.wait()
+        joiner = asyncio.create_task(self.search._search("srag"))
+        await asyncio.sleep(0)
+        self.client.release.set()
+        owner_result, joiner_result = await asyncio.wait_for(
+            asyncio.gather(owner, joiner), timeout=2
+        )
+        self.assertEqual(owner_result[1], "client")
+        self.assertEqual(joiner_result, (owner_result[0], "in_flight"))
+        self.assertEqual(self.client.calls, 1)
+
+    async def test_owner_cancelled_releases_joiner(self):
+        owner = asyncio.create_task(self.search._search("srag"))
+        await self.client.started.wait()
+        joiner = asyncio.create_task(self.search._search("srag"))
+        await asyncio.sleep(0)
+        owner.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await owner
+        self.client.release.set()
+        response, source = await asyncio.wait_for(joiner, timeout=2)
+        self.assertEqual(source, "client")
+        self.assertEqual(response["results"], [2])
+        self.assertEqual(_inflight, {})
+
+    async def test_joiner_cancelled_keeps_owner_search(self):
+        owner = asyncio.create_task(self.search._search("srag"))
+        await self.client.started.wait()
+        joiner = asyncio.create_task(self.search._search("srag"))
+        await asyncio.sleep(0)
+        joiner.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await joiner
+        self.client.release.set()
+        response, source = await asyncio.wait_for(owner, timeout=2)
+        self.assertEqual(source, "client")
+        self.assertEqual(response["results"], [1])
+
+
+if __name__ == "__main__":
+    unittest.main()